@@ -0,0 +1,106 @@
+import collections
+import math
+from typing import Deque, Dict, Optional
+
+from src import metrics
+
+
+class AdmissionController:
+    """
+    Admission control for the inference queue based on recent batch timings.
+
+    The expected wait of a new request is estimated from the most recent
+    batches as ``latency + (queued // batch_size) * interval``, where
+    ``latency`` is the end-to-end time of one batch and ``interval`` is the
+    time between two batch completions once the pipeline is full.
+
+    Args:
+        max_queue_depth (int): Maximum number of queued requests. 0 disables
+            the depth limit.
+        latency_budget (float): Maximum acceptable estimated wait in seconds.
+            0 disables the latency check.
+        window (int, optional): Number of recent batches averaged. Defaults to 20.
+    """
+
+    def __init__(self, max_queue_depth: int, latency_budget: float, window: int = 20):
+        self.max_queue_depth = int(max_queue_depth)
+        self.latency_budget = float(latency_budget)
+        self._latencies: Deque[float] = collections.deque(maxlen=window)
+        self._intervals: Deque[float] = collections.deque(maxlen=window)
+
+    def record_batch(self, latency: float, interval: float) -> None:
+        """
+        Record the timings of a completed batch.
+
+        Args:
+            latency (float): Seconds from batch formation to resolved results.
+            interval (float): Seconds the slowest stage was occupied by it.
+        """
+        self._latencies.append(latency)
+        self._intervals.append(interval)
+
+    def estimated_wait(self, queue_depth: int, batch_size: int) -> float:
+        """
+        Estimate seconds until a request enqueued now receives its result.
+
+        Args:
+            queue_depth (int): Requests already queued.
+            batch_size (int): Current batch size.
+
+        Returns:
+            float: Estimated wait, or 0.0 before any batch has completed.
+        """
+        if not self._latencies:
+            return 0.0
+        latency = sum(self._latencies) / len(self._latencies)
+        interval = sum(self._intervals) / len(self._intervals)
+        return latency + (queue_depth // max(1, batch_size)) * interval
+
+    def check(
+        self, queue_depth: int, batch_size: int, record: bool = True
+    ) -> Optional[int]:
+        """
+        Decide whether a new request may be queued.
+
+        Args:
+            queue_depth (int): Requests already queued.
+            batch_size (int): Current batch size.
+            record (bool, optional): Count the decision in the ``admitted``
+                and ``rejected_*`` metrics. Pass False to only probe the
+                load. Defaults to True.
+
+        Returns:
+            Optional[int]: None if the request is admitted, otherwise the
+                number of seconds the client should wait before retrying.
+        """
+        estimated_wait = self.estimated_wait(queue_depth, batch_size)
+
+        if self.max_queue_depth and queue_depth >= self.max_queue_depth:
+            if record:
+                metrics.increment("rejected_queue_full")
+            return max(1, math.ceil(estimated_wait - (self.latency_budget or 0.0)))
+
+        if self.latency_budget and estimated_wait > self.latency_budget:
+            if record:
+                metrics.increment("rejected_latency_budget")
+            return max(1, math.ceil(estimated_wait - self.latency_budget))
+
+        if record:
+            metrics.increment("admitted")
+        return None
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Return the timing averages used for admission decisions.
+
+        Returns:
+            Dict[str, float]: Mean batch latency and interval in seconds.
+        """
+        return {
+            "batch_latency": (
+                sum(self._latencies) / len(self._latencies) if self._latencies else 0.0
+            ),
+            "batch_interval": (
+                sum(self._intervals) / len(self._intervals) if self._intervals else 0.0
+            ),
+        }
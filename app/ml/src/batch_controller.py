@@ -0,0 +1,183 @@
+import collections
+import time
+from typing import Any, Deque, Dict, List
+
+from src.batcher import MicroBatcher
+
+
+def percentile(values: List[float], q: float) -> float:
+    """
+    Nearest-rank percentile of a list of values.
+
+    Args:
+        values (List[float]): Samples, in any order.
+        q (float): Percentile in [0, 100].
+
+    Returns:
+        float: The percentile, or 0.0 for an empty list.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+
+class AdaptiveBatchController:
+    """
+    Tunes the batcher's batch size and wait window from observed traffic.
+
+    Every ``adjust_every`` batches the controller compares the p95 request
+    latency with ``latency_target``:
+
+    - Above target, the batch size is cut by a quarter (at least one).
+    - Well below target while batches fill up, the batch size grows by one.
+
+    The wait window is then set to the expected time to fill a batch at the
+    observed arrival rate, capped by the latency headroom left after one
+    batch's processing time. Both values stay within the configured bounds.
+
+    Args:
+        batcher (MicroBatcher): Batcher whose ``batch_size`` and
+            ``max_wait_time`` are tuned.
+        min_batch_size (int): Lower bound for the batch size.
+        max_batch_size (int): Upper bound for the batch size.
+        min_wait_time (float): Lower bound for the wait window in seconds.
+        max_wait_time (float): Upper bound for the wait window in seconds.
+        latency_target (float): Target p95 request latency in seconds.
+        window (int, optional): Number of recent samples kept. Defaults to 100.
+        adjust_every (int, optional): Batches between decisions. Defaults to 5.
+    """
+
+    def __init__(
+        self,
+        batcher: MicroBatcher,
+        min_batch_size: int,
+        max_batch_size: int,
+        min_wait_time: float,
+        max_wait_time: float,
+        latency_target: float,
+        window: int = 100,
+        adjust_every: int = 5,
+    ):
+        self.batcher = batcher
+        self.min_batch_size = max(1, int(min_batch_size))
+        self.max_batch_size = max(self.min_batch_size, int(max_batch_size))
+        self.min_wait_time = max(0.0, float(min_wait_time))
+        self.max_wait_time = max(self.min_wait_time, float(max_wait_time))
+        self.latency_target = float(latency_target)
+        self.adjust_every = max(1, int(adjust_every))
+
+        self._arrivals: Deque[float] = collections.deque(maxlen=window)
+        self._request_latencies: Deque[float] = collections.deque(maxlen=window)
+        self._batch_latencies: Deque[float] = collections.deque(maxlen=window)
+        self._full_batches: Deque[bool] = collections.deque(maxlen=self.adjust_every)
+        self._batches_since_adjust = 0
+        self.decisions: Deque[Dict[str, Any]] = collections.deque(maxlen=20)
+
+        self.batcher.batch_size = min(
+            max(self.batcher.batch_size, self.min_batch_size), self.max_batch_size
+        )
+        self.batcher.max_wait_time = min(
+            max(self.batcher.max_wait_time, self.min_wait_time), self.max_wait_time
+        )
+
+    def observe_arrival(self) -> None:
+        """
+        Record the arrival of a request.
+        """
+        self._arrivals.append(time.monotonic())
+
+    def observe_batch(
+        self, batch_size: int, batch_latency: float, request_latencies: List[float]
+    ) -> None:
+        """
+        Record a completed batch and adjust the batcher when due.
+
+        Args:
+            batch_size (int): Number of requests in the batch.
+            batch_latency (float): Seconds from batch formation to results.
+            request_latencies (List[float]): Seconds from enqueue to result for
+                every request of the batch.
+        """
+        self._batch_latencies.append(batch_latency)
+        self._request_latencies.extend(request_latencies)
+        self._full_batches.append(batch_size >= self.batcher.batch_size)
+
+        self._batches_since_adjust += 1
+        if self._batches_since_adjust >= self.adjust_every:
+            self._batches_since_adjust = 0
+            self._adjust()
+
+    def arrival_rate(self) -> float:
+        """
+        Requests per second over the recent arrival window.
+
+        Returns:
+            float: Arrival rate, or 0.0 with fewer than two arrivals.
+        """
+        if len(self._arrivals) < 2:
+            return 0.0
+        span = self._arrivals[-1] - self._arrivals[0]
+        return (len(self._arrivals) - 1) / span if span > 0 else 0.0
+
+    def _adjust(self) -> None:
+        p95_latency = percentile(list(self._request_latencies), 95)
+        batch_latency = sum(self._batch_latencies) / len(self._batch_latencies)
+        arrival_rate = self.arrival_rate()
+
+        batch_size = self.batcher.batch_size
+        if p95_latency > self.latency_target:
+            batch_size -= max(1, batch_size // 4)
+            reason = "p95 latency above target"
+        elif p95_latency < 0.8 * self.latency_target and all(self._full_batches):
+            batch_size += 1
+            reason = "full batches within latency target"
+        else:
+            reason = "hold"
+        batch_size = min(max(batch_size, self.min_batch_size), self.max_batch_size)
+
+        # Time to fill a batch at the current rate, within the latency headroom
+        fill_time = batch_size / arrival_rate if arrival_rate else self.max_wait_time
+        headroom = max(0.0, self.latency_target - batch_latency)
+        max_wait_time = min(
+            max(min(fill_time, headroom), self.min_wait_time), self.max_wait_time
+        )
+
+        self.batcher.batch_size = batch_size
+        self.batcher.max_wait_time = max_wait_time
+
+        # Latencies measured under the old settings no longer apply
+        if reason != "hold":
+            self._request_latencies.clear()
+
+        self.decisions.append(
+            {
+                "time": time.time(),
+                "batch_size": batch_size,
+                "max_wait_time": round(max_wait_time, 4),
+                "p95_latency": round(p95_latency, 4),
+                "batch_latency": round(batch_latency, 4),
+                "arrival_rate": round(arrival_rate, 4),
+                "reason": reason,
+            }
+        )
+
+    def state(self) -> Dict[str, Any]:
+        """
+        Current settings, bounds and recent decisions for inspection.
+
+        Returns:
+            Dict[str, Any]: Controller state.
+        """
+        return {
+            "batch_size": self.batcher.batch_size,
+            "max_wait_time": self.batcher.max_wait_time,
+            "bounds": {
+                "batch_size": [self.min_batch_size, self.max_batch_size],
+                "max_wait_time": [self.min_wait_time, self.max_wait_time],
+            },
+            "latency_target": self.latency_target,
+            "arrival_rate": self.arrival_rate(),
+            "p95_latency": percentile(list(self._request_latencies), 95),
+            "decisions": list(self.decisions),
+        }
@@ -1,9 +1,13 @@
 # Standard library imports
 import asyncio
 import collections
+import concurrent.futures
+import copy
 import io
+import mmap
+import time
 import uuid
-from typing import Any, Dict, List, Tuple, Union
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 import aiohttp
 import cv2
@@ -19,6 +23,8 @@ from scipy.ndimage import gaussian_filter
 from skimage.feature import graycomatrix, graycoprops
 from skimage.morphology import dilation, square
 from torchvision import transforms
+from src.executors import offload, run_in_executor
+from src.fetch_cache import fetch_remote
 from src.model_container import device, model_container
 
 
@@ -30,6 +36,7 @@ from src.utils import (
     add_color_legend,
     get_bbox_from_mask,
     process_image_bs,
+    DICOM_EXTENSIONS,
     DICOMConverter,
     DICOMBatchProcessor,
     LocalUploader
@@ -102,6 +109,152 @@ async def process_dicom_images(input_image: str, output_folder: str) -> dict:
     return image_data
 
 
+def read_file(file_path: str) -> bytes:
+    """
+    Read a local file into memory.
+
+    Args:
+        file_path (str): Path of the file to read.
+
+    Returns:
+        bytes: File contents.
+    """
+    with open(file_path, "rb") as f:
+        return f.read()
+
+
+# Side length of the model input; decoders may scale down towards it
+DECODE_TARGET = 1024
+
+# cv2 read flag per JPEG scale-down factor
+REDUCED_GRAYSCALE_FLAGS = {
+    1: cv2.IMREAD_GRAYSCALE,
+    2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+    4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+    8: cv2.IMREAD_REDUCED_GRAYSCALE_8,
+}
+
+
+def reduction_factor(size: Tuple[int, int], target: int = DECODE_TARGET) -> int:
+    """
+    Pick the JPEG scale-down factor for an image.
+
+    Args:
+        size (Tuple[int, int]): Width and height of the encoded image.
+        target (int, optional): Smallest side length the decoded image must
+            keep. Defaults to ``DECODE_TARGET``.
+
+    Returns:
+        int: Largest of 1, 2, 4 or 8 that keeps both sides at or above
+            ``target``, so the final resize never upsamples.
+    """
+    factor = 1
+    while factor < 8 and min(size) // (factor * 2) >= target:
+        factor *= 2
+    return factor
+
+
+@offload("image")
+def decode_image(image_bytes: bytes) -> np.ndarray:
+    """
+    Decode encoded image bytes.
+
+    Args:
+        image_bytes (bytes): Encoded PNG/JPEG image.
+
+    Returns:
+        np.ndarray: Grayscale image array with shape (H, W) and dtype uint8.
+            Large JPEGs are decoded at 1/2, 1/4 or 1/8 scale, but never
+            below ``DECODE_TARGET`` on either side.
+    """
+    image = Image.open(io.BytesIO(image_bytes))
+    if image.format == "JPEG":
+        # The JPEG decoder scales down while decoding (draft mode)
+        image.draft("L", (DECODE_TARGET, DECODE_TARGET))
+    image = image.convert("L")
+    return np.asarray(image, dtype=np.uint8)
+
+
+@offload("image")
+def load_file_image(file_path: str) -> np.ndarray:
+    """
+    Decode a local image file straight from a memory map.
+
+    The file is mapped instead of read, so ``cv2.imdecode`` reads the encoded
+    bytes from the page cache without a separate read buffer. Formats OpenCV
+    cannot decode fall back to ``decode_image``.
+
+    Note:
+        The decoded image is still allocated by ``cv2.imdecode``; its Python
+        binding has no output argument to decode into a preallocated array.
+
+    Args:
+        file_path (str): Path of the PNG/JPEG file.
+
+    Returns:
+        np.ndarray: Grayscale image array with shape (H, W) and dtype uint8.
+            Large JPEGs are decoded at reduced resolution, see
+            ``reduction_factor``.
+    """
+    try:
+        # Only the header is read here
+        with Image.open(file_path) as header:
+            is_jpeg = header.format == "JPEG"
+            factor = reduction_factor(header.size) if is_jpeg else 1
+    except OSError:
+        factor = 1
+
+    with open(file_path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            buffer = np.frombuffer(mapped, dtype=np.uint8)
+            try:
+                image = cv2.imdecode(buffer, REDUCED_GRAYSCALE_FLAGS[factor])
+            finally:
+                # The map cannot be closed while a view on it exists
+                del buffer
+            if image is None:
+                return decode_image.__wrapped__(mapped[:])
+    return image
+
+
+# Decodes local inputs at model resolution, see ``load_input_image``
+input_converter = DICOMConverter()
+
+
+@offload("image")
+def load_input_image(file_path: str, frame: Optional[int] = None) -> np.ndarray:
+    """
+    Decode a local DICOM or raster input once, in memory, at model resolution.
+
+    Args:
+        file_path (str): Path of the DICOM, PNG or JPEG file.
+        frame (int, optional): Frame of a DICOM file. When given, the file is
+            read as DICOM whatever its extension. Defaults to None.
+
+    Returns:
+        np.ndarray: Grayscale uint8 image at 1024x1024, resized the same way
+            as the converted PNGs (see ``DICOMConverter.load``).
+    """
+    if frame is not None or file_path.lower().endswith(DICOM_EXTENSIONS):
+        return input_converter.read_dicom(file_path, frame)
+    return input_converter.resize(load_file_image.__wrapped__(file_path))
+
+
+def gray_to_rgb(image: np.ndarray) -> np.ndarray:
+    """
+    Expand a grayscale image to three channels at a model or drawing boundary.
+
+    Args:
+        image (np.ndarray): Image with shape (H, W), or already (H, W, 3).
+
+    Returns:
+        np.ndarray: Image with shape (H, W, 3) and the same dtype.
+    """
+    if image.ndim == 2:
+        return cv2.cvtColor(image, cv2.COLOR_GRAY2RGB)
+    return image
+
+
 async def get_image(input_data: Dict[str, Any]) -> np.ndarray:
     """
     Asynchronously load and process an image from a URL.
@@ -109,43 +262,47 @@ async def get_image(input_data: Dict[str, Any]) -> np.ndarray:
     Args:
         input_data (dict): Dictionary containing image metadata. Required keys:
             - "url" (str): URL of the image to download.
+            Optional keys:
+            - "image" (np.ndarray): Already decoded grayscale image; returned
+              as is and ``url`` is not read.
+            - "frame" (int): Frame of a local DICOM file, e.g. one item of a
+              study (see ``src.study``); the file may have any extension.
 
     Returns:
-        np.ndarray: Loaded image as a NumPy array with shape (H, W, 3) and dtype float32.
+        np.ndarray: Loaded grayscale image with shape (H, W) and dtype uint8.
+            Local files are decoded in memory and already resized to
+            1024x1024.
 
     Raises:
         ValueError: If there's an error downloading or processing the image.
     """
+    if input_data.get("image") is not None:
+        return input_data["image"]
+
     image_url = input_data.get("url")
 
     try:
         assert image_url is not None, "Image URL is None."
-        assert image_url.lower().endswith((".jpg", ".jpeg", ".png" , '.dicom' , '.dcm' , '.dic')), "Invalid image format."
+        frame = input_data.get("frame")
+        assert frame is not None or image_url.lower().endswith((".jpg", ".jpeg", ".png" , '.dicom' , '.dcm' , '.dic')), "Invalid image format."
 
         # Handle local file URLs
         if image_url.startswith("file://"):
             file_path = image_url[7:]  # Remove 'file://' prefix
-            with open(file_path, "rb") as f:
-                image_bytes = f.read()
-        else:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(image_url) as response:
-                    response.raise_for_status()
-                    image_bytes = await response.read()
+            return await load_input_image(file_path, frame)
 
-        image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-        image = np.array(image, dtype=np.float32)
+        image_bytes = await fetch_remote(image_url)
+        return await decode_image(image_bytes)
 
-        return image
-
-    except aiohttp.ClientError as e:
-        raise ValueError(f"Network error while fetching image: {e}")
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        raise ValueError(f"Network error while fetching image: {e!r}")
 
     except Exception as e:
         raise ValueError(f"Error processing image: {e}")
 
 
-async def to_image_array(image: Union[torch.Tensor, np.ndarray]) -> np.ndarray:
+@offload("image")
+def to_image_array(image: Union[torch.Tensor, np.ndarray]) -> np.ndarray:
     """
     Convert a tensor or array to a uint8 numpy array suitable for image saving.
 
@@ -187,29 +344,24 @@ async def to_image_array(image: Union[torch.Tensor, np.ndarray]) -> np.ndarray:
     return image.astype(np.uint8)
 
 
-async def preprocessing(input_image: np.ndarray) -> torch.Tensor:
+@offload("image")
+def preprocessing(input_image: np.ndarray) -> torch.Tensor:
     """
     Preprocess an input image for model inference.
 
     Args:
-        input_image (np.ndarray): Input image array with shape (H, W, 3).
+        input_image (np.ndarray): Grayscale image array with shape (H, W).
 
     Returns:
         torch.Tensor: Preprocessed image tensor with shape (1, 3, 1024, 1024).
             The tensor is:
-            - Converted to grayscale using ITU-R BT.601 coefficients
             - Normalized to [0, 1] range
             - Resized to 1024x1024
             - CLAHE enhanced
             - Converted to RGB by repeating the grayscale channel
             - Moved to the appropriate device (CPU/GPU)
     """
-    # Convert to grayscale using ITU-R BT.601 coefficients
-    image = (
-        input_image[..., 0] * 0.299
-        + input_image[..., 1] * 0.587
-        + input_image[..., 2] * 0.114
-    )
+    image = input_image.astype(np.float32)
 
     # Normalize
     image = (image - image.min()) / (image.max() - image.min() + 1e-6)
@@ -245,7 +397,8 @@ async def check_validation(input_image: torch.Tensor) -> bool:
     return True  # Placeholder
 
 
-async def get_intensity_and_glcm_features(
+@offload("image")
+def get_intensity_and_glcm_features(
     input_image: torch.Tensor, intensity_bins: int = 256
 ) -> np.ndarray:
     """
@@ -342,10 +495,9 @@ async def check_inverted(
         - Uses a pre-trained model to predict image inversion
         - Respects manually specified inversion flags from input_data if present
     """
-    features_list = []
-    for input_image in input_images:
-        features = await get_intensity_and_glcm_features(input_image)
-        features_list.append(features)
+    features_list = await asyncio.gather(
+        *[get_intensity_and_glcm_features(input_image) for input_image in input_images]
+    )
 
     # Stack features into a batch
     features_batch = np.stack(features_list)
@@ -353,7 +505,9 @@ async def check_inverted(
     check_inversion_model = model_container.get_model("check_inversion_model")
 
     # Predict for the batch
-    predictions = check_inversion_model.predict(features_batch)
+    predictions = await run_in_executor(
+        "model", check_inversion_model.predict, features_batch
+    )
 
     is_inverted_list = [0] * len(input_images)
     for i, pred in enumerate(predictions):
@@ -365,7 +519,8 @@ async def check_inverted(
     return is_inverted_list
 
 
-async def get_lung_bbox(input_images: List[torch.Tensor]) -> List[List[int]]:
+@offload("model")
+def get_lung_bbox(input_images: List[torch.Tensor]) -> List[List[int]]:
     """
     Detect lung bounding boxes in chest X-ray images using a pre-trained model.
 
@@ -410,7 +565,8 @@ async def get_lung_bbox(input_images: List[torch.Tensor]) -> List[List[int]]:
     return bboxes
 
 
-async def generate_smooth_binary_mask(
+@offload("image")
+def generate_smooth_binary_mask(
     heatmap: np.ndarray,
     threshold: int = 40,
     border_thickness: int = 45,
@@ -485,7 +641,8 @@ async def generate_smooth_binary_mask(
     return smooth_mask
 
 
-async def yolo_lrp_mask(input_image: torch.Tensor) -> np.ndarray:
+@offload("model")
+def yolo_lrp_mask(input_image: torch.Tensor) -> np.ndarray:
     """
     Generate Layer-wise Relevance Propagation (LRP) mask using YOLOv8.
 
@@ -662,6 +819,99 @@ def apply_bezier_smoothing(mask: np.ndarray) -> np.ndarray:
     return smoothed_mask
 
 
+@offload("image")
+def segment_abnormalities(
+    abnormalities: List[Dict[str, Any]],
+    rt_smooth_mask: np.ndarray,
+    yolo_mask: np.ndarray,
+    image_size: Tuple[int, int],
+) -> List[Dict[str, List[List[int]]]]:
+    """
+    Turn RT-DETR and YOLOv8LRP masks into contours for one image's abnormalities.
+
+    Args:
+        abnormalities (List[Dict[str, Any]]): Abnormality dictionaries with bboxes.
+        rt_smooth_mask (np.ndarray): Smoothed RT-DETR heatmap mask.
+        yolo_mask (np.ndarray): YOLOv8LRP mask.
+        image_size (Tuple[int, int]): Image (height, width).
+
+    Returns:
+        List[Dict[str, List[List[int]]]]: One ``{"segmentation": contours}``
+            entry per abnormality, in image coordinates.
+    """
+    image_height, image_width = image_size
+    segmentation_results = []  # List to store segmentation masks for this image
+
+    # Resize masks to match image dimensions
+    rt_mask_full = cv2.resize(
+        rt_smooth_mask,
+        (image_width, image_height),
+        interpolation=cv2.INTER_NEAREST,
+    )
+    yolo_mask_full = cv2.resize(
+        yolo_mask,
+        (image_width, image_height),
+        interpolation=cv2.INTER_NEAREST,
+    )
+
+    # Ensure both masks are non-empty
+    if (
+        rt_mask_full is None
+        or yolo_mask_full is None
+        or rt_mask_full.size == 0
+        or yolo_mask_full.size == 0
+    ):
+        raise ValueError("RT or YOLO mask is empty. Cannot proceed with segmentation.")
+
+    # Combine RT-DETR and YOLOv8LRP masks
+    combined_mask = combine_masks(rt_mask_full, yolo_mask_full)
+
+    # Extract bounding boxes from abnormalities
+    bbox_list = [[int(coord) for coord in abn["bbox"]] for abn in abnormalities]
+
+    # Ensure bounding boxes exist
+    if not bbox_list:
+        return []
+
+    # Restrict the mask to detected bounding boxes
+    restricted_mask = restrict_mask_to_bbox(combined_mask, bbox_list)
+
+    # Process each bounding box separately
+    for i, bbox in enumerate(bbox_list):
+        x1, y1, x2, y2 = bbox
+
+        # Extract region from restricted mask
+        single_mask = np.zeros((y2 - y1, x2 - x1), dtype=restricted_mask.dtype)
+        single_mask[:, :] = restricted_mask[y1:y2, x1:x2]
+
+        # Apply convex hull to mask
+        convex_mask = apply_convex_hull(single_mask)
+
+        # Apply Bezier smoothing to convex mask
+        single_mask = apply_bezier_smoothing(convex_mask)
+
+        # Find contours with CHAIN_APPROX_NONE to get all points
+        contours, _ = cv2.findContours(
+            single_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE
+        )
+
+        # Map contour points to the original image coordinates
+        contour_points_list = []
+        for contour in contours:
+            mapped_contour = []
+            for point in contour:
+                x, y = point[0]
+                mapped_x = int(x + x1)
+                mapped_y = int(y + y1)
+                mapped_contour.extend([mapped_x, mapped_y])
+            contour_points_list.append(mapped_contour)
+
+        # Store segmentation in dictionary
+        segmentation_results.append({"segmentation": contour_points_list})
+
+    return segmentation_results
+
+
 async def add_segmentation(
     abnormalitiess: List[List[Dict[str, Any]]],
     input_images: List[torch.Tensor],
@@ -697,13 +947,6 @@ async def add_segmentation(
             segmentation_results_batch.append([])
             continue
 
-        segmentation_results = []  # List to store segmentation masks for this image
-
-        # Convert tensor to NumPy array (H, W, 3)
-        transform = transforms.ToPILImage()
-        image_pil = transform(input_image.squeeze(0))
-        image_np = np.array(image_pil)
-
         # Generate RT-DETR and YOLOv8LRP masks
         tasks = [
             generate_smooth_binary_mask(heatmap, threshold=5, dilation_iter=10),
@@ -712,82 +955,15 @@ async def add_segmentation(
 
         rt_smooth_mask, yolo_mask = await asyncio.gather(*tasks)
 
-        # Resize masks to match image dimensions
-        rt_mask_full = cv2.resize(
-            rt_smooth_mask,
-            (image_np.shape[1], image_np.shape[0]),
-            interpolation=cv2.INTER_NEAREST,
-        )
-        yolo_mask_full = cv2.resize(
-            yolo_mask,
-            (image_np.shape[1], image_np.shape[0]),
-            interpolation=cv2.INTER_NEAREST,
+        segmentation_results = await segment_abnormalities(
+            abnormalities, rt_smooth_mask, yolo_mask, tuple(input_image.shape[-2:])
         )
-
-        # Ensure both masks are non-empty
-        if (
-            rt_mask_full is None
-            or yolo_mask_full is None
-            or rt_mask_full.size == 0
-            or yolo_mask_full.size == 0
-        ):
-            raise ValueError(
-                "RT or YOLO mask is empty. Cannot proceed with segmentation."
-            )
-
-        # Combine RT-DETR and YOLOv8LRP masks
-        combined_mask = combine_masks(rt_mask_full, yolo_mask_full)
-
-        # Extract bounding boxes from abnormalities
-        bbox_list = [[int(coord) for coord in abn["bbox"]] for abn in abnormalities]
-
-        # Ensure bounding boxes exist
-        if not bbox_list:
-            segmentation_results_batch.append([])
-            continue
-
-        # Restrict the mask to detected bounding boxes
-        restricted_mask = restrict_mask_to_bbox(combined_mask, bbox_list)
-
-        # Process each bounding box separately
-        for i, bbox in enumerate(bbox_list):
-            x1, y1, x2, y2 = bbox
-
-            # Extract region from restricted mask
-            single_mask = np.zeros((y2 - y1, x2 - x1), dtype=restricted_mask.dtype)
-            single_mask[:, :] = restricted_mask[y1:y2, x1:x2]
-
-            # Apply convex hull to mask
-            convex_mask = apply_convex_hull(single_mask)
-
-            # Apply Bezier smoothing to convex mask
-            single_mask = apply_bezier_smoothing(convex_mask)
-
-            # Find contours with CHAIN_APPROX_NONE to get all points
-            contours, _ = cv2.findContours(
-                single_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE
-            )
-
-            # Map contour points to the original image coordinates
-            contour_points_list = []
-            for contour in contours:
-                mapped_contour = []
-                for point in contour:
-                    x, y = point[0]
-                    mapped_x = int(x + x1)
-                    mapped_y = int(y + y1)
-                    mapped_contour.extend([mapped_x, mapped_y])
-                contour_points_list.append(mapped_contour)
-
-            # Store segmentation in dictionary
-            segmentation_results.append({"segmentation": contour_points_list})
-
         segmentation_results_batch.append(segmentation_results)
 
     return segmentation_results_batch
 
 
-async def preprocess_image_xrv(image: torch.Tensor) -> torch.Tensor:
+def preprocess_image_xrv(image: torch.Tensor) -> torch.Tensor:
     """
     Preprocess chest X-ray images for the torchxrayvision model.
 
@@ -823,7 +999,7 @@ async def preprocess_image_xrv(image: torch.Tensor) -> torch.Tensor:
     return torch.from_numpy(img_np).float()
 
 
-async def compute_dice(mask: np.ndarray, bbox: tuple) -> float:
+def compute_dice(mask: np.ndarray, bbox: tuple) -> float:
     """
     Compute Dice similarity coefficient between a binary mask and bounding box.
 
@@ -850,7 +1026,8 @@ async def compute_dice(mask: np.ndarray, bbox: tuple) -> float:
     return dice
 
 
-async def get_lung_segmentation_masks(input_images: List[torch.Tensor]) -> np.ndarray:
+@offload("model")
+def get_lung_segmentation_masks(input_images: List[torch.Tensor]) -> np.ndarray:
     """
     Generate segmentation masks for anatomical structures in chest X-rays.
 
@@ -881,7 +1058,7 @@ async def get_lung_segmentation_masks(input_images: List[torch.Tensor]) -> np.nd
     """
     original_h, original_w = input_images[0].shape[2:]
 
-    images = [await preprocess_image_xrv(input_image) for input_image in input_images]
+    images = [preprocess_image_xrv(input_image) for input_image in input_images]
     images = torch.stack(images)
     images = images.to(device)
 
@@ -910,7 +1087,8 @@ async def get_lung_segmentation_masks(input_images: List[torch.Tensor]) -> np.nd
     return resized_maskss
 
 
-async def add_location_id(
+@offload("image")
+def add_location_id(
     abnormalitiess: List[List[Dict[str, Any]]], maskss: List[np.ndarray]
 ) -> List[List[Dict[str, Any]]]:
     """
@@ -942,7 +1120,7 @@ async def add_location_id(
             # which are not relevant for this task, hence starting from index 4 and ending at the second last index.
             for i in range(4, 13):
                 mask = masks[i]
-                dice = await compute_dice(mask, (x1, y1, x2, y2))
+                dice = compute_dice(mask, (x1, y1, x2, y2))
                 if dice > max_dice:
                     max_dice = dice
                     best_mask_idx = i
@@ -951,14 +1129,15 @@ async def add_location_id(
     return abnormalitiess
 
 
-async def get_tb_score(
+@offload("model")
+def get_tb_score(
     original_images: List[np.array], lungs_bbox_list: List[List[int]]
 ) -> List[float]:
     """
     Calculate tuberculosis probability scores for chest X-rays.
 
     Args:
-        original_images (List[np.array]): List of original images.
+        original_images (List[np.array]): List of grayscale (H, W) images.
         lungs_bbox_list (List[List[int]]): List of lung bounding boxes [x1, y1, x2, y2].
 
     Returns:
@@ -984,16 +1163,11 @@ async def get_tb_score(
     cropped_images = []
     for original_image, lungs_bbox in zip(original_images, lungs_bbox_list):
         x1, y1, x2, y2 = lungs_bbox
+        original_image = original_image.astype(np.float32)
         original_image = (original_image - original_image.min()) / (
             original_image.max() - original_image.min() + 1e-6
         )
-        cropped_image = original_image[x1:x2, y1:y2, :]
-        # Convert to grayscale using ITU-R BT.601 coefficients
-        cropped_image = (
-            cropped_image[..., 0] * 0.299
-            + cropped_image[..., 1] * 0.587
-            + cropped_image[..., 2] * 0.114
-        )
+        cropped_image = original_image[x1:x2, y1:y2]
         cropped_image = transform(cropped_image)
         cropped_images.append(cropped_image)
 
@@ -1012,7 +1186,8 @@ async def get_tb_score(
     return probs
 
 
-async def generate_rtdetr_heatmap_with_mask(
+@offload("image")
+def generate_rtdetr_heatmap_with_mask(
     input_image: torch.Tensor,
     abnormalities: List[Dict[str, Any]],
     masks: np.ndarray,
@@ -1045,7 +1220,7 @@ async def generate_rtdetr_heatmap_with_mask(
         x1, y1, x2, y2 = int(x1), int(y1), int(x2), int(y2)
 
         for i in range(4, 13):
-            dice = await compute_dice(masks[i], (x1, y1, x2, y2))
+            dice = compute_dice(masks[i], (x1, y1, x2, y2))
             if dice > 0:
                 idx.append(i)
 
@@ -1162,6 +1337,34 @@ def boxes_to_tensor(boxes: Any) -> torch.Tensor:
     return torch.cat([xyxy, conf, cls], dim=1)
 
 
+@offload("model")
+def rtdetr_forward(original_images: List[np.ndarray]) -> Tuple[List[Any], List[Any]]:
+    """
+    Run the abnormality and rib fracture RT-DETR models on a batch.
+
+    Args:
+        original_images (List[np.ndarray]): Grayscale image arrays of shape (H, W).
+
+    Returns:
+        Tuple[List[Any], List[Any]]: Raw results of detection_model and
+            ribfracture_model; the last element of each holds feature maps.
+    """
+    detection_model = model_container.get_model("detection_model")
+    ribfracture_model = model_container.get_model("ribfracture_model")
+
+    detection_model.eval()
+    ribfracture_model.eval()
+
+    # The detectors take three-channel images
+    model_inputs = [gray_to_rgb(image) for image in original_images]
+    with torch.inference_mode():
+        results1 = detection_model(model_inputs, augment=True, visualize=False)
+        results2 = ribfracture_model(
+            model_inputs, augment=True, visualize=False, conf=0.25
+        )
+    return results1, results2
+
+
 async def rtdetr_infer(
     original_images: List[np.ndarray], maskss: List[np.ndarray]
 ) -> Tuple[List[Dict[str, Any]], List[np.ndarray], List[np.ndarray]]:
@@ -1170,7 +1373,7 @@ async def rtdetr_infer(
     (detection_model and ribfracture_model), and generates corresponding heatmaps and overlays.
 
     Args:
-        original_images (List[np.ndarray]): Input image array of shape (H, W, 3).
+        original_images (List[np.ndarray]): Grayscale image arrays of shape (H, W).
         maskss (List[np.ndarray]): Binary segmentation masks array of shape (N, H, W), where N represents the number of masks.
 
     Returns:
@@ -1181,17 +1384,14 @@ async def rtdetr_infer(
     """
 
     image_tensors = [
-        torch.from_numpy(original_image).permute(2, 0, 1).unsqueeze(0).float() / 255.0
+        torch.from_numpy(gray_to_rgb(original_image))
+        .permute(2, 0, 1)
+        .unsqueeze(0)
+        .float()
+        / 255.0
         for original_image in original_images
     ]
 
-    # Load models
-    detection_model = model_container.get_model("detection_model")
-    ribfracture_model = model_container.get_model("ribfracture_model")
-
-    detection_model.eval()
-    ribfracture_model.eval()
-
     # Define the new combined class names list
     # combined_class_labels = [
     #     "Lung Nodules",
@@ -1204,11 +1404,7 @@ async def rtdetr_infer(
     # ]
 
     # Run inference on both models
-    with torch.inference_mode():
-        results1 = detection_model(original_images, augment=True, visualize=False)
-        results2 = ribfracture_model(
-            original_images, augment=True, visualize=False, conf=0.25
-        )
+    results1, results2 = await rtdetr_forward(original_images)
 
     # TODO: Handle results2 as well
     visualization_features_batch = []
@@ -1217,8 +1413,7 @@ async def rtdetr_infer(
         visualization_features_batch.append(visualization_features)
 
     detectionss = []
-    heatmaps = []
-    overlays = []
+    heatmap_tasks = []
 
     for result1, result2, masks, image_tensor, visualization_features in zip(
         results1[:-1],
@@ -1298,26 +1493,31 @@ async def rtdetr_infer(
         detectionss.append(detections)
 
         # Generate heatmap and overlay
-        heatmap, overlay = await generate_rtdetr_heatmap_with_mask(
-            input_image=image_tensor,
-            abnormalities=detections,
-            masks=masks,
-            results=visualization_features,
+        heatmap_tasks.append(
+            generate_rtdetr_heatmap_with_mask(
+                input_image=image_tensor,
+                abnormalities=detections,
+                masks=masks,
+                results=visualization_features,
+            )
         )
-        heatmaps.append(heatmap)
-        overlays.append(overlay)
+
+    heatmaps_and_overlays = await asyncio.gather(*heatmap_tasks)
+    heatmaps = [heatmap for heatmap, _ in heatmaps_and_overlays]
+    overlays = [overlay for _, overlay in heatmaps_and_overlays]
 
     return detectionss, heatmaps, overlays
 
 
-async def get_ctr(
+@offload("image")
+def get_ctr(
     original_images: np.ndarray, lungs_bbox_list: list, maskss: np.ndarray
 ) -> tuple[List[np.ndarray], List[float]]:
     """
     Calculate the cardiothoracic ratio (CTR) for a batch of chest X-ray images.
 
     Args:
-        original_images (np.ndarray): Array of original chest X-ray images.
+        original_images (np.ndarray): Grayscale (H, W) chest X-ray images.
         lungs_bbox_list (list): List of bounding boxes for the lungs in each image.
         maskss (np.ndarray): Array of segmentation masks for anatomical structures.
 
@@ -1351,7 +1551,9 @@ async def get_ctr(
                 cardiothoracic_ratio = heart_width / chest_width
 
             # Convert to BGR for OpenCV if needed
-            if original_image.shape[-1] == 1:
+            if original_image.ndim == 2:
+                original_image = cv2.cvtColor(original_image, cv2.COLOR_GRAY2BGR)
+            elif original_image.shape[-1] == 1:
                 original_image = cv2.cvtColor(original_image, cv2.COLOR_GRAY2BGR)
             elif original_image.shape[-1] == 3:
                 original_image = cv2.cvtColor(original_image, cv2.COLOR_RGB2BGR)
@@ -1477,7 +1679,8 @@ async def get_ctr(
     return output_ctr_images, cardiothoracic_ratios
 
 
-async def get_bone_suppressed_resnet(
+@offload("model")
+def get_bone_suppressed_resnet(
     input_images: List[torch.Tensor], is_inverted_list: List[bool]
 ) -> np.ndarray:
     """
@@ -1543,6 +1746,655 @@ async def get_clahe_batch(
     return await asyncio.gather(*clahe_image_tasks)
 
 
+# Result fields a request can select with ``data["outputs"]``; ``image_id``
+# and ``error`` are always returned.
+OUTPUT_FIELDS = (
+    "is_inverted",
+    "lungs_found",
+    "lungs_bbox",
+    "abnormalities",
+    "is_normal",
+    "tb_score",
+    "heatmap",
+    "ctr",
+    "bone_suppressed",
+    "clahe",
+    "converted_png",
+)
+
+# Computation steps each result field reads
+FIELD_DEPENDENCIES = {
+    "is_inverted": (),
+    "lungs_found": ("lung_bbox",),
+    "lungs_bbox": ("lung_bbox",),
+    "abnormalities": ("detections", "segmentation", "location"),
+    "is_normal": ("detections",),
+    "tb_score": ("tb_score",),
+    "heatmap": ("detections",),
+    "ctr": ("ctr",),
+    "bone_suppressed": ("bone_suppression",),
+    "clahe": ("clahe",),
+    "converted_png": (),
+}
+
+# Computation steps each step reads. The inversion check and input validation
+# always run, since every step works on the inversion-corrected inputs.
+STEP_DEPENDENCIES = {
+    "lung_bbox": (),
+    "tb_score": ("lung_bbox",),
+    "lung_masks": (),
+    "detections": ("lung_masks",),
+    "bone_suppression": (),
+    "ctr": ("lung_bbox", "lung_masks"),
+    "segmentation": ("detections",),
+    "location": ("detections", "lung_masks"),
+    "clahe": (),
+}
+
+
+def parse_outputs(input_data: Dict[str, Any]) -> Tuple[str, ...]:
+    """
+    Read the result fields selected by a request.
+
+    Args:
+        input_data (Dict[str, Any]): Request data; ``outputs`` is an optional
+            list of names from ``OUTPUT_FIELDS``.
+
+    Returns:
+        Tuple[str, ...]: The selected fields, or all of ``OUTPUT_FIELDS`` when
+            ``outputs`` is missing.
+
+    Raises:
+        ValueError: If ``outputs`` is not a list or names an unknown field.
+    """
+    outputs = input_data.get("outputs")
+    if outputs is None:
+        return OUTPUT_FIELDS
+    if not isinstance(outputs, list):
+        raise ValueError("outputs must be a list of result field names")
+    unknown = [field for field in outputs if field not in FIELD_DEPENDENCIES]
+    if unknown:
+        raise ValueError(
+            f"Unknown outputs: {unknown}. Choose from {list(OUTPUT_FIELDS)}"
+        )
+    return tuple(field for field in OUTPUT_FIELDS if field in outputs)
+
+
+def resolve_steps(fields: Tuple[str, ...]) -> set:
+    """
+    Collect every computation step the given result fields depend on.
+
+    Args:
+        fields (Tuple[str, ...]): Selected result fields.
+
+    Returns:
+        set: Names from ``STEP_DEPENDENCIES``, including transitive ones.
+    """
+    steps = set()
+    pending = [step for field in fields for step in FIELD_DEPENDENCIES[field]]
+    while pending:
+        step = pending.pop()
+        if step not in steps:
+            steps.add(step)
+            pending.extend(STEP_DEPENDENCIES[step])
+    return steps
+
+
+async def skipped(value):
+    """Stand-in for a step that no image of the batch needs."""
+    return value
+
+
+class BatchContext:
+    """
+    Mutable state carried by one batch through the inference stages.
+
+    Args:
+        input_data (List[dict]): List of dictionaries containing image information.
+
+    Attributes:
+        outputs (List[dict]): Result dictionaries, one per input image.
+        image_uuids (List[str]): Identifiers of images that loaded successfully.
+        original_images (List[np.ndarray]): Loaded grayscale uint8 images
+            resized to 1024x1024; expanded to three channels only at model
+            inputs.
+        input_images (List[torch.Tensor]): Preprocessed model input tensors.
+        failed (bool): Set once a stage raised; later stages are skipped.
+        formed_at (float): ``time.monotonic()`` timestamp of batch formation.
+        stage_durations (Dict[str, float]): Seconds spent in each stage.
+        selections (List[Tuple[str, ...]]): Result fields selected per image.
+        steps (set): Computation steps needed by any image of the batch.
+        loaded_indices (List[int]): Output index of every loaded image.
+        cache_keys (Dict[int, str]): Result cache key per output index.
+        pending_writes (Dict[int, concurrent.futures.Future]): Background
+            writes of the converted input PNGs per output index.
+
+    Note:
+        Every other attribute is filled in by the stage that computes it and
+        read by the stages after it (see ``INFERENCE_STAGES``). Model steps
+        run once for the whole batch if any image needs them, so images with
+        different selections still share forward passes.
+    """
+
+    def __init__(self, input_data: List[dict]):
+        self.input_data = input_data
+        self.batch_size = len(input_data)
+        self.outputs = [
+            {
+                "image_id": None,
+                "is_inverted": None,
+                "lungs_found": None,
+                "lungs_bbox": None,
+                "abnormalities": None,
+                "is_normal": None,
+                "tb_score": None,
+                "heatmap": None,
+                "ctr": None,
+                "bone_suppressed": None,
+                "clahe": None,
+                "error": None,  # Add error field
+                "converted_png": None,
+                # A fallback replaced a failed computation; never returned
+                "degraded": False,
+            }
+            for _ in range(self.batch_size)
+        ]
+        self.failed = False
+        self.formed_at = time.monotonic()
+        self.stage_durations: Dict[str, float] = {}
+        self.selections = [parse_outputs(item) for item in input_data]
+        self.steps = set().union(
+            *(resolve_steps(fields) for fields in self.selections)
+        )
+
+        self.loaded_indices: List[int] = []
+        self.cache_keys: Dict[int, str] = {}
+        self.pending_writes: Dict[int, concurrent.futures.Future] = {}
+
+        self.image_uuids: List[str] = []
+        self.original_images: List[np.ndarray] = []
+        self.input_images: List[torch.Tensor] = []
+        self.is_inverted_list: List[bool] = []
+        self.lungs_bbox_list: List[List[int]] = []
+        self.maskss: List[np.ndarray] = []
+        self.abnormalitiess: List[List[Dict[str, Any]]] = []
+        self.heatmaps: List[np.ndarray] = []
+        self.overlays: List[np.ndarray] = []
+        self.tb_scores: List[float] = []
+        self.bone_suppressed_images: np.ndarray = None
+        self.ctrs: List[np.ndarray] = []
+        self.ctr_ratios: List[float] = []
+        self.clahes: List[np.ndarray] = []
+
+    def subset(self, indices: List[int]) -> "BatchContext":
+        """
+        Split off the given images into a new batch after decoding.
+
+        Args:
+            indices (List[int]): Output indices to keep, in order.
+
+        Returns:
+            BatchContext: A batch with the kept inputs, outputs, decoded
+                images and cache keys.
+        """
+        ctx = BatchContext([self.input_data[i] for i in indices])
+        ctx.outputs = [self.outputs[i] for i in indices]
+        ctx.formed_at = self.formed_at
+        ctx.stage_durations = dict(self.stage_durations)
+        positions = {index: p for p, index in enumerate(self.loaded_indices)}
+        for new_index, index in enumerate(indices):
+            if index in self.cache_keys:
+                ctx.cache_keys[new_index] = self.cache_keys[index]
+            if index in positions:
+                ctx.loaded_indices.append(new_index)
+                ctx.original_images.append(self.original_images[positions[index]])
+                ctx.image_uuids.append(self.image_uuids[positions[index]])
+        return ctx
+
+    def mark_degraded(self) -> None:
+        """Flag every output as holding fallback values, so none is cached."""
+        for output in self.outputs:
+            output["degraded"] = True
+
+    def partial_outputs(self) -> List[dict]:
+        """
+        Return the result fields known so far, before rendering and upload.
+
+        Returns:
+            List[dict]: One partial result per image, limited to the selected
+                fields. Contains whichever of ``is_inverted``, ``lungs_found``,
+                ``lungs_bbox``, ``abnormalities``, ``is_normal``, ``tb_score``
+                and ``ctr`` (ratio only) have been computed.
+
+        Note:
+            Values are deep copies, since later stages update the
+            abnormalities in place.
+        """
+        partials = []
+        for i, output in enumerate(self.outputs):
+            partial = {"image_id": output["image_id"], "error": output["error"]}
+            if not output.get("error"):
+                partial["is_inverted"] = output["is_inverted"]
+                if i < len(self.lungs_bbox_list):
+                    partial["lungs_found"] = self.lungs_bbox_list[i] is not None
+                    partial["lungs_bbox"] = self.lungs_bbox_list[i]
+                if i < len(self.abnormalitiess):
+                    partial["abnormalities"] = self.abnormalitiess[i]
+                    partial["is_normal"] = len(self.abnormalitiess[i]) == 0
+                if i < len(self.tb_scores):
+                    partial["tb_score"] = self.tb_scores[i]
+                if i < len(self.ctr_ratios):
+                    partial["ctr"] = {"ratio": self.ctr_ratios[i]}
+
+            fields = self.selections[i]
+            partials.append(
+                copy.deepcopy(
+                    {
+                        key: value
+                        for key, value in partial.items()
+                        if key in ("image_id", "error") or key in fields
+                    }
+                )
+            )
+        return partials
+
+    def selected_outputs(self) -> List[dict]:
+        """
+        Return the outputs reduced to the fields each request selected.
+
+        Returns:
+            List[dict]: One result per image with ``image_id``, ``error`` and
+                the selected fields.
+        """
+        return [
+            {
+                key: value
+                for key, value in output.items()
+                if key in ("image_id", "error") or key in fields
+            }
+            for output, fields in zip(self.outputs, self.selections)
+        ]
+
+
+async def safe_task(coro, error_value, ctx: Optional[BatchContext] = None):
+    """
+    Await a coroutine, returning ``error_value`` instead of raising.
+
+    Args:
+        coro: Coroutine to await.
+        error_value: Fallback value returned if the coroutine raises.
+        ctx (BatchContext, optional): Batch whose outputs are marked as
+            degraded when the fallback is used.
+
+    Returns:
+        The coroutine result, or ``error_value`` on failure.
+    """
+    try:
+        return await coro
+    except Exception as e:
+        print(f"Task failed: {e}")
+        if ctx is not None:
+            ctx.mark_degraded()
+        return error_value
+
+
+async def decode_images(ctx: BatchContext) -> None:
+    """
+    Load and resize every image in the batch.
+
+    Args:
+        ctx (BatchContext): Batch state; fills ``image_uuids``,
+            ``original_images`` and ``loaded_indices``.
+
+    Raises:
+        ValueError: If no image could be loaded.
+
+    Note:
+        All images of the batch are fetched and decoded concurrently.
+    """
+
+    async def load(i: int) -> np.ndarray:
+        # Get image asynchronously
+        original_image = await get_image(ctx.input_data[i])
+        if original_image.shape[:2] == (1024, 1024):
+            return original_image
+        return await run_in_executor(
+            "image",
+            cv2.resize,
+            original_image,
+            (1024, 1024),
+            interpolation=cv2.INTER_LINEAR,
+        )
+
+    for i in range(ctx.batch_size):
+        ctx.outputs[i]["image_id"] = str(uuid.uuid4())
+
+    loaded = await asyncio.gather(
+        *(load(i) for i in range(ctx.batch_size)), return_exceptions=True
+    )
+    for i, original_image in enumerate(loaded):
+        if isinstance(original_image, Exception):
+            ctx.outputs[i]["error"] = f"Failed to process image: {str(original_image)}"
+            continue
+        ctx.original_images.append(original_image)
+        ctx.image_uuids.append(ctx.outputs[i]["image_id"])
+        ctx.loaded_indices.append(i)
+
+    if not ctx.original_images:
+        raise ValueError("No valid images were processed")
+
+
+async def preprocess_images(ctx: BatchContext) -> None:
+    """
+    Turn the loaded images into model input tensors.
+
+    Args:
+        ctx (BatchContext): Batch state; fills ``input_images``.
+
+    Raises:
+        ValueError: If no image survived preprocessing.
+    """
+    # Preprocess images
+    for i, original_image in enumerate(ctx.original_images):
+        try:
+            input_image = await preprocessing(original_image)
+            ctx.input_images.append(input_image)
+        except Exception as e:
+            ctx.outputs[i]["error"] = f"Preprocessing failed: {str(e)}"
+            continue
+
+    # Continue only if we have valid preprocessed images
+    if not ctx.input_images:
+        raise ValueError("No images survived preprocessing")
+
+
+async def load_images(ctx: BatchContext) -> None:
+    """
+    Ingest stage: load, resize and preprocess every image in the batch.
+
+    Args:
+        ctx (BatchContext): Batch state; fills ``image_uuids``,
+            ``original_images`` and ``input_images``.
+
+    Raises:
+        ValueError: If no image could be loaded or preprocessed.
+    """
+    await decode_images(ctx)
+    await preprocess_images(ctx)
+
+
+async def run_models(ctx: BatchContext) -> None:
+    """
+    Inference stage: run every model forward pass for the batch.
+
+    Args:
+        ctx (BatchContext): Batch state; fills ``is_inverted_list``,
+            ``lungs_bbox_list``, ``maskss``, ``abnormalitiess``, ``heatmaps``,
+            ``overlays``, ``tb_scores`` and ``bone_suppressed_images``.
+    """
+    outputs = ctx.outputs
+    input_images = ctx.input_images
+
+    try:
+        is_inverted_list = await check_inverted(input_images, ctx.input_data)
+    except Exception as e:
+        print(f"Inversion check failed: {e}")
+        ctx.mark_degraded()
+        is_inverted_list = [False] * len(input_images)
+
+    for i in range(len(input_images)):
+        try:
+            if is_inverted_list[i]:
+                input_images[i] = 1 - input_images[i]
+
+            outputs[i]["is_inverted"] = bool(is_inverted_list[i])
+
+            # Validate input
+            is_valid_input = await check_validation(input_images[i])
+            if not is_valid_input:
+                outputs[i]["lungs_found"] = False
+                outputs[i]["error"] = "Invalid input image"
+                continue
+        except Exception as e:
+            outputs[i]["error"] = f"Validation failed: {str(e)}"
+            continue
+    ctx.is_inverted_list = is_inverted_list
+
+    # The three branches below only depend on the inversion-corrected inputs,
+    # so their model forward passes run side by side in the model pool.
+    # Steps no image of the batch selected are skipped.
+    steps = ctx.steps
+
+    async def lungs_and_tb():
+        # Get lung bounding box with error handling
+        ctx.lungs_bbox_list = [None] * len(input_images)
+        if "lung_bbox" in steps:
+            try:
+                ctx.lungs_bbox_list = await get_lung_bbox(input_images)
+            except Exception as e:
+                print(f"Lung detection failed: {e}")
+                ctx.mark_degraded()
+
+        ctx.tb_scores = [None] * ctx.batch_size
+        if "tb_score" in steps:
+            ctx.tb_scores = await safe_task(
+                get_tb_score(ctx.original_images, ctx.lungs_bbox_list),
+                [0.0] * ctx.batch_size,
+                ctx,
+            )
+
+    async def masks_and_detections():
+        # Wait for masks with error handling
+        ctx.maskss = [None] * len(input_images)
+        if "lung_masks" in steps:
+            try:
+                ctx.maskss = await get_lung_segmentation_masks(input_images)
+            except Exception as e:
+                print(f"Segmentation failed: {e}")
+                ctx.mark_degraded()
+
+        # Wait for RTDETR results
+        if "detections" in steps:
+            ctx.abnormalitiess, ctx.heatmaps, ctx.overlays = await safe_task(
+                rtdetr_infer(ctx.original_images, ctx.maskss), ([], [], []), ctx
+            )
+
+    async def bone_suppression():
+        if "bone_suppression" in steps:
+            ctx.bone_suppressed_images = await safe_task(
+                get_bone_suppressed_resnet(input_images, is_inverted_list), None, ctx
+            )
+
+    await asyncio.gather(lungs_and_tb(), masks_and_detections(), bone_suppression())
+
+
+async def render_results(ctx: BatchContext) -> None:
+    """
+    Post-processing stage: CTR drawing, segmentation contours, anatomical
+    locations and CLAHE images.
+
+    Args:
+        ctx (BatchContext): Batch state; fills ``ctrs``, ``ctr_ratios`` and
+            ``clahes`` and updates ``abnormalitiess`` in place.
+    """
+    input_images = ctx.input_images
+    abnormalitiess = ctx.abnormalitiess
+    steps = ctx.steps
+
+    (
+        ctr_results,
+        abnormalitiess_with_segmentation,
+        abnormalitiess_with_location,
+        ctx.clahes,
+    ) = await asyncio.gather(
+        (
+            safe_task(
+                get_ctr(ctx.original_images, ctx.lungs_bbox_list, ctx.maskss),
+                (None, [0.0] * len(input_images)),
+                ctx,
+            )
+            if "ctr" in steps
+            else skipped(([None] * ctx.batch_size, [None] * ctx.batch_size))
+        ),
+        (
+            safe_task(
+                add_segmentation(abnormalitiess, input_images, ctx.heatmaps), [], ctx
+            )
+            if "segmentation" in steps
+            else skipped([])
+        ),
+        (
+            safe_task(add_location_id(abnormalitiess, ctx.maskss), [], ctx)
+            if "location" in steps
+            else skipped([])
+        ),
+        (
+            safe_task(get_clahe_batch(input_images, ctx.is_inverted_list), [], ctx)
+            if "clahe" in steps
+            else skipped([])
+        ),
+    )
+
+    # Unpack CTR results safely
+    for i in range(ctx.batch_size):
+        ctx.ctrs.append(ctr_results[0][i])
+        ctx.ctr_ratios.append(ctr_results[1][i])
+
+    # Update abnormalities safely
+    try:
+        for (
+            abnormalities,
+            abnormalities_with_segmentation,
+            abnormalities_with_location,
+        ) in zip(
+            abnormalitiess,
+            abnormalitiess_with_segmentation,
+            abnormalitiess_with_location,
+        ):
+            for i, abnormality in enumerate(abnormalities):
+                if i < len(abnormalities_with_segmentation):
+                    abnormality.update(abnormalities_with_segmentation[i])
+                if i < len(abnormalities_with_location):
+                    abnormality.update(abnormalities_with_location[i])
+    except Exception as e:
+        print(f"Failed to update abnormalities: {e}")
+        ctx.mark_degraded()
+
+
+async def upload_results(ctx: BatchContext) -> None:
+    """
+    Upload stage: write the rendered artifacts and compile the outputs.
+
+    Args:
+        ctx (BatchContext): Batch state; fills ``outputs``.
+    """
+    # s3_uploader = S3Uploader()
+    s3_uploader = LocalUploader(base_path="/data/output")  # You can customize this path
+
+    image_uuids = ctx.image_uuids
+    abnormalitiess = ctx.abnormalitiess
+
+    # Prepare upload data, writing only the images each request selected
+    upload_tasks = []
+    for i in range(len(image_uuids)):
+        selected = ctx.selections[i]
+        upload_tasks.append(
+            s3_uploader.upload_array(ctx.overlays[i], image_uuids[i], "global-heatmap")
+            if "heatmap" in selected
+            else skipped(None)
+        )
+        upload_tasks.append(
+            s3_uploader.upload_array(
+                ctx.bone_suppressed_images[i], image_uuids[i], "bone-suppressed"
+            )
+            if "bone_suppressed" in selected
+            else skipped(None)
+        )
+        upload_tasks.append(
+            s3_uploader.upload_array(ctx.clahes[i], image_uuids[i], "contrast-enhanced")
+            if "clahe" in selected
+            else skipped(None)
+        )
+        upload_tasks.append(
+            s3_uploader.upload_array(ctx.ctrs[i], image_uuids[i], "ct-ratio")
+            if "ctr" in selected
+            else skipped(None)
+        )
+
+    # Execute all upload tasks
+    upload_results = await asyncio.gather(*upload_tasks, return_exceptions=True)
+
+    # Reshape results back into groups of 4 (one for each type of image)
+    upload_results = [
+        upload_results[i : i + 4] for i in range(0, len(upload_results), 4)
+    ]
+
+    # Update output dictionary safely
+    for i in range(ctx.batch_size):
+        if i < len(upload_results) and any(
+            isinstance(result, Exception) for result in upload_results[i]
+        ):
+            ctx.outputs[i]["degraded"] = True
+        if not ctx.outputs[i].get("error"):  # Only update if no previous errors
+            try:
+                ctx.outputs[i].update(
+                    {
+                        "lungs_found": bool(ctx.lungs_bbox_list[i] is not None),
+                        "lungs_bbox": ctx.lungs_bbox_list[i],
+                        "abnormalities": (
+                            abnormalitiess[i] if i < len(abnormalitiess) else []
+                        ),
+                        "is_normal": (
+                            len(abnormalitiess[i]) == 0
+                            if i < len(abnormalitiess)
+                            else True
+                        ),
+                        "tb_score": ctx.tb_scores[i],
+                        "heatmap": (upload_results[i][0]),
+                        "bone_suppressed": (upload_results[i][1]),
+                        "clahe": (upload_results[i][2]),
+                        "ctr": {
+                            "image": (upload_results[i][3]),
+                            "ratio": ctx.ctr_ratios[i],
+                        },
+                    }
+                )
+            except Exception as e:
+                ctx.outputs[i]["error"] = f"Failed to update output: {str(e)}"
+
+
+# Stages in execution order; each reads what the previous ones filled in.
+INFERENCE_STAGES = [load_images, run_models, render_results, upload_results]
+
+
+async def run_stage(ctx: BatchContext, stage) -> None:
+    """
+    Run one stage on a batch, recording a critical error if it raises.
+
+    Args:
+        ctx (BatchContext): Batch state passed to the stage.
+        stage: One of ``INFERENCE_STAGES``.
+
+    Note:
+        Stages are skipped once an earlier stage has failed, so a failed batch
+        can still flow through a pipeline and have its futures resolved.
+    """
+    if ctx.failed:
+        return
+    start = time.perf_counter()
+    try:
+        await stage(ctx)
+    except Exception as e:
+        print(f"Critical inference error: {e}")
+        ctx.failed = True
+        # Set error for all outputs that don't already have an error
+        for output in ctx.outputs:
+            if not output.get("error"):
+                output["error"] = f"Critical inference error: {str(e)}"
+    finally:
+        ctx.stage_durations[stage.__name__] = time.perf_counter() - start
+
+
 async def batch_inference(input_data: List[dict]) -> List[dict]:
     """Perform comprehensive chest X-ray analysis on a batch of images.
 
@@ -1550,14 +2402,21 @@ async def batch_inference(input_data: List[dict]) -> List[dict]:
         input_data (List[dict]): List of dictionaries containing image information.
             Each dictionary must contain:
 
-            - **url** (*str*): URL of the image (required).
+            - **url** (*str*): URL of the image (required unless
+              ``image`` is given).
 
             Optional keys:
 
+            - **image** (*np.ndarray*): Decoded grayscale image, used instead
+              of loading ``url``.
+
             - **isInverted** (*bool*): Manual flag for image inversion.
+            - **outputs** (*List[str]*): Result fields to compute, from
+              ``OUTPUT_FIELDS``. Defaults to all of them.
 
     Returns:
-        List[dict]: List of analysis results for each image. Each dictionary includes:
+        List[dict]: List of analysis results for each image, limited to the
+        selected fields. Each dictionary may include:
 
         - **image_id** (*str*): Unique identifier.
         - **is_inverted** (*bool*): Whether the image was processed as inverted.
@@ -1574,10 +2433,13 @@ async def batch_inference(input_data: List[dict]) -> List[dict]:
 
         - **bone_suppressed** (*str*): URL to bone-suppressed image.
         - **clahe** (*str*): URL to contrast-enhanced image.
+        - **converted_png** (*str*): Path of the converted input PNG, if the
+          caller wrote one (see ``InferencePipeline``).
         - **error** (*str*): Error message if processing failed.
 
     Raises:
-        ValueError: If input data list is empty or no valid images were processed.
+        ValueError: If input data list is empty, ``outputs`` names an unknown
+            field or no valid images were processed.
 
     Notes:
         **Processing pipeline:**
@@ -1604,6 +2466,11 @@ async def batch_inference(input_data: List[dict]) -> List[dict]:
            - Uploads results to S3.
            - Compiles output dictionaries.
 
+        Each step is one of ``INFERENCE_STAGES``; ``src.pipeline`` runs the
+        same stages concurrently across consecutive batches. Within a stage,
+        only the computations the selected fields depend on are run (see
+        ``FIELD_DEPENDENCIES`` and ``STEP_DEPENDENCIES``).
+
         **Error handling:**
 
         - Individual image failures do not stop batch processing.
@@ -1615,254 +2482,7 @@ async def batch_inference(input_data: List[dict]) -> List[dict]:
     if not input_data:
         raise ValueError("Input data list cannot be empty")
 
-    batch_size = len(input_data)
-    outputs = [
-        {
-            "image_id": None,
-            "is_inverted": None,
-            "lungs_found": None,
-            "lungs_bbox": None,
-            "abnormalities": None,
-            "is_normal": None,
-            "tb_score": None,
-            "heatmap": None,
-            "ctr": None,
-            "bone_suppressed": None,
-            "clahe": None,
-            "error": None,  # Add error field
-            "converted_png":None
-        }
-        for _ in range(batch_size)
-    ]
-    # s3_uploader = S3Uploader()
-    s3_uploader = LocalUploader(base_path="/data/output")  # You can customize this path
-
-
-    try:
-        # Process images in batch
-        original_images = []
-        image_uuids = []
-        for i in range(batch_size):
-            try:
-                image_uuid = str(uuid.uuid4())
-                outputs[i]["image_id"] = image_uuid
-
-                # Get image asynchronously
-                original_image = await get_image(input_data[i])
-                original_image = cv2.resize(
-                    original_image, (1024, 1024), interpolation=cv2.INTER_LINEAR
-                )
-                original_images.append(original_image)
-                image_uuids.append(image_uuid)
-            except Exception as e:
-                outputs[i]["error"] = f"Failed to process image: {str(e)}"
-                continue
-
-        if not original_images:
-            raise ValueError("No valid images were processed")
-
-        # Preprocess images
-        input_images = []
-        for i, original_image in enumerate(original_images):
-            try:
-                input_image = await preprocessing(original_image)
-                input_images.append(input_image)
-            except Exception as e:
-                outputs[i]["error"] = f"Preprocessing failed: {str(e)}"
-                continue
-
-        # Continue only if we have valid preprocessed images
-        if not input_images:
-            raise ValueError("No images survived preprocessing")
-
-        try:
-            is_inverted_list = await check_inverted(input_images, input_data)
-        except Exception as e:
-            print(f"Inversion check failed: {e}")
-            is_inverted_list = [False] * len(input_images)
-
-        for i in range(len(input_images)):
-            try:
-                if is_inverted_list[i]:
-                    input_images[i] = 1 - input_images[i]
-
-                outputs[i]["is_inverted"] = bool(is_inverted_list[i])
-
-                # Validate input
-                is_valid_input = await check_validation(input_images[i])
-                if not is_valid_input:
-                    outputs[i]["lungs_found"] = False
-                    outputs[i]["error"] = "Invalid input image"
-                    continue
-            except Exception as e:
-                outputs[i]["error"] = f"Validation failed: {str(e)}"
-                continue
-
-        # Get lung bounding box with error handling
-        try:
-            lungs_bbox_list = await get_lung_bbox(input_images)
-        except Exception as e:
-            print(f"Lung detection failed: {e}")
-            lungs_bbox_list = [None] * len(input_images)
-
-        # Launch independent tasks with error handling
-        result_tasks = []
-
-        # Add tasks with error handling wrappers
-        async def safe_task(coro, error_value):
-            try:
-                return await coro
-            except Exception as e:
-                print(f"Task failed: {e}")
-                return error_value
-
-        result_tasks.extend(
-            [
-                safe_task(
-                    get_tb_score(original_images, lungs_bbox_list), [0.0] * batch_size
-                ),
-                safe_task(
-                    get_bone_suppressed_resnet(input_images, is_inverted_list), None
-                ),
-            ]
-        )
-
-        # Wait for masks with error handling
-        try:
-            maskss = await get_lung_segmentation_masks(input_images)
-        except Exception as e:
-            print(f"Segmentation failed: {e}")
-            maskss = [None] * len(input_images)
-
-        # Add dependent tasks with error handling
-        result_tasks.extend(
-            [
-                safe_task(
-                    get_ctr(original_images, lungs_bbox_list, maskss),
-                    (None, [0.0] * len(input_images)),
-                ),
-                safe_task(rtdetr_infer(original_images, maskss), ([], [], [])),
-            ]
-        )
-
-        # Wait for RTDETR results
-        try:
-            abnormalitiess, heatmaps, overlays = await result_tasks.pop()
-        except Exception as e:
-            print(f"RTDETR inference failed: {e}")
-            abnormalitiess, heatmaps, overlays = [], [], []
-
-        # Add remaining tasks
-        result_tasks.extend(
-            [
-                safe_task(add_segmentation(abnormalitiess, input_images, heatmaps), []),
-                safe_task(add_location_id(abnormalitiess, maskss), []),
-                safe_task(get_clahe_batch(input_images, is_inverted_list), []),
-            ]
-        )
-
-        # Gather all results
-        try:
-            results = await asyncio.gather(*result_tasks)
-            tb_scores, bone_suppressed_images, ctr_results, *other_results = results
-            abnormalitiess_with_segmentation, abnormalitiess_with_location, clahes = (
-                other_results
-            )
-        except Exception as e:
-            print(f"Failed to gather results: {e}")
-            return outputs
-
-        # Unpack CTR results safely
-        ctrs = []
-        ctr_ratios = []
-        for i in range(batch_size):
-            ctr = ctr_results[0][i]
-            ctr_ratio = ctr_results[1][i]
-            ctrs.append(ctr)
-            ctr_ratios.append(ctr_ratio)
-
-        # Update abnormalities safely
-        try:
-            for (
-                abnormalities,
-                abnormalities_with_segmentation,
-                abnormalities_with_location,
-            ) in zip(
-                abnormalitiess,
-                abnormalitiess_with_segmentation,
-                abnormalitiess_with_location,
-            ):
-                for i, abnormality in enumerate(abnormalities):
-                    if i < len(abnormalities_with_segmentation):
-                        abnormality.update(abnormalities_with_segmentation[i])
-                    if i < len(abnormalities_with_location):
-                        abnormality.update(abnormalities_with_location[i])
-        except Exception as e:
-            print(f"Failed to update abnormalities: {e}")
-
-        # Prepare upload data
-        upload_tasks = []
-        for i in range(len(image_uuids)):
-            upload_tasks.append(
-                s3_uploader.upload_array(overlays[i], image_uuids[i], "global-heatmap")
-            )
-            upload_tasks.append(
-                s3_uploader.upload_array(
-                    bone_suppressed_images[i], image_uuids[i], "bone-suppressed"
-                )
-            )
-            upload_tasks.append(
-                s3_uploader.upload_array(clahes[i], image_uuids[i], "contrast-enhanced")
-            )
-            upload_tasks.append(
-                s3_uploader.upload_array(ctrs[i], image_uuids[i], "ct-ratio")
-            )
-
-        # Execute all upload tasks
-        upload_results = await asyncio.gather(*upload_tasks, return_exceptions=True)
-
-        # Reshape results back into groups of 4 (one for each type of image)
-        upload_results = [
-            upload_results[i : i + 4] for i in range(0, len(upload_results), 4)
-        ]
-
-        # Update output dictionary safely
-        for i in range(batch_size):
-            if not outputs[i].get("error"):  # Only update if no previous errors
-                try:
-                    outputs[i].update(
-                        {
-                            "lungs_found": bool(lungs_bbox_list[i] is not None),
-                            "lungs_bbox": lungs_bbox_list[i],
-                            "abnormalities": (
-                                abnormalitiess[i] if i < len(abnormalitiess) else []
-                            ),
-                            "is_normal": (
-                                len(abnormalitiess[i]) == 0
-                                if i < len(abnormalitiess)
-                                else True
-                            ),
-                            "tb_score": tb_scores[i],
-                            "heatmap": (upload_results[i][0]),
-                            "bone_suppressed": (upload_results[i][1]),
-                            "clahe": (upload_results[i][2]),
-                            "ctr": {
-                                "image": (upload_results[i][3]),
-                                "ratio": ctr_ratios[i],
-                            
-                            },
-                            "converted_png": input_data[i].get("url", "").replace("file://", ""),
-                        }
-                    )
-                except Exception as e:
-                    outputs[i]["error"] = f"Failed to update output: {str(e)}"
-
-        return outputs
-
-    except Exception as e:
-        print(f"Critical inference error: {e}")
-        # Set error for all outputs that don't already have an error
-        for output in outputs:
-            if not output.get("error"):
-                output["error"] = f"Critical inference error: {str(e)}"
-        return outputs
+    ctx = BatchContext(input_data)
+    for stage in INFERENCE_STAGES:
+        await run_stage(ctx, stage)
+    return ctx.selected_outputs()
@@ -0,0 +1,204 @@
+import asyncio
+import collections
+import time
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from src import metrics
+
+# Priority lanes, in the order batches are filled
+PRIORITIES = ("high", "low")
+
+
+class BatchItem:
+    """
+    A single queued inference request.
+
+    Attributes:
+        data (Dict[str, Any]): Input data dictionary from the request.
+        future (asyncio.Future): Future resolved with the inference result.
+        priority (str): Lane of the request, one of ``PRIORITIES``.
+        enqueued_at (float): ``time.monotonic()`` timestamp of arrival.
+        listener (Optional[Callable[[str, dict], None]]): Called with the
+            stage name and a partial result as stages complete.
+    """
+
+    __slots__ = ("data", "future", "priority", "enqueued_at", "listener")
+
+    def __init__(
+        self,
+        data: Dict[str, Any],
+        future: asyncio.Future,
+        priority: str = "high",
+        listener: Optional[Callable[[str, dict], None]] = None,
+    ):
+        self.data = data
+        self.future = future
+        self.priority = priority
+        self.enqueued_at = time.monotonic()
+        self.listener = listener
+
+
+class MicroBatcher:
+    """
+    Event-driven micro-batcher for inference requests with priority lanes.
+
+    Requests are appended to an O(1) deque per priority lane and wake the
+    consumer immediately. A batch is released as soon as ``batch_size`` items
+    are queued across all lanes, or once ``max_wait_time`` seconds have passed
+    since the oldest queued item arrived.
+
+    Batches are filled from the high-priority lane first. To keep bulk
+    backfills moving, once the oldest low-priority item has waited longer than
+    ``starvation_timeout`` seconds, every batch reserves ``low_priority_slots``
+    slots for the low lane.
+
+    Args:
+        batch_size (int): Maximum number of items per batch.
+        max_wait_time (float): Maximum seconds (fractional allowed) the oldest
+            item may wait before a partial batch is flushed.
+        starvation_timeout (float, optional): Seconds after which the low lane
+            is guaranteed slots. Defaults to 30.
+        low_priority_slots (int, optional): Slots reserved for a starved low
+            lane. Defaults to 1.
+
+    Note:
+        The wake-up event is re-created per event loop so that a module-level
+        batcher can be shared by test clients running on different loops.
+        Items whose future is already done (the client disconnected or timed
+        out) are dropped at batch formation and never occupy a batch slot.
+    """
+
+    def __init__(
+        self,
+        batch_size: int,
+        max_wait_time: float,
+        starvation_timeout: float = 30.0,
+        low_priority_slots: int = 1,
+    ):
+        self.batch_size = max(1, int(batch_size))
+        self.max_wait_time = max(0.0, float(max_wait_time))
+        self.starvation_timeout = float(starvation_timeout)
+        self.low_priority_slots = max(1, int(low_priority_slots))
+        self._lanes: Dict[str, Deque[BatchItem]] = {
+            priority: collections.deque() for priority in PRIORITIES
+        }
+        self._event: Optional[asyncio.Event] = None
+        self._event_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def __len__(self) -> int:
+        return sum(len(lane) for lane in self._lanes.values())
+
+    def depths(self) -> Dict[str, int]:
+        """
+        Return the number of queued items per priority lane.
+
+        Returns:
+            Dict[str, int]: Lane name to queue depth.
+        """
+        return {priority: len(lane) for priority, lane in self._lanes.items()}
+
+    def _wakeup(self) -> asyncio.Event:
+        """Return the wake-up event bound to the running loop."""
+        loop = asyncio.get_running_loop()
+        if self._event is None or self._event_loop is not loop:
+            self._event = asyncio.Event()
+            self._event_loop = loop
+        return self._event
+
+    def enqueue(
+        self,
+        data: Dict[str, Any],
+        priority: str = "high",
+        listener: Optional[Callable[[str, dict], None]] = None,
+    ) -> asyncio.Future:
+        """
+        Queue a request and wake the consumer.
+
+        Args:
+            data (Dict[str, Any]): Input data dictionary for inference.
+            priority (str, optional): ``"high"`` for interactive requests or
+                ``"low"`` for bulk work. Defaults to ``"high"``.
+            listener (Callable[[str, dict], None], optional): Receives partial
+                results as stages complete. Defaults to None.
+
+        Returns:
+            asyncio.Future: Future resolved with the inference result.
+
+        Raises:
+            ValueError: If ``priority`` is not a known lane.
+        """
+        if priority not in self._lanes:
+            raise ValueError(f"Unknown priority: {priority}")
+        future = asyncio.get_running_loop().create_future()
+        self._lanes[priority].append(BatchItem(data, future, priority, listener))
+        self._wakeup().set()
+        return future
+
+    def _drop_abandoned_heads(self) -> None:
+        for lane in self._lanes.values():
+            while lane and lane[0].future.done():
+                lane.popleft()
+                metrics.increment("abandoned_skipped")
+
+    def _oldest_enqueued_at(self) -> float:
+        return min(lane[0].enqueued_at for lane in self._lanes.values() if lane)
+
+    def _take_from(self, lane: Deque[BatchItem], batch: List[BatchItem], limit: int):
+        while lane and len(batch) < limit:
+            item = lane.popleft()
+            if item.future.done():
+                metrics.increment("abandoned_skipped")
+                continue
+            batch.append(item)
+
+    def _take(self) -> List[BatchItem]:
+        high, low = self._lanes["high"], self._lanes["low"]
+        batch: List[BatchItem] = []
+
+        starved = bool(low) and (
+            time.monotonic() - low[0].enqueued_at >= self.starvation_timeout
+        )
+        if starved:
+            reserved = min(self.low_priority_slots, self.batch_size)
+            self._take_from(low, batch, reserved)
+            metrics.increment("low_priority_promoted", len(batch))
+
+        self._take_from(high, batch, self.batch_size)
+        self._take_from(low, batch, self.batch_size)
+        return batch
+
+    async def next_batch(self) -> List[BatchItem]:
+        """
+        Wait for and return the next batch of queued items.
+
+        Returns:
+            List[BatchItem]: Between 1 and ``batch_size`` items.
+        """
+        event = self._wakeup()
+        while True:
+            self._drop_abandoned_heads()
+            if not len(self):
+                event.clear()
+                await event.wait()
+                continue
+
+            if len(self) >= self.batch_size:
+                batch = self._take()
+                if batch:
+                    return batch
+                continue
+
+            remaining = (
+                self._oldest_enqueued_at() + self.max_wait_time - time.monotonic()
+            )
+            if remaining <= 0:
+                batch = self._take()
+                if batch:
+                    return batch
+                continue
+
+            event.clear()
+            try:
+                await asyncio.wait_for(event.wait(), timeout=remaining)
+            except asyncio.TimeoutError:
+                pass
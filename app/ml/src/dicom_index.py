@@ -0,0 +1,342 @@
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import pydicom
+from pydicom.errors import InvalidDicomError
+
+# Modalities of plain radiographs; other series are not chest X-rays
+CXR_MODALITIES = ("CR", "DX")
+
+# Header attribute stored per file, by column name
+INDEXED_ATTRIBUTES = {
+    "sop_instance_uid": "SOPInstanceUID",
+    "study_uid": "StudyInstanceUID",
+    "series_uid": "SeriesInstanceUID",
+    "patient_id": "PatientID",
+    "modality": "Modality",
+    "body_part": "BodyPartExamined",
+    "view_position": "ViewPosition",
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    is_dicom INTEGER NOT NULL,
+    sop_instance_uid TEXT,
+    study_uid TEXT,
+    series_uid TEXT,
+    patient_id TEXT,
+    modality TEXT,
+    body_part TEXT,
+    view_position TEXT,
+    instance_number INTEGER,
+    frames INTEGER,
+    processed_at REAL
+);
+CREATE INDEX IF NOT EXISTS files_study ON files (study_uid);
+CREATE INDEX IF NOT EXISTS files_patient ON files (patient_id);
+"""
+
+
+def read_header(path: str) -> Optional[Dict[str, Any]]:
+    """
+    Read the indexed attributes of a file without its pixel data.
+
+    Args:
+        path (str): File to read.
+
+    Returns:
+        Optional[Dict[str, Any]]: Column values, or None if the file is not
+            DICOM or cannot be parsed.
+    """
+    try:
+        header = pydicom.dcmread(path, stop_before_pixels=True)
+    except InvalidDicomError:
+        return None
+    except Exception as e:
+        print(f"Failed to read DICOM header of {path}: {e}")
+        return None
+    row = {
+        column: str(header.get(keyword, "")) or None
+        for column, keyword in INDEXED_ATTRIBUTES.items()
+    }
+    row["instance_number"] = int(header.get("InstanceNumber") or 0)
+    row["frames"] = int(header.get("NumberOfFrames") or 1) if "Rows" in header else 0
+    return row
+
+
+class DicomIndex:
+    """
+    SQLite index of DICOM header attributes for planning bulk work.
+
+    Folders are scanned with header-only reads, so study grouping, modality
+    filtering and finding processed studies never touch pixel data. Rescans
+    only read files whose size or modification time changed and drop files
+    that no longer exist.
+
+    Args:
+        db_path (str): SQLite database file, created if missing. Keep it
+            outside the scanned folders.
+
+    Note:
+        Methods block on disk I/O and are safe to call from several threads;
+        call them through the ``io`` pool from async code.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def update(self, folder: str) -> Dict[str, int]:
+        """
+        Bring the index of a folder (including subfolders) up to date.
+
+        Args:
+            folder (str): Folder to scan.
+
+        Returns:
+            Dict[str, int]: Number of ``indexed`` (new or changed),
+                ``unchanged`` and ``removed`` files.
+        """
+        folder = os.path.abspath(folder)
+        prefix = os.path.join(folder, "")
+        with self._lock:
+            known = {
+                row["path"]: (row["mtime_ns"], row["size"])
+                for row in self._db.execute(
+                    "SELECT path, mtime_ns, size FROM files"
+                    " WHERE substr(path, 1, ?) = ?",
+                    (len(prefix), prefix),
+                )
+            }
+
+        paths = [
+            os.path.join(root, file)
+            for root, _, files in os.walk(folder)
+            for file in files
+        ]
+        rows, seen = self._read_rows(paths, known)
+        removed = [(path,) for path in known if path not in seen]
+        with self._lock, self._db:
+            self._write_rows(rows)
+            self._db.executemany("DELETE FROM files WHERE path = ?", removed)
+        return {
+            "indexed": len(rows),
+            "unchanged": len(seen) - len(rows),
+            "removed": len(removed),
+        }
+
+    @staticmethod
+    def _read_rows(
+        paths: Iterable[str], known: Dict[str, Tuple[int, int]]
+    ) -> Tuple[List[Dict[str, Any]], Set[str]]:
+        """
+        Read the headers of the new or changed files.
+
+        Args:
+            paths (Iterable[str]): Absolute file paths.
+            known (Dict[str, Tuple[int, int]]): Indexed ``(mtime_ns, size)``
+                per path.
+
+        Returns:
+            Tuple[List[Dict[str, Any]], Set[str]]: Rows to write and the paths that
+                still exist.
+        """
+        rows, seen = [], set()
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            seen.add(path)
+            if known.get(path) == (stat.st_mtime_ns, stat.st_size):
+                continue
+            header = read_header(path)
+            rows.append(
+                {
+                    **dict.fromkeys(INDEXED_ATTRIBUTES),
+                    "instance_number": None,
+                    "frames": None,
+                    **(header or {}),
+                    "path": path,
+                    "mtime_ns": stat.st_mtime_ns,
+                    "size": stat.st_size,
+                    "is_dicom": int(header is not None),
+                }
+            )
+        return rows, seen
+
+    def _write_rows(self, rows: List[Dict[str, Any]]) -> None:
+        columns = ["path", "mtime_ns", "size", "is_dicom", *INDEXED_ATTRIBUTES]
+        columns += ["instance_number", "frames"]
+        # A changed file has to be processed again
+        self._db.executemany(
+            f"INSERT OR REPLACE INTO files ({', '.join(columns)})"
+            f" VALUES ({', '.join(':' + column for column in columns)})",
+            rows,
+        )
+
+    def studies(
+        self,
+        modalities: Optional[Iterable[str]] = CXR_MODALITIES,
+        processed: Optional[bool] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        List the indexed studies.
+
+        Args:
+            modalities (Iterable[str], optional): Only count series of these
+                modalities; None for all. Defaults to ``CXR_MODALITIES``.
+            processed (bool, optional): Only studies whose files are all
+                (True) or not all (False) processed; None for all.
+                Defaults to None.
+
+        Returns:
+            List[Dict[str, Any]]: ``study_uid``, ``patient_id``, ``series``,
+                ``files``, ``frames`` and ``processed`` per study.
+        """
+        query = (
+            "SELECT study_uid, MIN(patient_id) AS patient_id,"
+            " COUNT(DISTINCT series_uid) AS series, COUNT(*) AS files,"
+            " SUM(frames) AS frames, COUNT(processed_at) = COUNT(*) AS processed"
+            " FROM files WHERE is_dicom = 1 AND frames > 0"
+        )
+        params: List[Any] = []
+        if modalities is not None:
+            modalities = list(modalities)
+            query += f" AND modality IN ({', '.join('?' * len(modalities))})"
+            params += modalities
+        query += " GROUP BY study_uid"
+        if processed is not None:
+            query += " HAVING (COUNT(processed_at) = COUNT(*)) = ?"
+            params.append(int(processed))
+        query += " ORDER BY study_uid"
+        with self._lock:
+            rows = self._db.execute(query, params).fetchall()
+        return [{**dict(row), "processed": bool(row["processed"])} for row in rows]
+
+    def files(
+        self, study_uid: str, modalities: Optional[Iterable[str]] = CXR_MODALITIES
+    ) -> List[Dict[str, Any]]:
+        """
+        List the image files of a study.
+
+        Args:
+            study_uid (str): StudyInstanceUID.
+            modalities (Iterable[str], optional): Only files of these
+                modalities; None for all. Defaults to ``CXR_MODALITIES``.
+
+        Returns:
+            List[Dict[str, Any]]: Indexed columns per file, ordered by series
+                and instance number.
+        """
+        query = (
+            "SELECT * FROM files"
+            " WHERE study_uid = ? AND is_dicom = 1 AND frames > 0"
+        )
+        params: List[Any] = [study_uid]
+        if modalities is not None:
+            modalities = list(modalities)
+            query += f" AND modality IN ({', '.join('?' * len(modalities))})"
+            params += modalities
+        query += " ORDER BY series_uid, instance_number, path"
+        with self._lock:
+            return [dict(row) for row in self._db.execute(query, params)]
+
+    def mark_processed(self, paths: Iterable[str]) -> None:
+        """
+        Record that files went through inference.
+
+        Files that are not indexed yet, or changed since, are indexed first,
+        so inputs processed outside a scanned folder are recorded too.
+
+        Args:
+            paths (Iterable[str]): Paths of the processed files.
+        """
+        paths = sorted({os.path.abspath(path) for path in paths})
+        if not paths:
+            return
+        with self._lock:
+            known = {}
+            for path in paths:
+                row = self._db.execute(
+                    "SELECT mtime_ns, size FROM files WHERE path = ?", (path,)
+                ).fetchone()
+                if row is not None:
+                    known[path] = (row["mtime_ns"], row["size"])
+        rows, _ = self._read_rows(paths, known)
+
+        now = time.time()
+        with self._lock, self._db:
+            self._write_rows(rows)
+            self._db.executemany(
+                "UPDATE files SET processed_at = ? WHERE path = ?",
+                [(now, path) for path in paths],
+            )
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._db.close()
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    """
+    Index a folder and print its studies as JSON lines, for planning batches.
+
+    Args:
+        argv (Sequence[str], optional): Command line arguments; defaults to
+            ``sys.argv[1:]``.
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m src.dicom_index",
+        description="Index the DICOM headers of a folder and list its studies.",
+    )
+    parser.add_argument("db_path", help="SQLite index file, created if missing")
+    parser.add_argument("folder", help="Folder to scan, including subfolders")
+    status = parser.add_mutually_exclusive_group()
+    status.add_argument(
+        "--unprocessed", action="store_true", help="Only studies still to process"
+    )
+    status.add_argument(
+        "--processed", action="store_true", help="Only fully processed studies"
+    )
+    parser.add_argument(
+        "--all-modalities",
+        action="store_true",
+        help=f"Also list series that are not {'/'.join(CXR_MODALITIES)}",
+    )
+    parser.add_argument(
+        "--paths", action="store_true", help="Include the image files of each study"
+    )
+    args = parser.parse_args(argv)
+
+    processed = True if args.processed else False if args.unprocessed else None
+    modalities = None if args.all_modalities else CXR_MODALITIES
+    index = DicomIndex(args.db_path)
+    try:
+        print(json.dumps(index.update(args.folder)))
+        for study in index.studies(modalities=modalities, processed=processed):
+            if args.paths:
+                study["paths"] = [
+                    row["path"] for row in index.files(study["study_uid"], modalities)
+                ]
+            print(json.dumps(study))
+    finally:
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+# Thread pool sizes per stage class
+POOL_SIZES = {
+    # Model forward passes; independent models of one batch run side by side
+    "model": int(os.environ.get("MODEL_POOL_WORKERS", 4)),
+    # CPU-bound image operations (OpenCV, skimage, numpy)
+    "image": int(os.environ.get("IMAGE_POOL_WORKERS", min(8, os.cpu_count() or 1))),
+    # Blocking file system and network calls (disk writes, boto3)
+    "io": int(os.environ.get("IO_POOL_WORKERS", 8)),
+}
+
+_executors: Dict[str, ThreadPoolExecutor] = {}
+
+
+def get_executor(stage: str) -> ThreadPoolExecutor:
+    """
+    Return the thread pool for a stage class, creating it on first use.
+
+    Args:
+        stage (str): One of the keys of ``POOL_SIZES``.
+
+    Returns:
+        ThreadPoolExecutor: The shared pool for that stage class.
+    """
+    if stage not in _executors:
+        _executors[stage] = ThreadPoolExecutor(
+            max_workers=max(1, POOL_SIZES[stage]), thread_name_prefix=f"{stage}-pool"
+        )
+    return _executors[stage]
+
+
+async def run_in_executor(stage: str, func: Callable, *args, **kwargs) -> Any:
+    """
+    Run a blocking callable in the stage's pool without blocking the event loop.
+
+    Args:
+        stage (str): Stage class, one of ``"model"``, ``"image"`` or ``"io"``.
+        func (Callable): Blocking function to run.
+        *args: Positional arguments for ``func``.
+        **kwargs: Keyword arguments for ``func``.
+
+    Returns:
+        Any: The return value of ``func``.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_executor(stage), functools.partial(func, *args, **kwargs)
+    )
+
+
+def offload(stage: str) -> Callable:
+    """
+    Decorator turning a blocking function into an awaitable that runs in a pool.
+
+    Args:
+        stage (str): Stage class, one of ``"model"``, ``"image"`` or ``"io"``.
+
+    Returns:
+        Callable: Decorator producing a coroutine function with the same
+            signature as the wrapped function.
+
+    Example:
+        >>> @offload("image")
+        ... def blur(image):
+        ...     return cv2.GaussianBlur(image, (5, 5), 0)
+        >>> blurred = await blur(image)
+    """
+
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            return await run_in_executor(stage, func, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def shutdown_executors() -> None:
+    """
+    Shut down all stage pools, waiting for running work to finish.
+    """
+    for executor in _executors.values():
+        executor.shutdown(wait=True)
+    _executors.clear()
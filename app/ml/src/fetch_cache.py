@@ -0,0 +1,236 @@
+import collections
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Mapping, Optional, OrderedDict, Tuple
+
+from src import metrics
+from src.executors import run_in_executor
+from src.http_client import fetch, fetch_bytes
+
+# Disk cache settings for remote image downloads
+FETCH_CACHE_SETTINGS = {
+    # Whether remote images are cached at all
+    "enabled": os.environ.get("FETCH_CACHE", "True") == "True",
+    "cache_dir": os.environ.get("FETCH_CACHE_DIR", "/data/fetch_cache"),
+    # Max total size of cached downloads in bytes
+    "max_bytes": int(os.environ.get("FETCH_CACHE_BYTES", 2 * 1024**3)),
+    # Seconds a download is served without contacting the origin; after that
+    # it is revalidated with a conditional GET
+    "ttl": float(os.environ.get("FETCH_CACHE_TTL", 86400)),
+}
+
+
+class FetchCache:
+    """
+    Bounded on-disk cache of remote downloads, keyed by URL.
+
+    Each entry stores the body together with the ``ETag`` and
+    ``Last-Modified`` validators. Entries younger than ``ttl`` seconds are
+    served without network I/O; older ones are revalidated with a conditional
+    GET, and a ``304 Not Modified`` keeps the cached body. Least recently
+    used entries are evicted once the cache exceeds ``max_bytes``.
+
+    Args:
+        cache_dir (str): Directory of the cached files.
+        max_bytes (int): Maximum total size of the cache.
+        ttl (float): Seconds an entry is served without revalidation.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int, ttl: float):
+        self.cache_dir = cache_dir
+        self.max_bytes = max(0, int(max_bytes))
+        self.ttl = float(ttl)
+        # Entries in least-recently-used order, with their size on disk
+        self._index: Optional[OrderedDict[str, int]] = None
+        self._total = 0
+        self._lock = threading.Lock()
+
+    def _paths(self, key: str) -> Tuple[str, str]:
+        folder = os.path.join(self.cache_dir, key[:2])
+        return os.path.join(folder, f"{key}.bin"), os.path.join(folder, f"{key}.json")
+
+    @staticmethod
+    def _key(url: str) -> str:
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    def _load_index(self) -> OrderedDict:
+        if self._index is None:
+            entries = []
+            for root, _, files in os.walk(self.cache_dir):
+                for name in files:
+                    if name.endswith(".json"):
+                        key = name[:-5]
+                        body_path, meta_path = self._paths(key)
+                        try:
+                            size = os.path.getsize(body_path) + os.path.getsize(
+                                meta_path
+                            )
+                            entries.append((os.path.getmtime(meta_path), key, size))
+                        except OSError:
+                            continue
+            self._index = collections.OrderedDict(
+                (key, size) for _, key, size in sorted(entries)
+            )
+            self._total = sum(self._index.values())
+        return self._index
+
+    def lookup(self, url: str) -> Optional[Tuple[dict, bytes]]:
+        """
+        Read a cached download.
+
+        Args:
+            url (str): Requested URL.
+
+        Returns:
+            Optional[Tuple[dict, bytes]]: Entry metadata (validators and
+                ``fetched_at``) and body, or None if not cached.
+        """
+        key = self._key(url)
+        with self._lock:
+            try:
+                if key not in self._load_index():
+                    return None
+            except OSError as e:
+                print(f"Fetch cache read failed: {e}")
+                return None
+
+        # Read outside the lock so lookups of different URLs run in parallel;
+        # files are only ever replaced atomically
+        body_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(body_path, "rb") as f:
+                body = f.read()
+            os.utime(meta_path)
+        except FileNotFoundError:
+            # Evicted since the index check
+            return None
+        except (OSError, ValueError) as e:
+            print(f"Fetch cache read failed: {e}")
+            return None
+
+        with self._lock:
+            if key in self._index:
+                self._index.move_to_end(key)
+        return meta, body
+
+    def store(
+        self, url: str, headers: Mapping[str, str], body: Optional[bytes]
+    ) -> None:
+        """
+        Store or refresh a download.
+
+        Args:
+            url (str): Requested URL.
+            headers (Mapping[str, str]): Response headers with the validators.
+            body (Optional[bytes]): New body, or None to keep the cached body
+                after a ``304 Not Modified``.
+        """
+        key = self._key(url)
+        meta = {
+            "url": url,
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "fetched_at": time.time(),
+        }
+        with self._lock:
+            try:
+                index = self._load_index()
+                body_path, meta_path = self._paths(key)
+                os.makedirs(os.path.dirname(body_path), exist_ok=True)
+                if body is not None:
+                    with open(f"{body_path}.tmp", "wb") as f:
+                        f.write(body)
+                    os.replace(f"{body_path}.tmp", body_path)
+                payload = json.dumps(meta).encode("utf-8")
+                with open(f"{meta_path}.tmp", "wb") as f:
+                    f.write(payload)
+                os.replace(f"{meta_path}.tmp", meta_path)
+
+                size = os.path.getsize(body_path) + len(payload)
+                self._total += size - index.pop(key, 0)
+                index[key] = size
+                while self._total > self.max_bytes and index:
+                    evicted, evicted_size = index.popitem(last=False)
+                    self._total -= evicted_size
+                    for path in self._paths(evicted):
+                        try:
+                            os.remove(path)
+                        except OSError:
+                            pass
+                    metrics.increment("fetch_cache_evictions")
+            except OSError as e:
+                print(f"Fetch cache write failed: {e}")
+
+    async def fetch(self, url: str) -> bytes:
+        """
+        Return the body of a URL, from the cache when possible.
+
+        Args:
+            url (str): URL to download.
+
+        Returns:
+            bytes: The response body.
+
+        Raises:
+            aiohttp.ClientError: If the download failed.
+            asyncio.TimeoutError: If the download timed out.
+        """
+        cached = await run_in_executor("io", self.lookup, url)
+        headers = {}
+        if cached is not None:
+            meta, body = cached
+            if time.time() - meta["fetched_at"] < self.ttl:
+                metrics.increment("fetch_cache_hits")
+                return body
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        status, response_headers, new_body = await fetch(url, headers=headers)
+        if status == 304 and cached is not None:
+            metrics.increment("fetch_cache_revalidated")
+            # A 304 may omit the validators; keep the stored ones then
+            validators = {
+                "ETag": response_headers.get("ETag", meta.get("etag")),
+                "Last-Modified": response_headers.get(
+                    "Last-Modified", meta.get("last_modified")
+                ),
+            }
+            await run_in_executor("io", self.store, url, validators, None)
+            return body
+
+        metrics.increment("fetch_cache_misses")
+        await run_in_executor("io", self.store, url, response_headers, new_body)
+        return new_body
+
+
+_fetch_cache = (
+    FetchCache(
+        FETCH_CACHE_SETTINGS["cache_dir"],
+        FETCH_CACHE_SETTINGS["max_bytes"],
+        FETCH_CACHE_SETTINGS["ttl"],
+    )
+    if FETCH_CACHE_SETTINGS["enabled"]
+    else None
+)
+
+
+async def fetch_remote(url: str) -> bytes:
+    """
+    Download a remote input, through the fetch cache when enabled.
+
+    Args:
+        url (str): URL to download.
+
+    Returns:
+        bytes: The response body.
+    """
+    if _fetch_cache is None:
+        return await fetch_bytes(url)
+    return await _fetch_cache.fetch(url)
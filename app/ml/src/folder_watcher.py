@@ -0,0 +1,279 @@
+import asyncio
+import json
+import os
+import sqlite3
+import time
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from src import metrics
+from src.dicom_index import DicomIndex
+from src.executors import run_in_executor
+from src.serialization import json_default
+from src.study import iter_study_frames
+from src.utils import DICOM_EXTENSIONS
+
+# Suffix of the result file written next to every processed input
+SIDECAR_SUFFIX = ".result.json"
+
+RASTER_EXTENSIONS = (".png", ".jpg", ".jpeg")
+INPUT_EXTENSIONS = RASTER_EXTENSIONS + DICOM_EXTENSIONS
+
+
+def sidecar_path(path: str) -> str:
+    """Path of the result file of an input."""
+    return f"{path}{SIDECAR_SUFFIX}"
+
+
+def write_sidecar(path: str, result: dict) -> None:
+    """
+    Write the result of an input next to it, atomically.
+
+    Args:
+        path (str): Input file.
+        result (dict): Inference result or error.
+    """
+    target = sidecar_path(path)
+    payload = json.dumps({"source": path, **result}, default=json_default)
+    with open(f"{target}.tmp", "w", encoding="utf-8") as f:
+        f.write(payload)
+    os.replace(f"{target}.tmp", target)
+
+
+def is_raster(path: str) -> bool:
+    """Whether a watched file is read as a PNG or JPEG image."""
+    return path.lower().endswith(RASTER_EXTENSIONS)
+
+
+def has_dicom_preamble(path: str) -> bool:
+    """
+    Check for the ``DICM`` prefix after the 128-byte DICOM preamble.
+
+    Args:
+        path (str): File to check.
+
+    Returns:
+        bool: Whether the file is a DICOM Part 10 file.
+    """
+    try:
+        with open(path, "rb") as f:
+            header = f.read(132)
+    except OSError:
+        return False
+    return header[128:132] == b"DICM"
+
+
+def input_data(path: str, frame: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Inference input for a watched file.
+
+    Args:
+        path (str): Input file.
+        frame (int, optional): Frame of a DICOM file.
+
+    Returns:
+        Dict[str, Any]: Input data.
+    """
+    if frame is None:
+        return {"url": f"file://{path}"}
+    return {"url": f"file://{path}", "frame": frame}
+
+
+class FolderWatcher:
+    """
+    Polling watcher that feeds files dropped into a folder to the batcher.
+
+    A file is picked up once its size and modification time have not changed
+    for ``settle_time`` seconds, so files still being copied are left alone.
+    Its result is written next to it as ``<file>.result.json``; a file whose
+    result is newer than the file itself is not processed again, also
+    across restarts. Files without a raster extension are only queued if
+    they start with the DICOM preamble, and every frame of a multi-frame
+    file is processed; the result file then lists the ``frames``. A file
+    that cannot be read gets an ``error`` result, so it is not retried until
+    it changes.
+
+    Args:
+        input_dir (str): Folder to watch, including subfolders.
+        enqueue (Callable[[Dict[str, Any]], asyncio.Future]): Queues input
+            data for inference, e.g. the server's ``enqueue_request``.
+        poll_interval (float): Seconds between two scans.
+        settle_time (float): Seconds a file must stay unchanged.
+        max_in_flight (int): Files queued at a time; the others wait for a
+            later scan.
+        index (DicomIndex, optional): Index in which DICOM files are marked
+            as processed once they have a result without an error.
+        admit (Callable[[], Optional[int]], optional): Admission check run
+            before a file is queued. It returns None to admit the file, or
+            the seconds to back off; the file is then retried on a later
+            scan.
+
+    Note:
+        Polling is used instead of inotify so the watcher also works on
+        bind mounts, network shares and USB media, where change events are
+        often missing.
+    """
+
+    def __init__(
+        self,
+        input_dir: str,
+        enqueue: Callable[[Dict[str, Any]], asyncio.Future],
+        poll_interval: float = 2.0,
+        settle_time: float = 5.0,
+        max_in_flight: int = 32,
+        index: Optional[DicomIndex] = None,
+        admit: Optional[Callable[[], Optional[int]]] = None,
+    ):
+        self.input_dir = input_dir
+        self.enqueue = enqueue
+        self.poll_interval = float(poll_interval)
+        self.settle_time = float(settle_time)
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.index = index
+        self.admit = admit
+        # Last seen (size, mtime_ns) of every unfinished file, and since when
+        self._candidates: Dict[str, Tuple[Tuple[int, int], float]] = {}
+        # Files found not to be DICOM, skipped until they change
+        self._not_dicom: Set[Tuple[str, Tuple[int, int]]] = set()
+        self._in_flight: Dict[str, asyncio.Task] = {}
+
+    def scan(self) -> List[str]:
+        """
+        Find the files that are complete and have no up-to-date result.
+
+        Returns:
+            List[str]: Paths ready for inference, oldest first.
+
+        Note:
+            Blocks on directory listing and reads the first bytes of new
+            files without a raster extension; run it in the ``io`` pool.
+        """
+        now = time.monotonic()
+        in_flight = set(self._in_flight)
+        candidates = {}
+        not_dicom = set()
+        ready = []
+        for root, dirs, files in os.walk(self.input_dir):
+            dirs[:] = [name for name in dirs if not name.startswith(".")]
+            for file in files:
+                if file.startswith(".") or file.upper() == "DICOMDIR":
+                    continue
+                # DICOM files often have no extension or a numeric one
+                extension = os.path.splitext(file)[1].lower()
+                if not (
+                    extension in INPUT_EXTENSIONS
+                    or extension[1:].isdigit()
+                    or not extension
+                ):
+                    continue
+                path = os.path.join(root, file)
+                if path in in_flight:
+                    continue
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                try:
+                    if os.stat(sidecar_path(path)).st_mtime_ns >= stat.st_mtime_ns:
+                        continue
+                except FileNotFoundError:
+                    pass
+
+                signature = (stat.st_size, stat.st_mtime_ns)
+                if (path, signature) in self._not_dicom:
+                    not_dicom.add((path, signature))
+                    continue
+                previous = self._candidates.get(path)
+                since = previous[1] if previous and previous[0] == signature else now
+                candidates[path] = (signature, since)
+                if now - since < self.settle_time:
+                    continue
+                if not is_raster(path) and not has_dicom_preamble(path):
+                    not_dicom.add((path, signature))
+                    del candidates[path]
+                    continue
+                ready.append((stat.st_mtime, path))
+
+        self._candidates = candidates
+        self._not_dicom = not_dicom
+        return [path for _, path in sorted(ready)]
+
+    async def run(self) -> None:
+        """Scan the folder and queue complete files until cancelled."""
+        print(f"Watching {self.input_dir} for new inputs")
+        try:
+            while True:
+                try:
+                    ready = await run_in_executor("io", self.scan)
+                except OSError as e:
+                    print(f"Folder watcher scan failed: {e}")
+                    ready = []
+                for path in ready:
+                    if len(self._in_flight) >= self.max_in_flight:
+                        break
+                    if self.admit is not None and self.admit() is not None:
+                        # Overloaded; the file is picked up again later
+                        metrics.increment("folder_watcher_deferred")
+                        break
+                    self._in_flight[path] = asyncio.create_task(self._process(path))
+                await asyncio.sleep(self.poll_interval)
+        finally:
+            tasks = list(self._in_flight.values())
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _infer(self, data: Dict[str, Any]) -> dict:
+        try:
+            return await self.enqueue(data)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            return {"error": str(e)}
+
+    async def _infer_frames(self, path: str) -> dict:
+        """Run every frame of a DICOM file, at most ``max_in_flight`` at a time."""
+        frames = await run_in_executor("io", list, iter_study_frames(path))
+        if not frames:
+            return {"error": "No DICOM frames found"}
+        if len(frames) == 1:
+            return await self._infer(input_data(path, frames[0]["frame"]))
+
+        results = []
+        for start in range(0, len(frames), self.max_in_flight):
+            chunk = frames[start : start + self.max_in_flight]
+            results += await asyncio.gather(
+                *(self._infer(input_data(path, frame["frame"])) for frame in chunk)
+            )
+        return {
+            "frames": [
+                {"frame": frame["frame"], **result}
+                for frame, result in zip(frames, results)
+            ]
+        }
+
+    async def _process(self, path: str) -> None:
+        metrics.increment("folder_watcher_files")
+        try:
+            try:
+                if is_raster(path):
+                    result = await self._infer(input_data(path))
+                else:
+                    result = await self._infer_frames(path)
+            except Exception as e:
+                # An error result marks the file as handled, so it is not
+                # retried on every scan
+                result = {"error": str(e)}
+            try:
+                await run_in_executor("io", write_sidecar, path, result)
+            except (TypeError, ValueError) as e:
+                result = {"error": f"Result cannot be serialised: {e}"}
+                await run_in_executor("io", write_sidecar, path, result)
+            failed = result.get("error") or any(
+                frame.get("error") for frame in result.get("frames", [])
+            )
+            if self.index is not None and not is_raster(path) and not failed:
+                await run_in_executor("io", self.index.mark_processed, [path])
+        except (OSError, sqlite3.Error) as e:
+            print(f"Failed to record result of {path}: {e}")
+        finally:
+            self._in_flight.pop(path, None)
@@ -0,0 +1,139 @@
+import asyncio
+import os
+from typing import Dict, Mapping, Optional, Tuple
+
+import aiohttp
+from multidict import CIMultiDict
+
+# Connection pool and retry settings for outgoing HTTP requests
+HTTP_SETTINGS = {
+    # Max open connections in total and per host
+    "pool_size": int(os.environ.get("HTTP_POOL_SIZE", 64)),
+    "pool_size_per_host": int(os.environ.get("HTTP_POOL_SIZE_PER_HOST", 16)),
+    # Seconds an idle keep-alive connection stays open
+    "keepalive_timeout": float(os.environ.get("HTTP_KEEPALIVE_TIMEOUT", 30)),
+    # Seconds to establish a connection and between two reads of a response
+    "connect_timeout": float(os.environ.get("HTTP_CONNECT_TIMEOUT", 5)),
+    "read_timeout": float(os.environ.get("HTTP_READ_TIMEOUT", 30)),
+    # Retries after a failed attempt, with exponential backoff in seconds
+    "retries": int(os.environ.get("HTTP_RETRIES", 2)),
+    "retry_backoff": float(os.environ.get("HTTP_RETRY_BACKOFF", 0.5)),
+}
+
+# Statuses worth retrying; other 4xx responses fail immediately
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+
+_session: Optional[aiohttp.ClientSession] = None
+_session_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def create_session() -> aiohttp.ClientSession:
+    """
+    Create a connection-pooled client session from ``HTTP_SETTINGS``.
+
+    Returns:
+        aiohttp.ClientSession: A new session bound to the running loop.
+    """
+    connector = aiohttp.TCPConnector(
+        limit=HTTP_SETTINGS["pool_size"],
+        limit_per_host=HTTP_SETTINGS["pool_size_per_host"],
+        keepalive_timeout=HTTP_SETTINGS["keepalive_timeout"],
+        ttl_dns_cache=300,
+    )
+    timeout = aiohttp.ClientTimeout(
+        total=None,
+        connect=HTTP_SETTINGS["connect_timeout"],
+        sock_read=HTTP_SETTINGS["read_timeout"],
+    )
+    return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+
+def get_session() -> aiohttp.ClientSession:
+    """
+    Return the shared session, creating it on first use.
+
+    Returns:
+        aiohttp.ClientSession: The process-wide session of the running loop.
+
+    Note:
+        The server opens and closes the session in its lifespan. Worker
+        processes and direct callers of ``batch_inference`` get one on first
+        use and close it with ``close_session``. A session left behind by
+        another event loop, e.g. of an earlier test, is replaced.
+    """
+    global _session, _session_loop
+    loop = asyncio.get_running_loop()
+    if _session is None or _session.closed or _session_loop is not loop:
+        _session = create_session()
+        _session_loop = loop
+    return _session
+
+
+async def close_session() -> None:
+    """
+    Close the shared session and its pooled connections.
+    """
+    global _session, _session_loop
+    if (
+        _session is not None
+        and not _session.closed
+        and _session_loop is asyncio.get_running_loop()
+    ):
+        await _session.close()
+    _session = None
+    _session_loop = None
+
+
+async def fetch(
+    url: str, headers: Optional[Dict[str, str]] = None
+) -> Tuple[int, Mapping[str, str], bytes]:
+    """
+    Send a GET through the shared session with bounded retries.
+
+    Args:
+        url (str): URL to download.
+        headers (Dict[str, str], optional): Extra request headers, e.g.
+            conditional ``If-None-Match``. Defaults to None.
+
+    Returns:
+        Tuple[int, Mapping[str, str], bytes]: Status, response headers
+            (case-insensitive) and body. A 304 response has an empty body.
+
+    Raises:
+        aiohttp.ClientError: If the last attempt failed with a network or
+            HTTP error.
+        asyncio.TimeoutError: If the last attempt timed out.
+    """
+    retries = max(0, HTTP_SETTINGS["retries"])
+    for attempt in range(retries + 1):
+        try:
+            async with get_session().get(url, headers=headers) as response:
+                response.raise_for_status()
+                body = b"" if response.status == 304 else await response.read()
+                return response.status, CIMultiDict(response.headers), body
+        except aiohttp.ClientResponseError as e:
+            if e.status not in RETRY_STATUSES or attempt == retries:
+                raise
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            if attempt == retries:
+                raise
+        await asyncio.sleep(HTTP_SETTINGS["retry_backoff"] * 2**attempt)
+
+
+async def fetch_bytes(url: str) -> bytes:
+    """
+    Download a URL through the shared session with bounded retries.
+
+    Args:
+        url (str): URL to download.
+
+    Returns:
+        bytes: The response body.
+
+    Raises:
+        aiohttp.ClientError: If the last attempt failed with a network or
+            HTTP error.
+        asyncio.TimeoutError: If the last attempt timed out.
+    """
+    _, _, body = await fetch(url)
+    return body
@@ -0,0 +1,258 @@
+import asyncio
+import collections
+import time
+import uuid
+from typing import Any, Dict, Iterable, Optional, OrderedDict, Set
+from urllib.parse import urlsplit
+
+import aiohttp
+from fastapi.encoders import jsonable_encoder
+
+from src import metrics
+from src.http_client import get_session
+
+# Job states; every state but "queued" is final
+JOB_STATUSES = ("queued", "completed", "failed", "cancelled")
+
+CALLBACK_SCHEMES = ("http", "https")
+
+
+class Job:
+    """
+    An inference request submitted in job mode.
+
+    Attributes:
+        job_id (str): Identifier returned to the client.
+        status (str): One of ``JOB_STATUSES``.
+        callback_url (Optional[str]): URL notified when the job finishes.
+        created_at (float): ``time.time()`` of submission.
+        completed_at (Optional[float]): ``time.time()`` of completion.
+        result (Optional[dict]): Inference result once completed.
+        error (Optional[str]): Reason the job failed or was cancelled.
+        future (Optional[asyncio.Future]): Batcher future while queued.
+    """
+
+    __slots__ = (
+        "job_id",
+        "status",
+        "callback_url",
+        "created_at",
+        "completed_at",
+        "result",
+        "error",
+        "future",
+    )
+
+    def __init__(self, callback_url: Optional[str] = None):
+        self.job_id = str(uuid.uuid4())
+        self.status = "queued"
+        self.callback_url = callback_url
+        self.created_at = time.time()
+        self.completed_at: Optional[float] = None
+        self.result: Optional[dict] = None
+        self.error: Optional[str] = None
+        self.future: Optional[asyncio.Future] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Return the public state of the job.
+
+        Returns:
+            Dict[str, Any]: Job id, status, timestamps, result and error.
+        """
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "completed_at": self.completed_at,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class JobStore:
+    """
+    Bounded in-memory store of inference jobs.
+
+    Finished jobs are kept for ``result_ttl`` seconds so clients can poll
+    them. When the store is full the oldest finished job is evicted; queued
+    jobs are never evicted, so a store full of queued jobs rejects new ones.
+
+    Args:
+        max_jobs (int): Maximum number of jobs kept.
+        result_ttl (float): Seconds a finished job is kept. 0 keeps it until
+            evicted for capacity.
+        callback_timeout (float, optional): Seconds allowed for one callback
+            POST. Defaults to 10.
+        callback_hosts (Iterable[str], optional): Hosts, as ``host`` or
+            ``host:port``, that callbacks may be sent to. Empty rejects every
+            callback URL. Defaults to ().
+
+    Note:
+        Callback URLs come from clients, so they are checked against
+        ``callback_hosts`` to keep the server from being used to reach
+        internal services. Redirects of the callback POST are not followed.
+    """
+
+    def __init__(
+        self,
+        max_jobs: int,
+        result_ttl: float,
+        callback_timeout: float = 10.0,
+        callback_hosts: Iterable[str] = (),
+    ):
+        self.max_jobs = max(1, int(max_jobs))
+        self.result_ttl = float(result_ttl)
+        self.callback_timeout = float(callback_timeout)
+        self.callback_hosts = {host.strip().lower() for host in callback_hosts}
+        self._jobs: Dict[str, Job] = {}
+        # Finished job ids in completion order, for expiry and eviction
+        self._finished: OrderedDict[str, float] = collections.OrderedDict()
+        self._tasks: Set[asyncio.Task] = set()
+
+    def __len__(self) -> int:
+        return len(self._jobs)
+
+    def _expire(self) -> None:
+        now = time.time()
+        while self._finished:
+            job_id, completed_at = next(iter(self._finished.items()))
+            if self.result_ttl <= 0 or now - completed_at < self.result_ttl:
+                break
+            self._finished.popitem(last=False)
+            self._jobs.pop(job_id, None)
+
+    def check_callback_url(self, callback_url: str) -> None:
+        """
+        Validate a client-supplied callback URL.
+
+        Args:
+            callback_url (str): URL to POST the finished job to.
+
+        Raises:
+            ValueError: If the scheme is not http(s) or the host is not in
+                ``callback_hosts``.
+        """
+        try:
+            url = urlsplit(callback_url)
+            host = (url.hostname or "").lower()
+            port = url.port
+        except ValueError:
+            raise ValueError(f"Invalid callback_url: {callback_url}")
+        if url.scheme not in CALLBACK_SCHEMES or not host:
+            raise ValueError("callback_url must be an http or https URL")
+        if host not in self.callback_hosts and (
+            port is None or f"{host}:{port}" not in self.callback_hosts
+        ):
+            raise ValueError(f"callback_url host is not allowed: {host}")
+
+    def create(self, callback_url: Optional[str] = None) -> Optional[Job]:
+        """
+        Register a new queued job.
+
+        Args:
+            callback_url (Optional[str]): URL to POST the finished job to.
+
+        Returns:
+            Optional[Job]: The job, or None if the store is full of queued jobs.
+
+        Raises:
+            ValueError: If ``callback_url`` is not allowed, see
+                ``check_callback_url``.
+        """
+        if callback_url:
+            self.check_callback_url(callback_url)
+        self._expire()
+        if len(self._jobs) >= self.max_jobs:
+            if not self._finished:
+                return None
+            job_id, _ = self._finished.popitem(last=False)
+            self._jobs.pop(job_id, None)
+            metrics.increment("jobs_evicted")
+
+        job = Job(callback_url)
+        self._jobs[job.job_id] = job
+        metrics.increment("jobs_created")
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """
+        Look up a job.
+
+        Args:
+            job_id (str): Job identifier.
+
+        Returns:
+            Optional[Job]: The job, or None if unknown or expired.
+        """
+        self._expire()
+        return self._jobs.get(job_id)
+
+    def start(self, job: Job, future: asyncio.Future) -> None:
+        """
+        Follow the batcher future of a job until it finishes.
+
+        Args:
+            job (Job): Job returned by ``create``.
+            future (asyncio.Future): Future returned by the batcher.
+        """
+        job.future = future
+        task = asyncio.create_task(self._run(job, future))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Cancel a queued job; the batcher then skips it.
+
+        Args:
+            job_id (str): Job identifier.
+
+        Returns:
+            bool: True if the job was queued and is now cancelled.
+
+        Note:
+            The job is marked as cancelled right away; its callback is still
+            sent once the job task has seen the cancellation.
+        """
+        job = self.get(job_id)
+        if job is None or job.status != "queued" or job.future is None:
+            return False
+        if not job.future.cancel():
+            return False
+        job.status = "cancelled"
+        job.error = "Job was cancelled"
+        job.completed_at = time.time()
+        return True
+
+    async def _run(self, job: Job, future: asyncio.Future) -> None:
+        try:
+            job.result = await future
+            job.status = "completed"
+        except asyncio.CancelledError:
+            job.status = "cancelled"
+            job.error = "Job was cancelled"
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+
+        job.future = None
+        job.completed_at = job.completed_at or time.time()
+        self._finished[job.job_id] = job.completed_at
+
+        if job.callback_url:
+            await self._notify(job)
+
+    async def _notify(self, job: Job) -> None:
+        timeout = aiohttp.ClientTimeout(total=self.callback_timeout)
+        try:
+            async with get_session().post(
+                job.callback_url,
+                json=jsonable_encoder(job.to_dict()),
+                timeout=timeout,
+                allow_redirects=False,
+            ) as response:
+                response.raise_for_status()
+        except Exception as e:
+            print(f"Callback for job {job.job_id} failed: {e}")
+            metrics.increment("job_callbacks_failed")
@@ -0,0 +1,30 @@
+import collections
+import threading
+from typing import Dict
+
+# Process-wide event counters, e.g. rejected requests or wasted batch slots
+_counters: Dict[str, int] = collections.Counter()
+_lock = threading.Lock()
+
+
+def increment(name: str, value: int = 1) -> None:
+    """
+    Increase a named counter.
+
+    Args:
+        name (str): Counter name.
+        value (int, optional): Amount to add. Defaults to 1.
+    """
+    with _lock:
+        _counters[name] += value
+
+
+def get_counters() -> Dict[str, int]:
+    """
+    Return a snapshot of all counters.
+
+    Returns:
+        Dict[str, int]: Counter name to current value.
+    """
+    with _lock:
+        return dict(_counters)
@@ -0,0 +1,337 @@
+import asyncio
+import os
+import time
+from typing import List, Optional, Tuple
+
+from src import metrics
+from src.admission import AdmissionController
+from src.batch_controller import AdaptiveBatchController
+from src.batch_inference import (
+    BatchContext,
+    decode_images,
+    preprocess_images,
+    render_results,
+    run_models,
+    run_stage,
+    upload_results,
+)
+from src.batcher import BatchItem, MicroBatcher
+from src.executors import get_executor, run_in_executor
+from src.result_cache import ResultCache
+from src.utils import DICOMBatchProcessor
+from src.worker_pool import InferenceWorkerPool
+
+
+class InferencePipeline:
+    """
+    Staged batch executor connecting the inference stages with bounded queues.
+
+    Stages run as independent tasks, so while one batch is inside the models
+    the next one is already being decoded and the previous one is being
+    rendered or uploaded:
+
+        ingest/decode -> model inference -> post-processing/render -> upload
+
+    Args:
+        batcher (MicroBatcher): Source of request batches.
+        queue_size (int, optional): Maximum number of batches waiting between
+            two stages. Defaults to 1.
+        converted_folder (str, optional): Folder for converted PNG inputs.
+        worker_pool (InferenceWorkerPool, optional): When given, batches are
+            only decoded here and the remaining stages run in the pool's
+            worker processes, one batch per worker.
+        admission (AdmissionController, optional): Receives the timings of
+            every completed batch for wait-time estimates.
+        controller (AdaptiveBatchController, optional): Receives the latency
+            of every completed batch to tune the batcher.
+        result_cache (ResultCache, optional): Serves repeated images right
+            after decoding and stores new results.
+
+    Note:
+        Each stage handles one batch at a time, so a model is never asked to
+        run two batches concurrently. Throughput is bounded by the slowest
+        stage rather than the sum of all stages. After ``run_models`` and
+        ``render_results`` the partial results are passed to the listener of
+        every streaming request; in worker pool mode only the final result is
+        available.
+    """
+
+    def __init__(
+        self,
+        batcher: MicroBatcher,
+        queue_size: int = 1,
+        converted_folder: str = "/data/converted_png/",
+        worker_pool: Optional[InferenceWorkerPool] = None,
+        admission: Optional[AdmissionController] = None,
+        controller: Optional[AdaptiveBatchController] = None,
+        result_cache: Optional[ResultCache] = None,
+    ):
+        self.batcher = batcher
+        self.queue_size = max(1, int(queue_size))
+        self.converted_folder = converted_folder
+        self.worker_pool = worker_pool
+        self.admission = admission
+        self.controller = controller
+        self.result_cache = result_cache
+
+    def _save_converted(self, ctx: BatchContext) -> None:
+        """
+        Write the decoded inputs of a batch as PNGs in the background.
+
+        Args:
+            ctx (BatchContext): Decoded batch; ``converted_png`` is set on the
+                outputs of its loaded images and the writes are recorded in
+                ``pending_writes``.
+
+        Note:
+            Inputs are decoded in memory, so the PNGs are a side output only.
+            They are written by the ``io`` pool while the models run; the
+            requests are resolved only once their PNG is in place (see
+            ``_finish``).
+        """
+        os.makedirs(self.converted_folder, exist_ok=True)
+        processor = DICOMBatchProcessor(str(self.converted_folder))
+        for position, index in enumerate(ctx.loaded_indices):
+            png_path = os.path.join(
+                self.converted_folder, f"{ctx.outputs[index]['image_id']}.png"
+            )
+            ctx.pending_writes[index] = get_executor("io").submit(
+                processor.write_png, ctx.original_images[position], png_path
+            )
+            ctx.outputs[index]["converted_png"] = png_path
+
+    @staticmethod
+    async def _await_converted(ctx: BatchContext) -> None:
+        """Wait for the converted PNGs of a batch; drop the paths that failed."""
+        for index, write in ctx.pending_writes.items():
+            try:
+                written = await asyncio.wrap_future(write)
+            except Exception as e:
+                print(f"Failed to write converted PNG: {e}")
+                written = False
+            if not written:
+                ctx.outputs[index]["converted_png"] = None
+
+    async def _serve_cached(
+        self, batch: List[BatchItem], ctx: BatchContext
+    ) -> Tuple[List[BatchItem], BatchContext]:
+        """
+        Resolve the requests whose result is cached.
+
+        Args:
+            batch (List[BatchItem]): Requests of the batch.
+            ctx (BatchContext): Decoded batch; cache keys are recorded in it.
+
+        Returns:
+            Tuple[List[BatchItem], BatchContext]: The remaining requests and
+                their batch, which still has to run the models.
+        """
+        hits = {}
+        for position, index in enumerate(ctx.loaded_indices):
+            options = {
+                "isInverted": ctx.input_data[index].get("isInverted"),
+                "outputs": list(ctx.selections[index]),
+            }
+            key = await run_in_executor(
+                "image", self.result_cache.key, ctx.original_images[position], options
+            )
+            ctx.cache_keys[index] = key
+            result = await run_in_executor("io", self.result_cache.get, key)
+            if result is not None:
+                hits[index] = result
+
+        if not hits:
+            return batch, ctx
+        self._resolve([batch[index] for index in hits], list(hits.values()))
+        misses = [index for index in range(len(batch)) if index not in hits]
+        return [batch[index] for index in misses], ctx.subset(misses)
+
+    async def _ingest(self, out_queue: asyncio.Queue, preprocess: bool = True) -> None:
+        while True:
+            batch = await self.batcher.next_batch()
+            if self._abandoned(batch):
+                continue
+            print(f"Processing batch of {len(batch)} images...")
+            formed_at = time.monotonic()
+
+            try:
+                # Inputs are decoded once, in memory; the PNG is only a side
+                # output
+                ctx = BatchContext([dict(item.data) for item in batch])
+                ctx.formed_at = formed_at
+                await run_stage(ctx, decode_images)
+                if self.result_cache is not None and not ctx.failed:
+                    batch, ctx = await self._serve_cached(batch, ctx)
+                    if not batch:
+                        continue
+                if not ctx.failed:
+                    self._save_converted(ctx)
+                if preprocess:
+                    await run_stage(ctx, preprocess_images)
+            except Exception as e:
+                self._fail(batch, e)
+                continue
+            await out_queue.put((batch, ctx))
+
+    async def _stage(
+        self,
+        stage,
+        in_queue: asyncio.Queue,
+        out_queue: Optional[asyncio.Queue],
+    ) -> None:
+        while True:
+            batch, ctx = await in_queue.get()
+            if self._abandoned(batch):
+                continue
+            await run_stage(ctx, stage)
+            try:
+                if out_queue is None:
+                    await self._finish(batch, ctx)
+                    continue
+                self._publish(batch, ctx, stage.__name__)
+            except Exception as e:
+                self._fail(batch, e)
+                continue
+            await out_queue.put((batch, ctx))
+
+    async def _finish(self, batch: List[BatchItem], ctx: BatchContext) -> None:
+        await self._await_converted(ctx)
+        now = time.monotonic()
+        if self.admission is not None and ctx.stage_durations:
+            self.admission.record_batch(
+                latency=now - ctx.formed_at,
+                interval=max(ctx.stage_durations.values()),
+            )
+        if self.controller is not None:
+            self.controller.observe_batch(
+                len(batch),
+                now - ctx.formed_at,
+                [now - item.enqueued_at for item in batch],
+            )
+        results = ctx.selected_outputs()
+        if self.result_cache is not None and not ctx.failed:
+            for index, key in ctx.cache_keys.items():
+                # Fallbacks of a transient failure must not be served later
+                degraded = ctx.outputs[index].get("degraded")
+                if not results[index].get("error") and not degraded:
+                    get_executor("io").submit(
+                        self.result_cache.put, key, results[index]
+                    )
+        self._resolve(batch, results)
+
+    async def _dispatch(self, in_queue: asyncio.Queue) -> None:
+        while True:
+            batch, ctx = await in_queue.get()
+            if self._abandoned(batch):
+                continue
+            if not ctx.failed:
+                start = time.perf_counter()
+                try:
+                    ctx.outputs = await self.worker_pool.submit(ctx)
+                except Exception as e:
+                    print(f"Critical inference error: {e}")
+                    for output in ctx.outputs:
+                        if not output.get("error"):
+                            output["error"] = f"Critical inference error: {str(e)}"
+                # Workers process batches side by side
+                ctx.stage_durations["worker"] = (
+                    time.perf_counter() - start
+                ) / self.worker_pool.num_workers
+            try:
+                await self._finish(batch, ctx)
+            except Exception as e:
+                self._fail(batch, e)
+
+    @staticmethod
+    def _publish(batch: List[BatchItem], ctx: BatchContext, stage_name: str) -> None:
+        """Send the partial results of a finished stage to streaming requests."""
+        if ctx.failed or not any(item.listener for item in batch):
+            return
+        for item, partial in zip(batch, ctx.partial_outputs()):
+            if item.listener is not None and not item.future.done():
+                item.listener(stage_name, partial)
+
+    @staticmethod
+    def _abandoned(batch: List[BatchItem]) -> bool:
+        """Whether every request of the batch was cancelled or timed out."""
+        if all(item.future.done() for item in batch):
+            metrics.increment("abandoned_batches")
+            return True
+        return False
+
+    @staticmethod
+    def _fail(batch: List[BatchItem], error: BaseException) -> None:
+        """Resolve the pending requests of a batch that could not be handled."""
+        print(f"Critical inference error: {error}")
+        for item in batch:
+            if not item.future.done():
+                item.future.set_result(
+                    {"error": f"Critical inference error: {str(error)}"}
+                )
+
+    @staticmethod
+    def _resolve(batch: List[BatchItem], results: List[dict]) -> None:
+        for item, result in zip(batch, results):
+            if item.future.done():
+                # Computed for a client that disconnected or timed out
+                metrics.increment("wasted_results")
+                continue
+            item.future.set_result(result)
+
+    async def _run_stages(self, queues: List[asyncio.Queue], *stages) -> None:
+        """
+        Run the stage loops until one of them stops.
+
+        Args:
+            queues (List[asyncio.Queue]): Queues between the stages.
+            *stages: Stage loop coroutines.
+
+        Note:
+            The remaining stages are then cancelled and the batches still
+            waiting in the queues are resolved with an error, so a restarted
+            pipeline starts clean.
+        """
+        tasks = [asyncio.ensure_future(stage) for stage in stages]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            for queue in queues:
+                while not queue.empty():
+                    batch, _ = queue.get_nowait()
+                    self._fail(batch, RuntimeError("Inference pipeline stopped"))
+
+    async def run(self) -> None:
+        """
+        Run all stages until cancelled.
+
+        Note:
+            Queues are created here so that they bind to the running loop.
+            Errors are resolved per batch; ``run`` only raises on a bug in
+            the stage loops themselves, and can then be called again.
+        """
+        if self.worker_pool is not None:
+            dispatch_queue = asyncio.Queue(maxsize=self.queue_size)
+            await self._run_stages(
+                [dispatch_queue],
+                self._ingest(dispatch_queue, preprocess=False),
+                *[
+                    self._dispatch(dispatch_queue)
+                    for _ in range(self.worker_pool.num_workers)
+                ],
+            )
+            return
+
+        inference_queue = asyncio.Queue(maxsize=self.queue_size)
+        render_queue = asyncio.Queue(maxsize=self.queue_size)
+        upload_queue = asyncio.Queue(maxsize=self.queue_size)
+
+        await self._run_stages(
+            [inference_queue, render_queue, upload_queue],
+            self._ingest(inference_queue),
+            self._stage(run_models, inference_queue, render_queue),
+            self._stage(render_results, render_queue, upload_queue),
+            self._stage(upload_results, upload_queue, None),
+        )
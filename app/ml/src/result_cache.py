@@ -0,0 +1,201 @@
+import collections
+import copy
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Dict, Optional, OrderedDict
+
+import numpy as np
+
+from src import metrics
+from src.serialization import json_default
+
+
+def model_fingerprint(model_paths: Dict[str, str]) -> str:
+    """
+    Identify the loaded model weights by their files.
+
+    Args:
+        model_paths (Dict[str, str]): Model key to weights file path.
+
+    Returns:
+        str: SHA-256 over each file's path, size and modification time, so
+            replacing any weights file yields a new fingerprint.
+
+    Note:
+        The weights themselves are not hashed, which would mean reading every
+        model at startup. Weights changed in place with their size and
+        modification time preserved are not detected; clear the cache then.
+    """
+    digest = hashlib.sha256()
+    for key, path in sorted(model_paths.items()):
+        try:
+            stat = os.stat(path)
+            identity = f"{key}:{path}:{stat.st_size}:{stat.st_mtime_ns}"
+        except OSError:
+            identity = f"{key}:{path}:missing"
+        digest.update(identity.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    Content-addressed cache of inference results.
+
+    Results are keyed by the decoded image bytes, the request options that
+    change the result and the model fingerprint. Lookups check an in-memory
+    LRU first and then JSON files on disk; disk hits are promoted to memory.
+    The disk tier evicts the least recently used files once it exceeds
+    ``disk_bytes``.
+
+    Args:
+        cache_dir (str): Directory of the disk tier.
+        memory_entries (int): Results kept in memory. 0 disables the tier.
+        disk_bytes (int): Maximum total size of the disk tier. 0 disables it.
+        fingerprint (str): Model fingerprint, see ``model_fingerprint``.
+
+    Note:
+        Methods block on disk I/O and are safe to call from several threads;
+        the pipeline runs them in the ``io`` pool. It only stores results
+        without an error that used no fallback values.
+    """
+
+    def __init__(
+        self, cache_dir: str, memory_entries: int, disk_bytes: int, fingerprint: str
+    ):
+        self.cache_dir = cache_dir
+        self.memory_entries = max(0, int(memory_entries))
+        self.disk_bytes = max(0, int(disk_bytes))
+        self.fingerprint = fingerprint
+        self._memory: OrderedDict[str, dict] = collections.OrderedDict()
+        # Disk entries in least-recently-used order, with their file sizes
+        self._disk: Optional[OrderedDict[str, int]] = None
+        self._disk_total = 0
+        self._lock = threading.Lock()
+
+    def key(self, image: np.ndarray, options: Dict[str, Any]) -> str:
+        """
+        Compute the cache key of a decoded image.
+
+        Args:
+            image (np.ndarray): Decoded input image.
+            options (Dict[str, Any]): JSON-serializable request options that
+                affect the result, e.g. the inversion flag and selected outputs.
+
+        Returns:
+            str: Hex SHA-256 digest.
+        """
+        digest = hashlib.sha256(self.fingerprint.encode("utf-8"))
+        digest.update(json.dumps(options, sort_keys=True).encode("utf-8"))
+        digest.update(f"{image.shape}:{image.dtype.str}".encode("utf-8"))
+        digest.update(np.ascontiguousarray(image).data)
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _load_disk_index(self) -> OrderedDict:
+        if self._disk is None:
+            entries = []
+            for root, _, files in os.walk(self.cache_dir):
+                for name in files:
+                    if name.endswith(".json"):
+                        stat = os.stat(os.path.join(root, name))
+                        entries.append((stat.st_mtime, name[:-5], stat.st_size))
+            self._disk = collections.OrderedDict(
+                (key, size) for _, key, size in sorted(entries)
+            )
+            self._disk_total = sum(self._disk.values())
+        return self._disk
+
+    def _remember(self, key: str, result: dict) -> None:
+        if not self.memory_entries:
+            return
+        self._memory[key] = result
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[dict]:
+        """
+        Look up a result.
+
+        Args:
+            key (str): Key from ``key``.
+
+        Returns:
+            Optional[dict]: A copy of the stored result, or None on a miss.
+        """
+        with self._lock:
+            result = self._memory.get(key)
+            if result is not None:
+                self._memory.move_to_end(key)
+                metrics.increment("result_cache_memory_hits")
+                return copy.deepcopy(result)
+
+            if self.disk_bytes:
+                try:
+                    if key in self._load_disk_index():
+                        path = self._path(key)
+                        with open(path, "r", encoding="utf-8") as f:
+                            result = json.load(f)
+                        os.utime(path)
+                        self._disk.move_to_end(key)
+                        self._remember(key, result)
+                        metrics.increment("result_cache_disk_hits")
+                        return copy.deepcopy(result)
+                except (OSError, ValueError) as e:
+                    print(f"Result cache read failed: {e}")
+
+        metrics.increment("result_cache_misses")
+        return None
+
+    def put(self, key: str, result: dict) -> None:
+        """
+        Store a result in both tiers.
+
+        Args:
+            key (str): Key from ``key``.
+            result (dict): Inference result.
+        """
+        with self._lock:
+            self._remember(key, copy.deepcopy(result))
+            if not self.disk_bytes:
+                return
+            try:
+                disk = self._load_disk_index()
+                path = self._path(key)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                payload = json.dumps(result, default=json_default).encode("utf-8")
+                tmp_path = f"{path}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(payload)
+                os.replace(tmp_path, path)
+
+                self._disk_total += len(payload) - disk.pop(key, 0)
+                disk[key] = len(payload)
+                while self._disk_total > self.disk_bytes and disk:
+                    evicted, size = disk.popitem(last=False)
+                    self._disk_total -= size
+                    try:
+                        os.remove(self._path(evicted))
+                    except OSError:
+                        pass
+                    metrics.increment("result_cache_evictions")
+            except OSError as e:
+                print(f"Result cache write failed: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Current size of both tiers.
+
+        Returns:
+            Dict[str, int]: Memory entries, disk entries and disk bytes.
+        """
+        with self._lock:
+            return {
+                "memory_entries": len(self._memory),
+                "disk_entries": len(self._disk or {}),
+                "disk_bytes": self._disk_total,
+            }
@@ -0,0 +1,12 @@
+from typing import Any
+
+import numpy as np
+
+
+def json_default(value: Any) -> Any:
+    """Serialize numpy scalars and arrays found in result dictionaries."""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return str(value)
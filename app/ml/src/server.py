@@ -5,10 +5,21 @@ import os
 import sys
 import time
 from pathlib import Path
-from typing import Any, Dict, List, Tuple
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    List,
+    Literal,
+    Optional,
+    Tuple,
+)
 
 # Import FastAPI
 from fastapi import FastAPI, HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
 # Adjust system path for local modules
@@ -17,11 +28,25 @@ sys.path.append(str(Path(__file__).parent.parent))
 # Importing asynccontextmanager
 from contextlib import asynccontextmanager
 
-from src.batch_inference import batch_inference, process_dicom_images
+from src import metrics
+from src.admission import AdmissionController
+from src.batch_controller import AdaptiveBatchController
+from src.batch_inference import parse_outputs
+from src.batcher import MicroBatcher
+from src.dicom_index import DicomIndex
+from src.executors import run_in_executor, shutdown_executors
+from src.folder_watcher import FolderWatcher
+from src.http_client import close_session, get_session
+from src.jobs import JobStore
+from src.pipeline import InferencePipeline
+from src.result_cache import ResultCache, model_fingerprint
+from src.single_flight import SingleFlight, request_key
+from src.study import assemble_study, completed_files, iter_study_frames
+from src.worker_pool import InferenceWorkerPool
 
 # Import custom modules
-from src.model_container import model_container
-from src.utils import cleanup_gpu_memory,DICOMBatchProcessor
+from src.model_container import model_container, model_paths
+from src.utils import cleanup_gpu_memory
 
 
 from fastapi.staticfiles import StaticFiles
@@ -55,14 +80,38 @@ async def lifespan(app: FastAPI):
         None: Yields control back to FastAPI after startup tasks complete
 
     Note:
-        - Uses global model_container to load models
-        - Starts batch_process_images() as background task
+        - Uses global model_container to load models, or starts
+          INFERENCE_WORKERS worker processes that each load their own
+        - Starts batch_process_images() as background task, restarted
+          if it fails (see start_batch_processing)
+        - Opens the pooled HTTP session used to fetch remote images
+        - With WATCH_FOLDER, starts watching WATCH_FOLDER_PATH for new files
+        - Closes the DICOM_INDEX_PATH index on shutdown
         - Models remain loaded until application shutdown
     """
     global model_container
-    model_container.load_all_models()
-    asyncio.create_task(batch_process_images())
+    if worker_pool is not None:
+        worker_pool.start()
+    else:
+        model_container.load_all_models()
+    get_session()
+    start_batch_processing()
+    watch_task = (
+        asyncio.create_task(folder_watcher.run())
+        if folder_watcher is not None
+        else None
+    )
     yield
+    if watch_task is not None:
+        watch_task.cancel()
+        # Let the watcher cancel its in-flight files before shutting down
+        await asyncio.gather(watch_task, return_exceptions=True)
+    if worker_pool is not None:
+        worker_pool.close()
+    if dicom_index is not None:
+        dicom_index.close()
+    await close_session()
+    shutdown_executors()
     del model_container
     cleanup_gpu_memory()
 
@@ -85,26 +134,214 @@ class InputData(BaseModel):
 
     Attributes:
         data (Dict[str, Any]): Dictionary containing input data for inference.
+        priority (str): Queue lane, ``"high"`` (default) for interactive
+            requests or ``"low"`` for bulk backfills.
 
     Required keys:
         - **url** (*str*): URL of the image to process.
 
     Optional keys:
         - **isInverted** (*bool*): Flag indicating if the image is inverted.
+        - **outputs** (*List[str]*): Result fields to compute, e.g.
+          ``["abnormalities", "tb_score"]``. Defaults to all fields.
     """
 
     data: Dict[str, Any]
+    priority: Literal["high", "low"] = "high"
+
+
+class BulkInputData(BaseModel):
+    """
+    Pydantic model for validating bulk input data.
+
+    Attributes:
+        items (List[Dict[str, Any]]): Input data dictionaries, each with the
+            same keys as ``InputData.data``.
+        priority (str): Queue lane for every item, ``"low"`` (default) so bulk
+            imports do not delay interactive requests, or ``"high"``.
+    """
+
+    items: List[Dict[str, Any]]
+    priority: Literal["high", "low"] = "low"
 
 
-# Queue to store incoming image URLs and their response futures
-image_queue: List[Tuple[Dict[str, Any], asyncio.Future]] = []
+class JobInputData(InputData):
+    """
+    Pydantic model for validating job submissions.
+
+    Attributes:
+        callback_url (Optional[str]): URL that receives a POST with the job
+            status once the job finishes.
+    """
+
+    callback_url: Optional[str] = None
+
 
 BATCH_SIZE = int(os.environ.get("BATCH_SIZE", 4))  # Max batch size
-MAX_WAIT_TIME = int(
+MAX_WAIT_TIME = float(
     os.environ.get("MAX_WAIT_TIME", 5)
-)  # Max time to wait before processing
-
-first_request_time = None  # Timestamp of first request in batch
+)  # Max seconds (fractional allowed) to wait before processing a partial batch
+
+PIPELINE_QUEUE_SIZE = int(
+    os.environ.get("PIPELINE_QUEUE_SIZE", 1)
+)  # Max batches waiting between two pipeline stages
+
+INFERENCE_WORKERS = int(
+    os.environ.get("INFERENCE_WORKERS", 0)
+)  # Worker processes holding the models; 0 runs inference in this process
+WORKER_TORCH_THREADS = int(
+    os.environ.get("WORKER_TORCH_THREADS", 0)
+)  # torch intra-op threads per worker process; 0 keeps the torch default
+
+MAX_QUEUE_DEPTH = int(
+    os.environ.get("MAX_QUEUE_DEPTH", 256)
+)  # Max queued requests before rejecting with 429; 0 disables the limit
+LATENCY_BUDGET = float(
+    os.environ.get("LATENCY_BUDGET", 0)
+)  # Max estimated seconds until a result before rejecting with 429; 0 disables
+
+REQUEST_TIMEOUT = float(
+    os.environ.get("REQUEST_TIMEOUT", 0)
+)  # Max seconds a request waits for its result; 0 waits indefinitely
+
+LOW_PRIORITY_STARVATION_TIMEOUT = float(
+    os.environ.get("LOW_PRIORITY_STARVATION_TIMEOUT", 30)
+)  # Seconds a low-priority request may wait before it is guaranteed a slot
+LOW_PRIORITY_SLOTS = int(
+    os.environ.get("LOW_PRIORITY_SLOTS", 1)
+)  # Slots per batch reserved for a starved low-priority lane
+
+ADAPTIVE_BATCHING = (
+    os.environ.get("ADAPTIVE_BATCHING", "False") == "True"
+)  # Tune batch size and wait window from observed traffic
+MIN_BATCH_SIZE = int(
+    os.environ.get("MIN_BATCH_SIZE", 1)
+)  # Lower bound for the adaptive batch size
+MAX_BATCH_SIZE = int(
+    os.environ.get("MAX_BATCH_SIZE", BATCH_SIZE * 2)
+)  # Upper bound for the adaptive batch size
+MIN_WAIT_TIME = float(
+    os.environ.get("MIN_WAIT_TIME", 0.01)
+)  # Lower bound for the adaptive wait window; MAX_WAIT_TIME is the upper bound
+LATENCY_TARGET_P95 = float(
+    os.environ.get("LATENCY_TARGET_P95", 10)
+)  # p95 request latency in seconds the adaptive batching aims for
+
+BULK_MAX_IN_FLIGHT = int(
+    os.environ.get("BULK_MAX_IN_FLIGHT", 32)
+)  # Max queued items per bulk request; further items are queued as results stream out
+
+JOB_STORE_SIZE = int(
+    os.environ.get("JOB_STORE_SIZE", 10000)
+)  # Max jobs kept; the oldest finished jobs are evicted first
+JOB_RESULT_TTL = float(
+    os.environ.get("JOB_RESULT_TTL", 3600)
+)  # Seconds a finished job can still be polled; 0 keeps it until evicted
+JOB_CALLBACK_TIMEOUT = float(
+    os.environ.get("JOB_CALLBACK_TIMEOUT", 10)
+)  # Seconds allowed for one job callback POST
+JOB_CALLBACK_HOSTS = [
+    host for host in os.environ.get("JOB_CALLBACK_HOSTS", "").split(",") if host.strip()
+]  # Comma-separated host or host:port allowlist for callback_url; empty disables
+
+RESULT_CACHE = (
+    os.environ.get("RESULT_CACHE", "True") == "True"
+)  # Serve repeated images from cached results instead of rerunning the models
+RESULT_CACHE_DIR = os.environ.get(
+    "RESULT_CACHE_DIR", "/data/result_cache"
+)  # Folder of the on-disk result cache tier
+RESULT_CACHE_MEMORY_ENTRIES = int(
+    os.environ.get("RESULT_CACHE_MEMORY_ENTRIES", 1024)
+)  # Results kept in the in-memory LRU tier; 0 disables the tier
+RESULT_CACHE_DISK_BYTES = int(
+    os.environ.get("RESULT_CACHE_DISK_BYTES", 1024**3)
+)  # Max size of the on-disk tier in bytes; 0 disables the tier
+
+SINGLE_FLIGHT = (
+    os.environ.get("SINGLE_FLIGHT", "True") == "True"
+)  # Identical in-flight requests share one batch slot and result
+
+WATCH_FOLDER = (
+    os.environ.get("WATCH_FOLDER", "False") == "True"
+)  # Process files copied into WATCH_FOLDER_PATH without an HTTP request
+WATCH_FOLDER_PATH = os.environ.get(
+    "WATCH_FOLDER_PATH", "/data/dicom_input"
+)  # Watched folder; results are written next to the inputs
+WATCH_POLL_INTERVAL = float(
+    os.environ.get("WATCH_POLL_INTERVAL", 2)
+)  # Seconds between two scans of the watched folder
+WATCH_SETTLE_TIME = float(
+    os.environ.get("WATCH_SETTLE_TIME", 5)
+)  # Seconds a file must stay unchanged before it is considered complete
+
+DICOM_INDEX_PATH = os.environ.get(
+    "DICOM_INDEX_PATH", ""
+)  # SQLite index recording processed study and watched files; empty disables
+
+# Queue of incoming requests and their response futures
+batcher = MicroBatcher(
+    BATCH_SIZE,
+    MAX_WAIT_TIME,
+    starvation_timeout=LOW_PRIORITY_STARVATION_TIMEOUT,
+    low_priority_slots=LOW_PRIORITY_SLOTS,
+)
+admission = AdmissionController(MAX_QUEUE_DEPTH, LATENCY_BUDGET)
+batch_controller = (
+    AdaptiveBatchController(
+        batcher,
+        min_batch_size=MIN_BATCH_SIZE,
+        max_batch_size=MAX_BATCH_SIZE,
+        min_wait_time=MIN_WAIT_TIME,
+        max_wait_time=MAX_WAIT_TIME,
+        latency_target=LATENCY_TARGET_P95,
+    )
+    if ADAPTIVE_BATCHING
+    else None
+)
+worker_pool = (
+    InferenceWorkerPool(INFERENCE_WORKERS, torch_threads=WORKER_TORCH_THREADS)
+    if INFERENCE_WORKERS > 0
+    else None
+)
+single_flight = SingleFlight() if SINGLE_FLIGHT else None
+job_store = JobStore(
+    JOB_STORE_SIZE,
+    JOB_RESULT_TTL,
+    callback_timeout=JOB_CALLBACK_TIMEOUT,
+    callback_hosts=JOB_CALLBACK_HOSTS,
+)
+result_cache = (
+    ResultCache(
+        RESULT_CACHE_DIR,
+        RESULT_CACHE_MEMORY_ENTRIES,
+        RESULT_CACHE_DISK_BYTES,
+        model_fingerprint(model_paths),
+    )
+    if RESULT_CACHE
+    else None
+)
+pipeline = InferencePipeline(
+    batcher,
+    queue_size=PIPELINE_QUEUE_SIZE,
+    worker_pool=worker_pool,
+    admission=admission,
+    controller=batch_controller,
+    result_cache=result_cache,
+)
+dicom_index = DicomIndex(DICOM_INDEX_PATH) if DICOM_INDEX_PATH else None
+folder_watcher = (
+    FolderWatcher(
+        WATCH_FOLDER_PATH,
+        lambda data: enqueue_request(data, priority="low"),
+        poll_interval=WATCH_POLL_INTERVAL,
+        settle_time=WATCH_SETTLE_TIME,
+        max_in_flight=BULK_MAX_IN_FLIGHT,
+        index=dicom_index,
+        admit=admission_retry_after,
+    )
+    if WATCH_FOLDER
+    else None
+)
 
 
 # async def batch_process_images():
@@ -191,67 +428,44 @@ first_request_time = None  # Timestamp of first request in batch
 #         await asyncio.sleep(1)  # Small delay to prevent busy-waiting
 async def batch_process_images():
     """
-#     Background task that processes queued images in batches.
-
-#     This function runs continuously and processes images when either:
-#     - The queue reaches BATCH_SIZE
-#     - MAX_WAIT_TIME seconds have passed since the first request in batch
-
-#     Global variables used:
-#         image_queue: List of tuples containing (input_data, future)
-#         first_request_time: Timestamp of first request in current batch
-#         BATCH_SIZE: Maximum number of images to process in one batch
-#         MAX_WAIT_TIME: Maximum seconds to wait before processing incomplete batch
-
-#     Note:
-#         - Processes up to BATCH_SIZE images at once
-#         - Uses batch_inference for multiple images
-#         - Sets results in futures to resolve waiting requests
-#         - Maintains continuous operation with 1-second sleep intervals
-#     """
-    global image_queue, first_request_time
-
-    while True:
-        if len(image_queue) > 0:
-            if first_request_time is None:
-                first_request_time = time.time()
-
-            if (
-                len(image_queue) >= BATCH_SIZE
-                or (time.time() - first_request_time) >= MAX_WAIT_TIME
-            ):
-                batch = image_queue[:BATCH_SIZE]
-                image_queue = image_queue[BATCH_SIZE:]
+    Background task that processes queued images in batches.
 
-                first_request_time = None if not image_queue else time.time()
+    The batcher wakes the pipeline as soon as a request is enqueued and
+    releases a batch when either:
+    - The queue reaches BATCH_SIZE
+    - MAX_WAIT_TIME seconds have passed since the oldest queued request
 
-                input_data_batch = [entry[0] for entry in batch]
-                futures = [entry[1] for entry in batch]
-
-                print(f"Processing batch of {len(input_data_batch)} images...")
+    Note:
+        - Processes up to BATCH_SIZE images at once
+        - Decoding, inference, rendering and upload of consecutive batches
+          overlap (see InferencePipeline)
+        - Sets results in futures to resolve waiting requests
+    """
+    await pipeline.run()
 
-                converted = []
-                converted_folder = Path("/data/converted_png/")
-                os.makedirs(converted_folder, exist_ok=True)
-                processor = DICOMBatchProcessor(str(converted_folder))
 
-                for item in input_data_batch:
-                    local_path = Path(item["url"].replace("file://", ""))
-                    output_path = processor.convert_batch(str(local_path))
-                    converted.append({"url": f"file://{output_path}"})
+def start_batch_processing() -> asyncio.Task:
+    """
+    Start batch_process_images() as a task that is restarted when it fails.
 
-                if not converted:
-                    print("Critical inference error: No valid images were processed")
-                    for future in futures:
-                        future.set_result({"error": "No valid images were processed"})
-                    continue
+    Returns:
+        asyncio.Task: The batch processing task.
 
-                results = await batch_inference(converted)
+    Note:
+        Without it, queued requests would never be resolved once the
+        pipeline stopped.
+    """
+    task = asyncio.create_task(batch_process_images())
+    task.add_done_callback(_restart_batch_processing)
+    return task
 
-                for future, result in zip(futures, results):
-                    future.set_result(result)
 
-        await asyncio.sleep(1) # Small delay to prevent busy-waiting
+def _restart_batch_processing(task: asyncio.Task) -> None:
+    if task.cancelled():
+        return
+    print(f"Batch processing stopped: {task.exception()!r}; restarting")
+    metrics.increment("pipeline_restarts")
+    start_batch_processing()
 
 
 
@@ -275,6 +489,131 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/metrics")
+async def get_metrics():
+    """
+    Queue and admission metrics.
+
+    Returns:
+        dict: Current queue depth, the estimated wait for a new request,
+            recent batch timings, the batching settings (with the adaptive
+            controller's recent decisions when ADAPTIVE_BATCHING is on), the
+            result cache size and event counters such as rejections and
+            result cache hits and misses.
+    """
+    return {
+        "queue_depth": len(batcher),
+        "queue_depth_by_priority": batcher.depths(),
+        "max_queue_depth": MAX_QUEUE_DEPTH,
+        "estimated_wait": admission.estimated_wait(len(batcher), batcher.batch_size),
+        **admission.stats(),
+        "batching": (
+            batch_controller.state()
+            if batch_controller is not None
+            else {
+                "batch_size": batcher.batch_size,
+                "max_wait_time": batcher.max_wait_time,
+            }
+        ),
+        "in_flight": len(single_flight) if single_flight is not None else None,
+        "jobs": len(job_store),
+        "result_cache": result_cache.stats() if result_cache is not None else None,
+        "counters": metrics.get_counters(),
+    }
+
+
+def admission_retry_after() -> Optional[int]:
+    """
+    Check whether a new request could be admitted, without counting it.
+
+    Returns:
+        Optional[int]: None to admit the request, otherwise the seconds to
+            wait because the queue is full or the estimated wait exceeds
+            LATENCY_BUDGET.
+
+    Note:
+        Used by the folder watcher, whose deferrals are only counted under
+        ``folder_watcher_deferred``.
+    """
+    return admission.check(len(batcher), batcher.batch_size, record=False)
+
+
+def admit_request() -> None:
+    """
+    Apply admission control before queueing a request.
+
+    Raises:
+        HTTPException: 429 with a Retry-After header if the queue is full or
+            the estimated wait exceeds LATENCY_BUDGET.
+    """
+    retry_after = admission.check(len(batcher), batcher.batch_size)
+    if retry_after is not None:
+        raise HTTPException(
+            status_code=429,
+            detail="Inference queue is overloaded, retry later",
+            headers={"Retry-After": str(retry_after)},
+        )
+
+
+def enqueue_request(
+    data: Dict[str, Any],
+    priority: str = "high",
+    listener: Optional[Callable[[str, dict], None]] = None,
+) -> asyncio.Future:
+    """
+    Queue a request for batch inference.
+
+    Args:
+        data (Dict[str, Any]): Input data dictionary for inference.
+        priority (str, optional): Queue lane. Defaults to ``"high"``.
+        listener (Callable[[str, dict], None], optional): Receives partial
+            results as pipeline stages complete. Defaults to None.
+
+    Returns:
+        asyncio.Future: Future resolved with the inference result.
+
+    Note:
+        With SINGLE_FLIGHT, a request identical to one already queued or
+        running attaches to it instead of taking another batch slot. Requests
+        with a listener always get their own slot.
+    """
+
+    def start() -> asyncio.Future:
+        if batch_controller is not None:
+            batch_controller.observe_arrival()
+        return batcher.enqueue(data, priority=priority, listener=listener)
+
+    if single_flight is None or listener is not None:
+        return start()
+    return single_flight.join(request_key(data, priority), start)
+
+
+async def wait_for_result(future: asyncio.Future) -> dict:
+    """
+    Wait for a queued request's result, honouring REQUEST_TIMEOUT.
+
+    Args:
+        future (asyncio.Future): Future returned by the batcher.
+
+    Returns:
+        dict: The inference result.
+
+    Raises:
+        asyncio.TimeoutError: If REQUEST_TIMEOUT elapses first.
+
+    Note:
+        On timeout or cancellation the future is cancelled, so the batcher
+        skips the request instead of spending a batch slot on it.
+    """
+    try:
+        if REQUEST_TIMEOUT > 0:
+            return await asyncio.wait_for(future, timeout=REQUEST_TIMEOUT)
+        return await future
+    finally:
+        if not future.done():
+            future.cancel()
+
+
 @app.post("/invocations")
 async def predict(input_data: InputData):
     """
@@ -292,20 +631,28 @@ async def predict(input_data: InputData):
 
     Raises:
         HTTPException:
-            - 400: Invalid input data or format
+            - 400: Invalid input data or format, or unknown ``outputs``
+            - 429: Queue full or latency budget exceeded (see Retry-After)
             - 499: Request cancelled
+            - 504: Result not ready within REQUEST_TIMEOUT
             - 500: Unexpected server error
 
     Note:
         - Requests are queued for batch processing
         - Results are returned asynchronously when batch is processed
+        - Cancelled or timed-out requests are dropped from the queue
+        - High-priority requests are batched ahead of low-priority ones
+        - Only the stages needed for the selected ``outputs`` are run
         - Supports both single image and batch processing
     """
+    admit_request()
     try:
-        future = asyncio.get_running_loop().create_future()
-        image_queue.append((input_data.data, future))
-        return await future
+        parse_outputs(input_data.data)
+        future = enqueue_request(input_data.data, priority=input_data.priority)
+        return await wait_for_result(future)
 
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Inference timed out")
     except asyncio.CancelledError:
         print("Request was cancelled (client likely disconnected)")
         raise HTTPException(status_code=499, detail="Request was cancelled")
@@ -317,6 +664,446 @@ async def predict(input_data: InputData):
         print(f"Unexpected error: {e}")
         raise HTTPException(status_code=500, detail=f"Unexpected error: {e}")
 
+
+def bulk_line(index: int, result: dict) -> str:
+    """
+    Format one bulk result as an NDJSON line.
+
+    Args:
+        index (int): Position of the item in the bulk request.
+        result (dict): Inference result or error for the item.
+
+    Returns:
+        str: JSON object with ``index`` and the result fields, newline terminated.
+    """
+    return json.dumps(jsonable_encoder({"index": index, **result})) + "\n"
+
+
+async def iterate(items: List[Dict[str, Any]]) -> AsyncIterator[Dict[str, Any]]:
+    """Yield the items of a list as an async iterator (see ``bulk_results``)."""
+    for item in items:
+        yield item
+
+
+async def bulk_results(
+    items: AsyncIterator[Dict[str, Any]], priority: str
+) -> AsyncIterator[Tuple[int, dict]]:
+    """
+    Queue items as they arrive and yield their results in completion order.
+
+    At most BULK_MAX_IN_FLIGHT items are queued at a time; the next ones are
+    taken from ``items`` as results come back, so one bulk request cannot
+    fill the whole queue. Items waiting longer than REQUEST_TIMEOUT are
+    reported as timed out.
+
+    Args:
+        items (AsyncIterator[Dict[str, Any]]): Validated input data
+            dictionaries, possibly produced lazily.
+        priority (str): Queue lane for every item.
+
+    Yields:
+        Tuple[int, dict]: Position of the item in ``items`` and its result or
+            error.
+
+    Note:
+        When the iterator is closed early, e.g. because the client
+        disconnected, the items still queued are cancelled so the batcher
+        skips them.
+    """
+    pending: Dict[asyncio.Future, Tuple[int, float]] = {}
+    next_index = 0
+    exhausted = False
+    try:
+        while not exhausted or pending:
+            while not exhausted and len(pending) < BULK_MAX_IN_FLIGHT:
+                try:
+                    item = await items.__anext__()
+                except StopAsyncIteration:
+                    exhausted = True
+                    break
+                future = enqueue_request(item, priority=priority)
+                pending[future] = (next_index, time.monotonic())
+                next_index += 1
+            if not pending:
+                break
+
+            timeout = None
+            if REQUEST_TIMEOUT > 0:
+                oldest = min(queued_at for _, queued_at in pending.values())
+                timeout = max(0.0, oldest + REQUEST_TIMEOUT - time.monotonic())
+            done, _ = await asyncio.wait(
+                pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+            )
+
+            for future in done:
+                index, _ = pending.pop(future)
+                if future.cancelled():
+                    yield index, {"error": "Request was cancelled"}
+                elif future.exception() is not None:
+                    yield index, {"error": str(future.exception())}
+                else:
+                    yield index, future.result()
+
+            if REQUEST_TIMEOUT > 0:
+                now = time.monotonic()
+                for future, (index, queued_at) in list(pending.items()):
+                    if now - queued_at >= REQUEST_TIMEOUT:
+                        future.cancel()
+                        del pending[future]
+                        yield index, {"error": "Inference timed out"}
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+async def stream_bulk_results(
+    items: List[Dict[str, Any]], priority: str
+) -> AsyncIterator[str]:
+    """
+    Queue bulk items and yield their results in completion order.
+
+    Args:
+        items (List[Dict[str, Any]]): Validated input data dictionaries.
+        priority (str): Queue lane for every item.
+
+    Yields:
+        str: One NDJSON line per item (see ``bulk_line``).
+
+    Note:
+        Items are queued at most BULK_MAX_IN_FLIGHT at a time, see
+        ``bulk_results``.
+    """
+    results = bulk_results(iterate(items), priority)
+    try:
+        async for index, result in results:
+            yield bulk_line(index, result)
+    finally:
+        await results.aclose()
+
+
+@app.post("/invocations/bulk")
+async def predict_bulk(input_data: BulkInputData):
+    """
+    Bulk prediction endpoint streaming one NDJSON line per image.
+
+    Args:
+        input_data (BulkInputData): Pydantic model containing the list of
+            inference request data.
+
+    Returns:
+        StreamingResponse: ``application/x-ndjson`` body with one line per
+            item as soon as it finishes, in completion order. Each line has
+            the item's ``index`` plus the same fields as ``/invocations``.
+
+    Raises:
+        HTTPException:
+            - 400: Empty item list, or invalid input data in any item
+            - 429: Queue full or latency budget exceeded (see Retry-After)
+
+    Note:
+        - Items go straight into the batcher, so one bulk request fills
+          batches without per-image HTTP overhead
+        - Admission control is applied once, before the first item is queued
+        - Errors of individual items are reported in their line
+    """
+    if not input_data.items:
+        raise HTTPException(status_code=400, detail="items cannot be empty")
+    try:
+        for item in input_data.items:
+            parse_outputs(item)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    admit_request()
+    return StreamingResponse(
+        stream_bulk_results(input_data.items, input_data.priority),
+        media_type="application/x-ndjson",
+    )
+
+
+async def study_items(
+    path: str, options: Dict[str, Any], frames: List[Dict[str, Any]]
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Enumerate the frames of a study off the event loop, as inference items.
+
+    Args:
+        path (str): Study folder, DICOMDIR or multi-frame file.
+        options (Dict[str, Any]): Request options applied to every frame,
+            e.g. ``outputs``.
+        frames (List[Dict[str, Any]]): Receives every enumerated frame, in
+            item order.
+
+    Yields:
+        Dict[str, Any]: Input data for one frame.
+    """
+    frame_iter = iter_study_frames(path)
+    while True:
+        # Each step reads one header
+        frame = await run_in_executor("io", next, frame_iter, None)
+        if frame is None:
+            return
+        frames.append(frame)
+        yield {**options, "url": f"file://{frame['path']}", "frame": frame["frame"]}
+
+
+@app.post("/invocations/study")
+async def predict_study(input_data: InputData):
+    """
+    Study prediction endpoint for a DICOM folder, DICOMDIR or multi-frame file.
+
+    Args:
+        input_data (InputData): Pydantic model whose ``url`` is the local
+            path (or ``file://`` URL) of the study. The other keys, e.g.
+            ``outputs``, apply to every frame.
+
+    Returns:
+        dict: ``frames`` count and the results grouped by study and series
+            (see ``assemble_study``).
+
+    Raises:
+        HTTPException:
+            - 400: Missing or unknown study path, no frames, or invalid input
+            - 429: Queue full or latency budget exceeded (see Retry-After)
+            - 500: Unexpected server error
+
+    Note:
+        - Frames are listed lazily, reading only headers, and go straight
+          into the batcher as individual items while the rest of the study
+          is still being listed
+        - At most BULK_MAX_IN_FLIGHT frames are queued at a time
+        - Errors of individual frames are reported in their entry
+        - With DICOM_INDEX_PATH, files whose frames all succeeded are marked
+          as processed in the index
+    """
+    options = dict(input_data.data)
+    url = options.pop("url", None)
+    if not url:
+        raise HTTPException(status_code=400, detail="url is required")
+    path = url[7:] if url.startswith("file://") else url
+    if not os.path.exists(path):
+        raise HTTPException(status_code=400, detail=f"Study not found: {path}")
+    try:
+        parse_outputs(options)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    admit_request()
+    frames: List[Dict[str, Any]] = []
+    results: Dict[int, dict] = {}
+    try:
+        async for index, result in bulk_results(
+            study_items(path, options, frames), input_data.priority
+        ):
+            results[index] = result
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"Unexpected error: {e}")
+        raise HTTPException(status_code=500, detail=f"Unexpected error: {e}")
+
+    if not frames:
+        raise HTTPException(status_code=400, detail="No DICOM frames found")
+    results = [results[index] for index in range(len(frames))]
+    if dicom_index is not None:
+        await run_in_executor(
+            "io", dicom_index.mark_processed, completed_files(frames, results)
+        )
+    return assemble_study(frames, results)
+
+
+def sse_event(event: str, payload: dict) -> str:
+    """
+    Format one server-sent event.
+
+    Args:
+        event (str): Event name.
+        payload (dict): Event data, sent as JSON.
+
+    Returns:
+        str: The event in ``text/event-stream`` format.
+    """
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(payload))}\n\n"
+
+
+async def stream_progress(data: Dict[str, Any], priority: str) -> AsyncIterator[str]:
+    """
+    Queue a request and yield its partial and final results as events.
+
+    Args:
+        data (Dict[str, Any]): Validated input data dictionary.
+        priority (str): Queue lane.
+
+    Yields:
+        str: ``run_models`` and ``render_results`` events with the fields
+            known after those stages, then a final ``result`` event, or an
+            ``error`` event on timeout or cancellation.
+
+    Note:
+        If the client disconnects, the request is cancelled so the batcher
+        skips it.
+    """
+    events: asyncio.Queue = asyncio.Queue()
+    future = enqueue_request(
+        data,
+        priority=priority,
+        listener=lambda stage, partial: events.put_nowait((stage, partial)),
+    )
+    future.add_done_callback(lambda _: events.put_nowait(("result", None)))
+    deadline = time.monotonic() + REQUEST_TIMEOUT if REQUEST_TIMEOUT > 0 else None
+
+    try:
+        while True:
+            timeout = None
+            if deadline is not None:
+                timeout = max(0.0, deadline - time.monotonic())
+            try:
+                event, payload = await asyncio.wait_for(events.get(), timeout=timeout)
+            except asyncio.TimeoutError:
+                yield sse_event("error", {"error": "Inference timed out"})
+                return
+
+            if event != "result":
+                yield sse_event(event, payload)
+            elif future.cancelled():
+                yield sse_event("error", {"error": "Request was cancelled"})
+                return
+            elif future.exception() is not None:
+                yield sse_event("error", {"error": str(future.exception())})
+                return
+            else:
+                yield sse_event("result", future.result())
+                return
+    finally:
+        if not future.done():
+            future.cancel()
+
+
+@app.post("/invocations/stream")
+async def predict_stream(input_data: InputData):
+    """
+    Streaming prediction endpoint sending results as server-sent events.
+
+    Args:
+        input_data (InputData): Pydantic model containing inference request data.
+
+    Returns:
+        StreamingResponse: ``text/event-stream`` body. Findings
+            (``abnormalities``, ``is_normal``, ``tb_score``) arrive in the
+            ``run_models`` event, segmentation, locations and the CTR ratio in
+            the ``render_results`` event, and the full result with artifact
+            URLs in the final ``result`` event.
+
+    Raises:
+        HTTPException:
+            - 400: Invalid input data
+            - 429: Queue full or latency budget exceeded (see Retry-After)
+
+    Note:
+        - Partial events respect the selected ``outputs``
+        - With INFERENCE_WORKERS > 0 only the final ``result`` event is sent
+    """
+    try:
+        parse_outputs(input_data.data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    admit_request()
+    return StreamingResponse(
+        stream_progress(input_data.data, input_data.priority),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"},
+    )
+
+
+@app.post("/jobs", status_code=202)
+async def submit_job(input_data: JobInputData):
+    """
+    Submit an inference job and return immediately.
+
+    Args:
+        input_data (JobInputData): Same fields as ``/invocations`` plus an
+            optional ``callback_url``.
+
+    Returns:
+        dict: The new job, with ``job_id`` and status ``"queued"``.
+
+    Raises:
+        HTTPException:
+            - 400: Invalid input data, or a ``callback_url`` whose host is
+              not in JOB_CALLBACK_HOSTS
+            - 429: Queue or job store full, or latency budget exceeded
+
+    Note:
+        - REQUEST_TIMEOUT does not apply; the job waits in the queue as long
+          as needed
+        - Poll ``GET /jobs/{job_id}`` or wait for the callback, which receives
+          the same body as the poll endpoint
+    """
+    try:
+        parse_outputs(input_data.data)
+        if input_data.callback_url:
+            job_store.check_callback_url(input_data.callback_url)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    admit_request()
+    job = job_store.create(callback_url=input_data.callback_url)
+    if job is None:
+        metrics.increment("rejected_job_store_full")
+        raise HTTPException(
+            status_code=429,
+            detail="Job store is full, retry later",
+            headers={"Retry-After": "1"},
+        )
+    job_store.start(job, enqueue_request(input_data.data, input_data.priority))
+    return job.to_dict()
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    Poll the status of an inference job.
+
+    Args:
+        job_id (str): Identifier returned by ``POST /jobs``.
+
+    Returns:
+        dict: Job id, status (``queued``, ``completed``, ``failed`` or
+            ``cancelled``), timestamps, and the result once completed.
+
+    Raises:
+        HTTPException: 404 if the job is unknown or has expired.
+    """
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """
+    Cancel a queued inference job.
+
+    Args:
+        job_id (str): Identifier returned by ``POST /jobs``.
+
+    Returns:
+        dict: The job after cancellation.
+
+    Raises:
+        HTTPException:
+            - 404: Unknown or expired job
+            - 409: Job already finished
+    """
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if not job_store.cancel(job_id):
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}")
+    return job.to_dict()
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,           # List of origins that are allowed to make CORS requests
@@ -0,0 +1,97 @@
+import asyncio
+import json
+from typing import Any, Callable, Dict
+
+from src import metrics
+
+
+def request_key(data: Dict[str, Any], priority: str) -> str:
+    """
+    Canonical identity of a request.
+
+    Args:
+        data (Dict[str, Any]): Input data dictionary.
+        priority (str): Queue lane; part of the key so that a high-priority
+            request never waits behind a queued low-priority duplicate.
+
+    Returns:
+        str: Key equal for requests with the same data, regardless of key order.
+    """
+    return json.dumps([data, priority], sort_keys=True, default=str)
+
+
+class _Flight:
+    __slots__ = ("future", "waiters")
+
+    def __init__(self, future: asyncio.Future):
+        self.future = future
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Deduplication of identical in-flight requests.
+
+    The first request for a key starts the work; identical requests arriving
+    while it is queued or running attach to the same result instead of taking
+    another batch slot. Every caller gets its own waiter future, so a caller
+    may cancel or time out without affecting the others; the work itself is
+    cancelled only once every waiter is gone.
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    def join(self, key: str, start: Callable[[], asyncio.Future]) -> asyncio.Future:
+        """
+        Attach to the in-flight work for ``key``, starting it if needed.
+
+        Args:
+            key (str): Request identity, see ``request_key``.
+            start (Callable[[], asyncio.Future]): Starts the work and returns
+                its future, e.g. by queueing the request in the batcher.
+
+        Returns:
+            asyncio.Future: A waiter resolved with the shared result.
+        """
+        flight = self._flights.get(key)
+        if flight is None or flight.future.done():
+            flight = _Flight(start())
+            self._flights[key] = flight
+            flight.future.add_done_callback(
+                lambda _, flight=flight: self._forget(key, flight)
+            )
+        else:
+            metrics.increment("single_flight_joined")
+
+        waiter = asyncio.get_running_loop().create_future()
+        flight.waiters += 1
+        flight.future.add_done_callback(lambda future: self._settle(future, waiter))
+        waiter.add_done_callback(lambda _: self._leave(flight))
+        return waiter
+
+    def _forget(self, key: str, flight: _Flight) -> None:
+        # A newer flight may already have taken over the key
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    @staticmethod
+    def _settle(future: asyncio.Future, waiter: asyncio.Future) -> None:
+        if waiter.done():
+            return
+        if future.cancelled():
+            waiter.cancel()
+        elif future.exception() is not None:
+            waiter.set_exception(future.exception())
+        else:
+            waiter.set_result(future.result())
+
+    @staticmethod
+    def _leave(flight: _Flight) -> None:
+        flight.waiters -= 1
+        if flight.waiters == 0 and not flight.future.done():
+            # Nobody is waiting any more; let the batcher skip the request
+            flight.future.cancel()
@@ -0,0 +1,154 @@
+import os
+from typing import Any, Dict, Iterator, List
+
+import pydicom
+from pydicom.errors import InvalidDicomError
+
+
+def _dicomdir_files(dicomdir_path: str) -> Iterator[str]:
+    """Yield the image files referenced by a DICOMDIR, in record order."""
+    root = os.path.dirname(dicomdir_path)
+    dicomdir = pydicom.dcmread(dicomdir_path)
+    for record in dicomdir.DirectoryRecordSequence:
+        if record.get("DirectoryRecordType") != "IMAGE":
+            continue
+        file_id = record.get("ReferencedFileID")
+        if file_id is None:
+            continue
+        parts = [file_id] if isinstance(file_id, str) else list(file_id)
+        yield os.path.join(root, *parts)
+
+
+def _study_files(path: str) -> Iterator[str]:
+    """Yield the candidate DICOM files of a study input."""
+    if os.path.isdir(path):
+        dicomdir_path = os.path.join(path, "DICOMDIR")
+        if os.path.isfile(dicomdir_path):
+            yield from _dicomdir_files(dicomdir_path)
+            return
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for file in sorted(files):
+                yield os.path.join(root, file)
+    elif os.path.basename(path).upper() == "DICOMDIR":
+        yield from _dicomdir_files(path)
+    else:
+        yield path
+
+
+def iter_study_frames(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Lazily enumerate the frames of a study.
+
+    Only headers are read, one file at a time, so the first frames can be
+    queued for inference while the rest of the study is still being listed.
+
+    Args:
+        path (str): A folder of DICOM files, a DICOMDIR (or a folder holding
+            one) or a single, possibly multi-frame, DICOM file.
+
+    Yields:
+        Dict[str, Any]: One entry per frame with ``path``, ``frame``,
+            ``study_uid``, ``series_uid`` and ``instance_number``.
+
+    Raises:
+        FileNotFoundError: If ``path`` does not exist.
+
+    Note:
+        Files that are not DICOM, and DICOM objects without pixel data such as
+        reports, are skipped.
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Study not found: {path}")
+
+    for file_path in _study_files(path):
+        if os.path.basename(file_path).upper() == "DICOMDIR":
+            continue
+        try:
+            header = pydicom.dcmread(file_path, stop_before_pixels=True)
+        except (InvalidDicomError, OSError) as e:
+            print(f"Skipping {file_path}: {e}")
+            continue
+        if "Rows" not in header:
+            continue
+
+        for frame in range(int(header.get("NumberOfFrames") or 1)):
+            yield {
+                "path": file_path,
+                "frame": frame,
+                "study_uid": str(header.get("StudyInstanceUID", "")),
+                "series_uid": str(header.get("SeriesInstanceUID", "")),
+                "instance_number": int(header.get("InstanceNumber") or 0),
+            }
+
+
+def completed_files(frames: List[Dict[str, Any]], results: List[dict]) -> List[str]:
+    """
+    Files whose frames all have a result without an error.
+
+    Args:
+        frames (List[Dict[str, Any]]): Frames from ``iter_study_frames``.
+        results (List[dict]): Inference result or error of each frame.
+
+    Returns:
+        List[str]: Paths of the completed files, in frame order.
+    """
+    completed: Dict[str, bool] = {}
+    for frame, result in zip(frames, results):
+        completed[frame["path"]] = completed.get(frame["path"], True) and not (
+            result.get("error")
+        )
+    return [path for path, done in completed.items() if done]
+
+
+def assemble_study(frames: List[Dict[str, Any]], results: List[dict]) -> dict:
+    """
+    Group per-frame results by study and series.
+
+    Args:
+        frames (List[Dict[str, Any]]): Frames from ``iter_study_frames``.
+        results (List[dict]): Inference result or error of each frame.
+
+    Returns:
+        dict: ``frames`` count and ``studies``, each with its ``study_uid``
+            and ``series``; every series lists its ``images`` ordered by
+            instance number and frame, with the frame's ``path``, ``frame``
+            and ``instance_number`` next to the result fields.
+    """
+    studies: Dict[str, Dict[str, List[dict]]] = {}
+    for frame, result in zip(frames, results):
+        images = studies.setdefault(frame["study_uid"], {}).setdefault(
+            frame["series_uid"], []
+        )
+        images.append(
+            {
+                "path": frame["path"],
+                "frame": frame["frame"],
+                "instance_number": frame["instance_number"],
+                **result,
+            }
+        )
+
+    return {
+        "frames": len(frames),
+        "studies": [
+            {
+                "study_uid": study_uid,
+                "series": [
+                    {
+                        "series_uid": series_uid,
+                        "images": sorted(
+                            images,
+                            key=lambda image: (
+                                image["instance_number"],
+                                image["path"],
+                                image["frame"],
+                            ),
+                        ),
+                    }
+                    for series_uid, images in series.items()
+                ],
+            }
+            for study_uid, series in studies.items()
+        ],
+    }
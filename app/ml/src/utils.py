@@ -1,7 +1,12 @@
+import argparse
 import gc
 import io
+import json
+import multiprocessing as mp
 import os
-from typing import List
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
 
 import boto3
 import cv2
@@ -17,6 +22,19 @@ import sys
 from icecream import ic
 from tqdm import tqdm
 
+try:
+    from pydicom.pixels import apply_modality_lut, apply_voi_lut
+    from pydicom.pixels import pixel_array as read_pixels
+except ImportError:  # pydicom < 3
+    from pydicom.pixel_data_handlers.util import apply_modality_lut, apply_voi_lut
+
+    read_pixels = None
+
+from src.executors import run_in_executor
+
+DICOM_EXTENSIONS = (".dcm", ".dicom", ".dic")
+
+
 class DICOMBatchProcessor:
     def __init__(self, output_folder: str, image_size=(1024, 1024)):
         """
@@ -48,6 +66,29 @@ class DICOMBatchProcessor:
         self.converter.convert_dicom_to_png(input_image, png_path)
         return png_path
 
+    def write_png(self, image: np.ndarray, png_path: str) -> bool:
+        """
+        Save an already decoded and resized image as PNG.
+
+        The PNG is written to a temporary file and renamed into place, so
+        readers never see a partial file.
+
+        Args:
+            image (np.ndarray): Grayscale uint8 image.
+            png_path (str): Destination path inside ``output_folder``.
+
+        Returns:
+            bool: Whether the image was written.
+        """
+        success, encoded_image = cv2.imencode(".png", image)
+        if not success:
+            return False
+        tmp_path = f"{png_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(encoded_image.tobytes())
+        os.replace(tmp_path, png_path)
+        return True
+
 
 
 class DICOMConverter:
@@ -84,33 +125,128 @@ class DICOMConverter:
     #     file_size = os.path.getsize(output_path) / 1024  # KB
     #     print(f"Saved: {output_path} | Size: {file_size:.2f} KB | Resolution: {image.size}")
 
-    def convert_dicom_to_png(self, input_path: str, output_path: str):
+    def read_dicom(self, input_path: str, frame: Optional[int] = None) -> np.ndarray:
         """
-        Convert and resize DICOM or standard image to PNG.
+        Decode a DICOM file straight to ``output_size``.
 
         Args:
-            input_path (str): Path to input file (.dcm, .png, .jpg, etc.)
-            output_path (str): Path where the resized PNG will be saved.
-        """
-        ext = os.path.splitext(input_path)[1].lower()
+            input_path (str): Path to the DICOM file.
+            frame (int, optional): Frame of a multi-frame file. Defaults to
+                None, the first frame.
 
-        if ext in (".dcm", ".dicom", ".dic"):
-            # DICOM conversion
+        Returns:
+            np.ndarray: Grayscale image with shape ``output_size`` and dtype uint8.
+                Colour images are reduced to their luma.
+        """
+        if frame is not None and read_pixels is not None:
+            # Decode only the requested frame instead of the whole file
+            pd_image = pydicom.dcmread(input_path, stop_before_pixels=True)
+            pixels = read_pixels(input_path, index=frame)
+        else:
             pd_image = pydicom.dcmread(input_path)
-            image = pd_image.pixel_array.astype(np.float32)
+            pixels = pd_image.pixel_array
+            if int(pd_image.get("NumberOfFrames") or 1) > 1:
+                pixels = pixels[frame or 0]
+        return self.render_dicom(pd_image, self._to_grayscale(pd_image, pixels))
+
+    @staticmethod
+    def _to_grayscale(pd_image, pixels: np.ndarray) -> np.ndarray:
+        """Reduce the pixels of a colour frame (SamplesPerPixel 3) to luma."""
+        if pixels.ndim != 3:
+            return pixels
+        transfer_syntax = pd_image.file_meta.get("TransferSyntaxUID")
+        if (
+            read_pixels is None
+            and str(pd_image.get("PhotometricInterpretation", "")).startswith("YBR")
+            and transfer_syntax is not None
+            and not transfer_syntax.is_compressed
+        ):
+            # pydicom < 3 leaves native YBR data unconverted; Y is the luma
+            return np.ascontiguousarray(pixels[..., 0])
+        return cv2.cvtColor(np.ascontiguousarray(pixels), cv2.COLOR_RGB2GRAY)
+
+    def render_dicom(self, pd_image, pixels: np.ndarray) -> np.ndarray:
+        """
+        Turn stored DICOM pixels into a display image at ``output_size``.
 
-            # Normalize and invert if MONOCHROME1
-            image = (image - image.min()) / (image.max() - image.min())
-            if pd_image[0x28, 0x04].value == 'MONOCHROME1':
-                image = 1 - image
+        The stored values are first downsampled in their native dtype. The
+        modality rescale (RescaleSlope/Intercept or Modality LUT), the VOI
+        window or LUT and the MONOCHROME1 inversion are then applied through
+        a lookup table over the stored values that remain, so no
+        full-resolution float copy is made.
 
-            image = (image * 255).astype(np.uint8)
-            image = Image.fromarray(image).resize(self.output_size, Image.LANCZOS)
+        Args:
+            pd_image (pydicom.Dataset): Dataset holding the pixel attributes.
+            pixels (np.ndarray): Stored values of one frame, shape (H, W).
 
-        else:
-            # Standard image handling
-            image = Image.open(input_path).convert("RGB")
-            image = image.resize(self.output_size, Image.LANCZOS)
+        Returns:
+            np.ndarray: Grayscale image with shape ``output_size`` and dtype uint8.
+        """
+        if pixels.dtype not in (np.uint8, np.uint16, np.int16):
+            # cv2.resize has no 32-bit integer support
+            pixels = pixels.astype(np.float32)
+        small = cv2.resize(pixels, self.output_size, interpolation=cv2.INTER_AREA)
+
+        if not np.issubdtype(small.dtype, np.integer):
+            return self._display_values(pd_image, small)
+
+        low = int(small.min())
+        stored = np.arange(low, int(small.max()) + 1, dtype=small.dtype)
+        lut = self._display_values(pd_image, stored)
+        return lut[np.subtract(small, low, dtype=np.int32)]
+
+    @staticmethod
+    def _display_values(pd_image, stored: np.ndarray) -> np.ndarray:
+        """Map stored values to uint8 through rescale, VOI and inversion."""
+        values = apply_voi_lut(apply_modality_lut(stored, pd_image), pd_image)
+        values = values.astype(np.float32)
+
+        # Normalize and invert if MONOCHROME1
+        low, high = values.min(), values.max()
+        values = (values - low) / max(high - low, 1e-6)
+        if pd_image.get("PhotometricInterpretation") == "MONOCHROME1":
+            values = 1 - values
+
+        return (values * 255).astype(np.uint8)
+
+    def resize(self, image: np.ndarray) -> np.ndarray:
+        """
+        Resize a grayscale image to ``output_size`` with Lanczos filtering.
+
+        Args:
+            image (np.ndarray): Grayscale uint8 image with shape (H, W).
+
+        Returns:
+            np.ndarray: Resized grayscale uint8 image.
+        """
+        resized = Image.fromarray(image).resize(self.output_size, Image.LANCZOS)
+        return np.asarray(resized, dtype=np.uint8)
+
+    def load(self, input_path: str) -> np.ndarray:
+        """
+        Decode and resize a DICOM or standard image in memory.
+
+        Args:
+            input_path (str): Path to input file (.dcm, .png, .jpg, etc.)
+
+        Returns:
+            np.ndarray: Grayscale image with shape ``output_size`` and dtype uint8.
+        """
+        ext = os.path.splitext(input_path)[1].lower()
+        if ext in DICOM_EXTENSIONS:
+            return self.read_dicom(input_path)
+        image = np.asarray(Image.open(input_path).convert("L"), dtype=np.uint8)
+        return self.resize(image)
+
+    def convert_dicom_to_png(self, input_path: str, output_path: str):
+        """
+        Convert and resize DICOM or standard image to PNG.
+
+        Args:
+            input_path (str): Path to input file (.dcm, .png, .jpg, etc.)
+            output_path (str): Path where the resized PNG will be saved.
+        """
+        image = Image.fromarray(self.load(input_path))
 
         # Ensure directory exists
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
@@ -133,16 +269,177 @@ class DICOMConverter:
 
     #                 # Convert and save
     #                 self.convert_dicom_to_png(dicom_path, output_path)
-    def convert_dicom_folder(self, input_folder: str, output_folder: str):
+    def convert_dicom_folder(
+        self,
+        input_folder: str,
+        output_folder: str,
+        workers: int = 1,
+        chunksize: int = 16,
+    ) -> Dict[str, int]:
+        """
+        Convert every image in a folder (including subfolders) to PNG.
+
+        Finished files are appended to a manifest in ``output_folder``, so an
+        interrupted run resumes where it stopped. A file is skipped when its
+        manifest entry matches the current size and mtime of the input and
+        the size of the output already on disk.
+
+        Args:
+            input_folder (str): Folder of DICOM or standard images.
+            output_folder (str): Folder of the PNGs, mirroring the input tree.
+            workers (int, optional): Conversion processes. 1 converts in this
+                process, 0 uses one process per CPU. Defaults to 1.
+            chunksize (int, optional): Files handed to a worker at a time.
+                Defaults to 16.
+
+        Returns:
+            Dict[str, int]: Number of ``converted``, ``skipped`` and
+                ``failed`` files.
+        """
+        manifest_path = os.path.join(output_folder, CONVERT_MANIFEST)
+        manifest = load_convert_manifest(manifest_path)
+
+        tasks, skipped, failed = [], 0, 0
         for root, _, files in os.walk(input_folder):
-            for file in tqdm(files, desc="Processing Images"):
+            for file in files:
                 input_path = os.path.join(root, file)
                 relative_path = os.path.relpath(input_path, input_folder)
                 output_path = os.path.join(output_folder, os.path.splitext(relative_path)[0] + ".png")
+                try:
+                    stat = os.stat(input_path)
+                except OSError as e:
+                    # A dangling symlink or a file removed during the walk
+                    failed += 1
+                    print(f"Failed to convert {relative_path}: {e}")
+                    continue
+                entry = manifest.get(relative_path)
+                if (
+                    entry is not None
+                    and entry["size"] == stat.st_size
+                    and entry["mtime_ns"] == stat.st_mtime_ns
+                    and os.path.isfile(output_path)
+                    and os.path.getsize(output_path) == entry["output_size"]
+                ):
+                    skipped += 1
+                    continue
+                tasks.append(
+                    (input_path, output_path, relative_path, stat.st_size, stat.st_mtime_ns)
+                )
+
+        if workers == 0:
+            workers = os.cpu_count() or 1
+        print(f"Converting {len(tasks)} files with {workers} worker(s), {skipped} up to date")
+
+        os.makedirs(output_folder, exist_ok=True)
+        rates: Dict[int, List[float]] = {}
+        converted = 0
+        with open(manifest_path, "a", encoding="utf-8") as manifest_file:
+            if workers > 1:
+                pool = ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=mp.get_context("spawn"),
+                    initializer=_init_convert_worker,
+                )
+                results = pool.map(
+                    _convert_file,
+                    [(*task[:2], self.output_size) for task in tasks],
+                    chunksize=max(1, chunksize),
+                )
+            else:
+                pool = None
+                results = (
+                    _convert_file((*task[:2], self.output_size)) for task in tasks
+                )
+            try:
+                for task, (pid, seconds, error) in tqdm(
+                    zip(tasks, results), total=len(tasks), desc="Processing Images"
+                ):
+                    _, output_path, relative_path, size, mtime_ns = task
+                    files_and_seconds = rates.setdefault(pid, [0, 0.0])
+                    files_and_seconds[0] += 1
+                    files_and_seconds[1] += seconds
+                    if error is not None:
+                        failed += 1
+                        print(f"Failed to convert {relative_path}: {error}")
+                        continue
+                    converted += 1
+                    entry = {
+                        "input": relative_path,
+                        "size": size,
+                        "mtime_ns": mtime_ns,
+                        "output_size": os.path.getsize(output_path),
+                    }
+                    # One line per file, flushed so an interrupted run keeps it
+                    manifest_file.write(json.dumps(entry) + "\n")
+                    manifest_file.flush()
+            finally:
+                if pool is not None:
+                    pool.shutdown(cancel_futures=True)
+
+        for pid, (files, seconds) in sorted(rates.items()):
+            print(
+                f"Worker {pid}: {files} files in {seconds:.1f}s "
+                f"({files / max(seconds, 1e-9):.1f} files/s)"
+            )
+        return {"converted": converted, "skipped": skipped, "failed": failed}
 
-                self.convert_dicom_to_png(input_path, output_path)
 
-               
+# Manifest of finished conversions, kept in the output folder
+CONVERT_MANIFEST = ".convert_manifest.jsonl"
+
+
+def load_convert_manifest(manifest_path: str) -> Dict[str, dict]:
+    """
+    Read the manifest of a previous ``convert_dicom_folder`` run.
+
+    Args:
+        manifest_path (str): Path of the manifest file.
+
+    Returns:
+        Dict[str, dict]: Latest entry per relative input path. Empty if the
+            manifest does not exist; a truncated last line is ignored.
+    """
+    entries = {}
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                entries[entry["input"]] = entry
+    except FileNotFoundError:
+        pass
+    return entries
+
+
+def _init_convert_worker() -> None:
+    # One thread per process; parallelism comes from the pool
+    cv2.setNumThreads(1)
+
+
+def _convert_file(
+    task: Tuple[str, str, Tuple[int, int]]
+) -> Tuple[int, float, Optional[str]]:
+    """
+    Convert one file for ``convert_dicom_folder``, possibly in a worker process.
+
+    Args:
+        task (Tuple[str, str, Tuple[int, int]]): Input path, output path and
+            output size.
+
+    Returns:
+        Tuple[int, float, Optional[str]]: Process id, seconds spent and the
+            error message if the conversion failed.
+    """
+    input_path, output_path, output_size = task
+    start = time.perf_counter()
+    try:
+        DICOMConverter(output_size).convert_dicom_to_png(input_path, output_path)
+        error = None
+    except Exception as e:
+        error = str(e)
+    return os.getpid(), time.perf_counter() - start, error
 
 
 class CLAHE:
@@ -252,7 +549,9 @@ class S3Uploader:
             ValueError: If image encoding fails.
         """
         try:
-            success, encoded_image = cv2.imencode(".png", image_array)
+            success, encoded_image = await run_in_executor(
+                "image", cv2.imencode, ".png", image_array
+            )
             if not success:
                 raise ValueError("Failed to encode image")
 
@@ -262,7 +561,9 @@ class S3Uploader:
                 f"{folder}/{image_uuid}.png" if folder else f"{image_uuid}.png"
             )
 
-            self.s3_client.upload_fileobj(
+            await run_in_executor(
+                "io",
+                self.s3_client.upload_fileobj,
                 image_bytes,
                 self.S3_BUCKET_NAME,
                 object_name,
@@ -355,6 +656,11 @@ class LocalUploader:
         self.create_timestamp_folder = create_timestamp_folder
         os.makedirs(self.base_path, exist_ok=True)
 
+    @staticmethod
+    def _write(file_path: str, image_array: np.ndarray) -> bool:
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        return cv2.imwrite(file_path, image_array)
+
     async def upload_array(self, image_array: np.ndarray, image_uuid: str, folder: str = "") -> str:
         """
         Save a numpy array as PNG to a local directory.
@@ -378,12 +684,10 @@ class LocalUploader:
                 timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
                 folder_path = os.path.join(folder_path, timestamp)
 
-            os.makedirs(folder_path, exist_ok=True)
-
             file_path = os.path.join(folder_path, f"{image_uuid}.png")
 
-            # Save image
-            success = cv2.imwrite(file_path, image_array)
+            # Create folder and save image off the event loop
+            success = await run_in_executor("io", self._write, file_path, image_array)
             if not success:
                 raise ValueError(f"Failed to write image to {file_path}")
 
@@ -480,3 +784,40 @@ def cleanup_gpu_memory() -> None:
     """
     gc.collect()
     torch.cuda.empty_cache()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    Batch-convert a folder of DICOM or standard images to PNG.
+
+    Args:
+        argv (List[str], optional): Command line arguments; defaults to
+            ``sys.argv[1:]``.
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m src.utils",
+        description="Convert every image in a folder to PNG, resuming earlier runs.",
+    )
+    parser.add_argument("input_folder", help="Folder of DICOM or standard images")
+    parser.add_argument("output_folder", help="Folder of the PNGs")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Conversion processes; 0 uses one per CPU (default: 1)",
+    )
+    parser.add_argument(
+        "--size", type=int, default=1024, help="Output width and height (default: 1024)"
+    )
+    args = parser.parse_args(argv)
+
+    counts = DICOMConverter((args.size, args.size)).convert_dicom_folder(
+        args.input_folder, args.output_folder, workers=args.workers
+    )
+    print(json.dumps(counts))
+    if counts["failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
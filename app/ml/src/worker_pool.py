@@ -0,0 +1,374 @@
+import asyncio
+import itertools
+import json
+import multiprocessing as mp
+import threading
+from multiprocessing import connection, shared_memory
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src import metrics
+from src.serialization import json_default
+
+# Layout of one array inside a shared memory block: (offset, shape, dtype)
+ArrayLayout = Tuple[int, Tuple[int, ...], str]
+
+
+def pack_arrays(
+    arrays: List[np.ndarray],
+) -> Tuple[shared_memory.SharedMemory, List[ArrayLayout]]:
+    """
+    Copy a list of arrays into one new shared memory block.
+
+    Args:
+        arrays (List[np.ndarray]): Arrays to share.
+
+    Returns:
+        Tuple[shared_memory.SharedMemory, List[ArrayLayout]]: The block (owned
+            and later unlinked by the caller) and the layout of each array.
+    """
+    layout = []
+    offset = 0
+    for array in arrays:
+        layout.append((offset, tuple(array.shape), array.dtype.str))
+        offset += array.nbytes
+
+    shm = shared_memory.SharedMemory(create=True, size=max(1, offset))
+    for array, (start, shape, dtype) in zip(arrays, layout):
+        view = np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=start)
+        view[...] = array
+    return shm, layout
+
+
+def unpack_arrays(
+    shm: shared_memory.SharedMemory, layout: List[ArrayLayout]
+) -> List[np.ndarray]:
+    """
+    Copy arrays out of a shared memory block.
+
+    Args:
+        shm (shared_memory.SharedMemory): Attached block.
+        layout (List[ArrayLayout]): Layout returned by ``pack_arrays``.
+
+    Returns:
+        List[np.ndarray]: Private copies, valid after the block is closed.
+    """
+    return [
+        np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=start).copy()
+        for start, shape, dtype in layout
+    ]
+
+
+def attach_shared_memory(name: str) -> shared_memory.SharedMemory:
+    """
+    Attach to a shared memory block owned by another process.
+
+    Args:
+        name (str): Block name.
+
+    Returns:
+        shared_memory.SharedMemory: The attached block. It is not registered
+            with the resource tracker, so only its owner unlinks it.
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Before Python 3.13 attaching always registers the block. Spawned
+        # workers share the parent's resource tracker, which keeps one entry
+        # per name, so this duplicate is dropped by the owner's unlink.
+        return shared_memory.SharedMemory(name=name)
+
+
+def _worker_main(
+    task_queue: mp.Queue,
+    result_conn: connection.Connection,
+    torch_threads: int,
+    stages: Optional[List[Callable]] = None,
+):
+    """
+    Entry point of an inference worker process.
+
+    Loads its own ``ModelContainer`` and then pulls batches from
+    ``task_queue`` until it receives ``None``.
+
+    Args:
+        task_queue (mp.Queue): Queue of the batches for this worker.
+        result_conn (connection.Connection): Write end of the pipe for
+            ``(batch_id, shm_name, size)`` results.
+        torch_threads (int): Intra-op thread count for torch in this process.
+        stages (List[Callable], optional): Stages run on every batch. Defaults
+            to None, the model, render and upload stages; the models are
+            only loaded then.
+    """
+    import torch
+
+    if torch_threads > 0:
+        torch.set_num_threads(torch_threads)
+
+    from src.batch_inference import (
+        BatchContext,
+        preprocess_images,
+        render_results,
+        run_models,
+        run_stage,
+        upload_results,
+    )
+    from src.http_client import close_session
+
+    if stages is None:
+        from src.model_container import model_container
+
+        model_container.load_all_models()
+        stages = [preprocess_images, run_models, render_results, upload_results]
+    loop = asyncio.new_event_loop()
+
+    async def process(ctx: BatchContext) -> None:
+        for stage in stages:
+            await run_stage(ctx, stage)
+
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+        batch_id, input_data, outputs, image_uuids, shm_name, layout = task
+
+        ctx = BatchContext(input_data)
+        ctx.outputs = outputs
+        ctx.image_uuids = image_uuids
+        try:
+            shm = attach_shared_memory(shm_name)
+            try:
+                ctx.original_images = unpack_arrays(shm, layout)
+            finally:
+                shm.close()
+            loop.run_until_complete(process(ctx))
+        except Exception as e:
+            print(f"Worker failed to process batch {batch_id}: {e}")
+            for output in ctx.outputs:
+                if not output.get("error"):
+                    output["error"] = f"Critical inference error: {str(e)}"
+
+        payload = json.dumps(ctx.outputs, default=json_default).encode("utf-8")
+        result_shm = shared_memory.SharedMemory(create=True, size=max(1, len(payload)))
+        result_shm.buf[: len(payload)] = payload
+        # The parent attaches the block by name and unlinks it
+        result_shm.close()
+        # Sent synchronously, a worker killed later never holds a shared lock
+        result_conn.send((batch_id, result_shm.name, len(payload)))
+
+    loop.run_until_complete(close_session())
+    loop.close()
+
+
+class InferenceWorkerPool:
+    """
+    Pool of inference worker processes, each holding its own models.
+
+    Decoded images are handed to the workers through shared memory and the
+    JSON-encoded results come back the same way, so only small metadata is
+    pickled through the queues. Every worker has its own task queue and result
+    pipe, and a batch goes to the worker with the fewest batches in flight, so
+    the pool knows which batches a worker holds when it dies.
+
+    Args:
+        num_workers (int): Number of worker processes.
+        torch_threads (int, optional): ``torch.set_num_threads`` value per
+            worker. 0 keeps the torch default. Defaults to 0.
+        liveness_interval (float, optional): Seconds between two checks of
+            the worker processes. Defaults to 1.0.
+        stages (List[Callable], optional): Stages the workers run on every
+            batch, as picklable module-level functions. Defaults to None,
+            the model, render and upload stages.
+
+    Note:
+        Workers are started with the ``spawn`` method so that CUDA can be
+        initialised independently in every process. A worker that exits
+        unexpectedly (out of memory, segfault) fails its batches with a
+        ``RuntimeError`` and is restarted.
+    """
+
+    def __init__(
+        self,
+        num_workers: int,
+        torch_threads: int = 0,
+        liveness_interval: float = 1.0,
+        stages: Optional[List[Callable]] = None,
+    ):
+        self.num_workers = max(1, int(num_workers))
+        self.torch_threads = int(torch_threads)
+        self.liveness_interval = float(liveness_interval)
+        self.stages = stages
+        self._ctx = mp.get_context("spawn")
+        self._task_queues: List[mp.Queue] = []
+        self._result_conns: List[connection.Connection] = []
+        self._processes: List[mp.Process] = []
+        # Batch id -> (future, image block, index of the worker holding it)
+        self._pending: Dict[
+            int, Tuple[asyncio.Future, shared_memory.SharedMemory, int]
+        ] = {}
+        self._ids = itertools.count()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._reader: Optional[threading.Thread] = None
+        self._watcher: Optional[asyncio.Task] = None
+        self._closing = False
+
+    def start(self) -> None:
+        """
+        Start the worker processes, the result reader thread and the liveness
+        check.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._closing = False
+        self._task_queues = [None] * self.num_workers
+        self._result_conns = [None] * self.num_workers
+        self._processes = [None] * self.num_workers
+        for i in range(self.num_workers):
+            self._start_worker(i)
+
+        self._reader = threading.Thread(
+            target=self._read_results, name="inference-results", daemon=True
+        )
+        self._reader.start()
+        self._watcher = asyncio.create_task(self._watch())
+        print(f"Started {self.num_workers} inference workers")
+
+    def _start_worker(self, index: int) -> None:
+        # Fresh channels, a dead worker may have left the old ones locked
+        task_queue = self._ctx.Queue()
+        result_conn, worker_conn = self._ctx.Pipe(duplex=False)
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(task_queue, worker_conn, self.torch_threads, self.stages),
+            name=f"inference-worker-{index}",
+            daemon=True,
+        )
+        process.start()
+        worker_conn.close()
+        self._task_queues[index] = task_queue
+        self._result_conns[index] = result_conn
+        self._processes[index] = process
+
+    async def _watch(self) -> None:
+        while True:
+            await asyncio.sleep(self.liveness_interval)
+            for index, process in enumerate(self._processes):
+                if not process.is_alive():
+                    self._restart_worker(index)
+
+    def _restart_worker(self, index: int) -> None:
+        """Fail the batches of a dead worker and start a replacement."""
+        exitcode = self._processes[index].exitcode
+        print(f"Inference worker {index} exited with code {exitcode}, restarting")
+        metrics.increment("inference_worker_restarts")
+        for batch_id, (future, image_shm, worker) in list(self._pending.items()):
+            if worker != index:
+                continue
+            del self._pending[batch_id]
+            image_shm.unlink()
+            if not future.done():
+                future.set_exception(
+                    RuntimeError(
+                        f"Inference worker {index} exited with code {exitcode}"
+                    )
+                )
+        # Nothing reads the old queue any more, so do not wait to flush it
+        self._task_queues[index].cancel_join_thread()
+        self._task_queues[index].close()
+        self._start_worker(index)
+
+    def _read_results(self) -> None:
+        closed = set()
+        while not self._closing:
+            conns = [conn for conn in self._result_conns if conn not in closed]
+            # Time out to pick up the pipes of restarted workers
+            for conn in connection.wait(conns, timeout=self.liveness_interval):
+                try:
+                    message = conn.recv()
+                except (EOFError, OSError):
+                    # The worker exited; the liveness check restarts it
+                    closed.add(conn)
+                    continue
+                self._loop.call_soon_threadsafe(self._complete, *message)
+
+    def _complete(self, batch_id: int, shm_name: str, size: int) -> None:
+        # The worker released the block; attaching makes this process its owner
+        result_shm = shared_memory.SharedMemory(name=shm_name)
+        try:
+            outputs = json.loads(bytes(result_shm.buf[:size]).decode("utf-8"))
+        finally:
+            result_shm.close()
+            result_shm.unlink()
+
+        entry = self._pending.pop(batch_id, None)
+        if entry is None:
+            # Already failed because its worker was found dead
+            return
+        future, image_shm, _ = entry
+        image_shm.unlink()
+        if not future.done():
+            future.set_result(outputs)
+
+    async def submit(self, ctx) -> List[dict]:
+        """
+        Run the model, render and upload stages for a decoded batch.
+
+        Args:
+            ctx (BatchContext): Batch whose ``original_images`` are loaded.
+
+        Returns:
+            List[dict]: The batch outputs computed by a worker.
+
+        Raises:
+            RuntimeError: If the worker exits before returning the batch.
+        """
+        batch_id = next(self._ids)
+        image_shm, layout = pack_arrays(ctx.original_images)
+        image_shm.close()
+
+        load = [0] * self.num_workers
+        for _, _, worker in self._pending.values():
+            load[worker] += 1
+        worker = min(range(self.num_workers), key=load.__getitem__)
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[batch_id] = (future, image_shm, worker)
+        self._task_queues[worker].put(
+            (
+                batch_id,
+                ctx.input_data,
+                ctx.outputs,
+                ctx.image_uuids,
+                image_shm.name,
+                layout,
+            )
+        )
+        return await future
+
+    def close(self) -> None:
+        """
+        Stop the workers and release any shared memory still in flight.
+        """
+        if self._watcher is not None:
+            self._watcher.cancel()
+            self._watcher = None
+        for task_queue in self._task_queues:
+            task_queue.put(None)
+        for process in self._processes:
+            process.join(timeout=30)
+            if process.is_alive():
+                process.terminate()
+        self._processes = []
+        self._task_queues = []
+
+        self._closing = True
+        self._reader.join(timeout=5)
+        for result_conn in self._result_conns:
+            result_conn.close()
+        self._result_conns = []
+
+        for future, image_shm, _ in self._pending.values():
+            image_shm.unlink()
+            if not future.done():
+                future.cancel()
+        self._pending.clear()
@@ -1,9 +1,12 @@
 import sys
 from pathlib import Path
 
+import numpy as np
 import pytest
 from fastapi.testclient import TestClient
 from httpx import ASGITransport, AsyncClient
+from pydicom.dataset import FileDataset, FileMetaDataset
+from pydicom.uid import ExplicitVRLittleEndian, generate_uid
 
 # Add parent directory to Python path to allow relative imports
 sys.path.append(str(Path(__file__).parent.parent))
@@ -25,3 +28,56 @@ async def async_client():
         transport=ASGITransport(app=app), base_url="http://localhost:8080"
     ) as client:
         yield client
+
+
+@pytest.fixture
+def write_dicom():
+    """Writer of synthetic DICOM files, 12-bit grayscale or 8-bit RGB"""
+
+    def write_dicom(
+        path,
+        study_uid,
+        series_uid,
+        instance_number,
+        frames=1,
+        modality="DX",
+        pixels=None,
+    ):
+        if pixels is None:
+            pixels = np.zeros((frames, 8, 8), dtype=np.uint16)
+        # (H, W, 3) pixels are written as a single RGB frame
+        rgb = pixels.ndim == 3 and pixels.shape[-1] == 3
+        file_meta = FileMetaDataset()
+        file_meta.MediaStorageSOPClassUID = "1.2.840.10008.5.1.4.1.1.1.1"  # DX
+        file_meta.MediaStorageSOPInstanceUID = generate_uid()
+        file_meta.TransferSyntaxUID = ExplicitVRLittleEndian
+        ds = FileDataset(str(path), {}, file_meta=file_meta, preamble=b"\0" * 128)
+        ds.is_little_endian = True
+        ds.is_implicit_VR = False
+        ds.SOPClassUID = file_meta.MediaStorageSOPClassUID
+        ds.SOPInstanceUID = file_meta.MediaStorageSOPInstanceUID
+        ds.StudyInstanceUID = study_uid
+        ds.SeriesInstanceUID = series_uid
+        ds.InstanceNumber = instance_number
+        ds.Modality = modality
+        ds.Rows, ds.Columns = pixels.shape[:2] if rgb else pixels.shape[-2:]
+        if frames > 1:
+            ds.NumberOfFrames = frames
+        if rgb:
+            ds.SamplesPerPixel = 3
+            ds.PhotometricInterpretation = "RGB"
+            ds.PlanarConfiguration = 0
+            ds.BitsAllocated = ds.BitsStored = 8
+            ds.HighBit = 7
+        else:
+            ds.SamplesPerPixel = 1
+            ds.PhotometricInterpretation = "MONOCHROME2"
+            ds.BitsAllocated = 16
+            ds.BitsStored = 12
+            ds.HighBit = 11
+        ds.PixelRepresentation = 0
+        dtype = np.uint8 if rgb else np.uint16
+        ds.PixelData = pixels.astype(dtype).tobytes()
+        ds.save_as(str(path))
+
+    return write_dicom
@@ -0,0 +1,46 @@
+import sys
+
+# Add parent directory to Python path to allow relative imports
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+import pytest
+
+from src import metrics
+from src.admission import AdmissionController
+
+
+class TestAdmissionController:
+    @pytest.mark.sanity
+    def test_admits_before_any_batch_completed(self):
+        admission = AdmissionController(max_queue_depth=10, latency_budget=1.0)
+        assert admission.estimated_wait(queue_depth=5, batch_size=4) == 0.0
+        assert admission.check(queue_depth=5, batch_size=4) is None
+
+    @pytest.mark.sanity
+    def test_rejects_when_queue_is_full(self):
+        admission = AdmissionController(max_queue_depth=8, latency_budget=0)
+        admission.record_batch(latency=2.0, interval=1.0)
+        retry_after = admission.check(queue_depth=8, batch_size=4)
+        assert retry_after is not None and retry_after >= 1
+
+    @pytest.mark.sanity
+    def test_rejects_when_latency_budget_exceeded(self):
+        admission = AdmissionController(max_queue_depth=0, latency_budget=5.0)
+        admission.record_batch(latency=2.0, interval=1.0)
+
+        # 2s for the current batch plus 1s per batch ahead in the queue
+        assert admission.estimated_wait(queue_depth=8, batch_size=4) == 4.0
+        assert admission.check(queue_depth=8, batch_size=4) is None
+        assert admission.check(queue_depth=16, batch_size=4) == 1
+
+    @pytest.mark.sanity
+    def test_probe_is_not_counted(self):
+        admission = AdmissionController(max_queue_depth=8, latency_budget=0)
+        admission.record_batch(latency=2.0, interval=1.0)
+        before = metrics.get_counters()
+
+        assert admission.check(queue_depth=8, batch_size=4, record=False) >= 1
+        assert admission.check(queue_depth=0, batch_size=4, record=False) is None
+        assert metrics.get_counters() == before
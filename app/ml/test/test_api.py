@@ -1,4 +1,5 @@
 import asyncio
+import json
 import sys
 
 # Add parent directory to Python path to allow relative imports
@@ -50,3 +51,59 @@ class TestInference:
         assert response1.json()  # Ensure response is not empty
         assert response2.status_code == 200
         assert response2.json()  # Ensure response is not empty
+
+    @pytest.mark.asyncio
+    @pytest.mark.sanity
+    async def test_inference_selected_outputs(self, async_client):
+        payload = {
+            "data": {
+                "url": "https://res.cloudinary.com/dfooayhil/image/upload/v1740159063/test_dataset/ne87ds66skvsotwoikys.png",
+                "outputs": ["abnormalities", "tb_score"],
+            }
+        }
+        asyncio.create_task(batch_process_images())
+        response = await async_client.post("/invocations", json=payload)
+        assert response.status_code == 200
+        assert set(response.json()) == {"image_id", "error", "abnormalities", "tb_score"}
+
+    @pytest.mark.sanity
+    def test_unknown_output_rejected(self, client):
+        payload = {"data": {"url": "file:///tmp/x.png", "outputs": ["unknown"]}}
+        response = client.post("/invocations", json=payload)
+        assert response.status_code == 400
+
+    @pytest.mark.sanity
+    def test_missing_study_rejected(self, client):
+        payload = {"data": {"url": "file:///tmp/no-such-study"}}
+        response = client.post("/invocations/study", json=payload)
+        assert response.status_code == 400
+
+    @pytest.mark.asyncio
+    @pytest.mark.sanity
+    async def test_bulk_inference_streams_ndjson(self, async_client):
+        url = "https://res.cloudinary.com/dfooayhil/image/upload/v1740159063/test_dataset/ne87ds66skvsotwoikys.png"
+        payload = {"items": [{"url": url}, {"url": url}]}
+        asyncio.create_task(batch_process_images())
+        response = await async_client.post("/invocations/bulk", json=payload)
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in response.text.splitlines() if line]
+        assert sorted(line["index"] for line in lines) == [0, 1]
+
+    @pytest.mark.asyncio
+    @pytest.mark.sanity
+    async def test_streaming_inference_sends_partial_results(self, async_client):
+        payload = {
+            "data": {
+                "url": "https://res.cloudinary.com/dfooayhil/image/upload/v1740159063/test_dataset/ne87ds66skvsotwoikys.png"
+            }
+        }
+        asyncio.create_task(batch_process_images())
+        response = await async_client.post("/invocations/stream", json=payload)
+        assert response.status_code == 200
+        events = [
+            line.split(": ", 1)[1]
+            for line in response.text.splitlines()
+            if line.startswith("event: ")
+        ]
+        assert events[-1] == "result"
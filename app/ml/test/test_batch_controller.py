@@ -0,0 +1,52 @@
+import sys
+
+# Add parent directory to Python path to allow relative imports
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+import pytest
+
+from src.batch_controller import AdaptiveBatchController
+from src.batcher import MicroBatcher
+
+
+def make_controller(batch_size=4, latency_target=1.0):
+    batcher = MicroBatcher(batch_size=batch_size, max_wait_time=0.5)
+    controller = AdaptiveBatchController(
+        batcher,
+        min_batch_size=1,
+        max_batch_size=8,
+        min_wait_time=0.01,
+        max_wait_time=0.5,
+        latency_target=latency_target,
+        adjust_every=1,
+    )
+    return batcher, controller
+
+
+class TestAdaptiveBatchController:
+    @pytest.mark.sanity
+    def test_shrinks_batch_when_p95_above_target(self):
+        batcher, controller = make_controller(batch_size=4, latency_target=1.0)
+        controller.observe_batch(4, batch_latency=1.5, request_latencies=[2.0] * 4)
+
+        assert batcher.batch_size == 3
+        assert controller.decisions[-1]["reason"] == "p95 latency above target"
+
+    @pytest.mark.sanity
+    def test_grows_batch_when_full_and_fast(self):
+        batcher, controller = make_controller(batch_size=4, latency_target=1.0)
+        controller.observe_batch(4, batch_latency=0.1, request_latencies=[0.2] * 4)
+
+        assert batcher.batch_size == 5
+
+    @pytest.mark.sanity
+    def test_settings_stay_within_bounds(self):
+        batcher, controller = make_controller(batch_size=1, latency_target=1.0)
+        for _ in range(3):
+            controller.observe_batch(1, batch_latency=5.0, request_latencies=[5.0])
+
+        assert batcher.batch_size == 1
+        assert 0.01 <= batcher.max_wait_time <= 0.5
+        assert controller.state()["bounds"]["batch_size"] == [1, 8]
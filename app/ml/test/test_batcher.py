@@ -0,0 +1,87 @@
+import asyncio
+import sys
+import time
+
+# Add parent directory to Python path to allow relative imports
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+import pytest
+
+from src.batcher import MicroBatcher
+
+
+class TestMicroBatcher:
+    @pytest.mark.asyncio
+    @pytest.mark.sanity
+    async def test_full_batch_released_immediately(self):
+        batcher = MicroBatcher(batch_size=2, max_wait_time=10)
+        batcher.enqueue({"url": "a.png"})
+        batcher.enqueue({"url": "b.png"})
+        batcher.enqueue({"url": "c.png"})
+
+        start = time.monotonic()
+        batch = await batcher.next_batch()
+        assert time.monotonic() - start < 0.5
+        assert [item.data["url"] for item in batch] == ["a.png", "b.png"]
+        assert len(batcher) == 1
+
+    @pytest.mark.asyncio
+    @pytest.mark.sanity
+    async def test_partial_batch_flushed_after_deadline(self):
+        batcher = MicroBatcher(batch_size=4, max_wait_time=0.05)
+        batcher.enqueue({"url": "a.png"})
+
+        start = time.monotonic()
+        batch = await batcher.next_batch()
+        elapsed = time.monotonic() - start
+        assert len(batch) == 1
+        assert 0.04 <= elapsed < 0.5
+
+    @pytest.mark.asyncio
+    @pytest.mark.sanity
+    async def test_enqueue_wakes_idle_consumer(self):
+        batcher = MicroBatcher(batch_size=1, max_wait_time=10)
+        consumer = asyncio.create_task(batcher.next_batch())
+        await asyncio.sleep(0.01)
+        assert not consumer.done()
+
+        batcher.enqueue({"url": "a.png"})
+        batch = await asyncio.wait_for(consumer, timeout=0.5)
+        assert batch[0].data["url"] == "a.png"
+
+    @pytest.mark.asyncio
+    @pytest.mark.sanity
+    async def test_cancelled_requests_do_not_use_batch_slots(self):
+        batcher = MicroBatcher(batch_size=2, max_wait_time=10)
+        abandoned = batcher.enqueue({"url": "a.png"})
+        batcher.enqueue({"url": "b.png"})
+        batcher.enqueue({"url": "c.png"})
+        abandoned.cancel()
+
+        batch = await asyncio.wait_for(batcher.next_batch(), timeout=0.5)
+        assert [item.data["url"] for item in batch] == ["b.png", "c.png"]
+        assert len(batcher) == 0
+
+    @pytest.mark.asyncio
+    @pytest.mark.sanity
+    async def test_high_priority_lane_is_batched_first(self):
+        batcher = MicroBatcher(batch_size=2, max_wait_time=10)
+        batcher.enqueue({"url": "bulk1.png"}, priority="low")
+        batcher.enqueue({"url": "bulk2.png"}, priority="low")
+        batcher.enqueue({"url": "urgent.png"}, priority="high")
+
+        batch = await asyncio.wait_for(batcher.next_batch(), timeout=0.5)
+        assert [item.data["url"] for item in batch] == ["urgent.png", "bulk1.png"]
+
+    @pytest.mark.asyncio
+    @pytest.mark.sanity
+    async def test_starved_low_priority_lane_gets_a_slot(self):
+        batcher = MicroBatcher(batch_size=2, max_wait_time=10, starvation_timeout=0)
+        batcher.enqueue({"url": "bulk.png"}, priority="low")
+        batcher.enqueue({"url": "urgent1.png"}, priority="high")
+        batcher.enqueue({"url": "urgent2.png"}, priority="high")
+
+        batch = await asyncio.wait_for(batcher.next_batch(), timeout=0.5)
+        assert sorted(item.data["url"] for item in batch) == ["bulk.png", "urgent1.png"]
@@ -0,0 +1,156 @@
+import sys
+import time
+
+# Add parent directory to Python path to allow relative imports
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+import cv2
+import numpy as np
+import pydicom
+import pytest
+from PIL import Image
+
+from src.batch_inference import (
+    decode_image,
+    input_converter,
+    load_file_image,
+    load_input_image,
+    read_file,
+)
+
+
+def best_of(func, *args, repeat=5):
+    """Best wall time of ``repeat`` calls, in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings)
+
+
+@pytest.fixture(scope="module")
+def xray_png(tmp_path_factory):
+    rng = np.random.default_rng(0)
+    image = cv2.GaussianBlur(
+        rng.integers(0, 256, (2048, 2048), dtype=np.uint8), (15, 15), 0
+    )
+    path = tmp_path_factory.mktemp("bench") / "xray.png"
+    cv2.imwrite(str(path), image)
+    return str(path)
+
+
+@pytest.fixture(scope="module")
+def photo_jpeg(tmp_path_factory):
+    rng = np.random.default_rng(0)
+    rows, cols = np.mgrid[0:4032, 0:4032]
+    texture = cv2.GaussianBlur(rng.normal(0, 40, (4032, 4032)), (31, 31), 0)
+    image = np.clip((rows + cols) * 255 / 8062 + texture, 0, 255).astype(np.uint8)
+    path = tmp_path_factory.mktemp("bench") / "photo.jpg"
+    cv2.imwrite(str(path), image, [cv2.IMWRITE_JPEG_QUALITY, 90])
+    return str(path)
+
+
+@pytest.fixture
+def xray_dicom(tmp_path, write_dicom):
+    # 12-bit gradient with texture, so the value range survives downsampling
+    rng = np.random.default_rng(0)
+    rows, cols = np.mgrid[0:3000, 0:3000]
+    texture = cv2.GaussianBlur(rng.normal(0, 200, (3000, 3000)), (15, 15), 0)
+    image = np.clip((rows + cols) * 4095 / 5998 + texture, 0, 4095)
+    path = tmp_path / "xray.dcm"
+    write_dicom(path, "study", "series", 1, pixels=image.astype(np.uint16))
+    return str(path)
+
+
+def float_convert(path):
+    """The previous converter: full-resolution float32 and a PIL Lanczos resize."""
+    pd_image = pydicom.dcmread(path)
+    image = pd_image.pixel_array.astype(np.float32)
+    image = (image - image.min()) / (image.max() - image.min())
+    if pd_image.PhotometricInterpretation == "MONOCHROME1":
+        image = 1 - image
+    image = Image.fromarray((image * 255).astype(np.uint8))
+    return np.asarray(image.resize((1024, 1024), Image.LANCZOS))
+
+
+class TestLoaderBenchmark:
+    @pytest.mark.benchmark
+    def test_mmap_loader_vs_read_and_decode(self, xray_png):
+        def read_and_decode(path):
+            return decode_image.__wrapped__(read_file(path))
+
+        mmap_decode = load_file_image.__wrapped__
+
+        assert np.array_equal(mmap_decode(xray_png), read_and_decode(xray_png))
+
+        baseline = best_of(read_and_decode, xray_png)
+        mapped = best_of(mmap_decode, xray_png)
+        print(
+            f"\nread + PIL decode: {baseline:.1f} ms, "
+            f"mmap + cv2.imdecode: {mapped:.1f} ms ({baseline / mapped:.2f}x)"
+        )
+
+    @pytest.mark.benchmark
+    def test_in_memory_decode_vs_png_round_trip(self, xray_png, tmp_path):
+        converted = str(tmp_path / "converted.png")
+
+        def round_trip(path):
+            input_converter.convert_dicom_to_png(path, converted)
+            return load_file_image.__wrapped__(converted)
+
+        in_memory = load_input_image.__wrapped__
+
+        assert np.array_equal(in_memory(xray_png), round_trip(xray_png))
+
+        baseline = best_of(round_trip, xray_png)
+        direct = best_of(in_memory, xray_png)
+        print(
+            f"\nconvert to PNG + reload: {baseline:.1f} ms, "
+            f"in-memory decode: {direct:.1f} ms ({baseline / direct:.2f}x)"
+        )
+
+    @pytest.mark.benchmark
+    def test_lut_dicom_decode_vs_float_convert(self, xray_dicom):
+        lut_decode = input_converter.read_dicom
+
+        image = lut_decode(xray_dicom)
+        assert image.shape == (1024, 1024) and image.dtype == np.uint8
+        difference = np.abs(image.astype(np.int16) - float_convert(xray_dicom))
+        assert difference.mean() < 2
+
+        baseline = best_of(float_convert, xray_dicom)
+        direct = best_of(lut_decode, xray_dicom)
+        print(
+            f"\nfloat32 + PIL Lanczos: {baseline:.1f} ms, "
+            f"native downsample + LUT: {direct:.1f} ms ({baseline / direct:.2f}x)"
+        )
+
+    @pytest.mark.benchmark
+    def test_reduced_jpeg_decode_vs_full_decode(self, photo_jpeg):
+        def to_model_size(image):
+            return cv2.resize(image, (1024, 1024), interpolation=cv2.INTER_AREA)
+
+        def full_decode(path):
+            return to_model_size(cv2.imread(path, cv2.IMREAD_GRAYSCALE))
+
+        def reduced_decode(path):
+            return to_model_size(load_file_image.__wrapped__(path))
+
+        def reduced_remote_decode(image_bytes):
+            return to_model_size(decode_image.__wrapped__(image_bytes))
+
+        assert load_file_image.__wrapped__(photo_jpeg).shape == (2016, 2016)
+        full = full_decode(photo_jpeg).astype(np.int16)
+        assert np.abs(full - reduced_decode(photo_jpeg)).mean() < 2
+        image_bytes = read_file(photo_jpeg)
+        assert np.abs(full - reduced_remote_decode(image_bytes)).mean() < 2
+
+        baseline = best_of(full_decode, photo_jpeg)
+        reduced = best_of(reduced_decode, photo_jpeg)
+        print(
+            f"\nfull JPEG decode: {baseline:.1f} ms, "
+            f"reduced decode: {reduced:.1f} ms ({baseline / reduced:.2f}x)"
+        )
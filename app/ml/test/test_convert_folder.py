@@ -0,0 +1,89 @@
+import os
+import sys
+
+# Add parent directory to Python path to allow relative imports
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+import numpy as np
+import pytest
+
+from src.utils import DICOMConverter, main
+
+
+class TestConvertDicomFolder:
+    @pytest.mark.sanity
+    def test_interrupted_run_resumes(self, tmp_path, write_dicom):
+        input_folder = tmp_path / "input"
+        (input_folder / "series").mkdir(parents=True)
+        write_dicom(input_folder / "a.dcm", "study", "series", 1)
+        write_dicom(input_folder / "series" / "b.dcm", "study", "series", 2)
+        output_folder = tmp_path / "output"
+        converter = DICOMConverter((16, 16))
+
+        assert converter.convert_dicom_folder(
+            str(input_folder), str(output_folder)
+        ) == {"converted": 2, "skipped": 0, "failed": 0}
+        assert (output_folder / "series" / "b.png").is_file()
+
+        # A lost output is converted again, the other file is up to date
+        os.remove(output_folder / "a.png")
+        assert converter.convert_dicom_folder(
+            str(input_folder), str(output_folder)
+        ) == {"converted": 1, "skipped": 1, "failed": 0}
+
+    @pytest.mark.sanity
+    def test_changed_inputs_are_converted_again(self, tmp_path, write_dicom):
+        input_folder = tmp_path / "input"
+        input_folder.mkdir()
+        write_dicom(input_folder / "a.dcm", "study", "series", 1)
+        write_dicom(input_folder / "b.dcm", "study", "series", 2)
+        output_folder = tmp_path / "output"
+        converter = DICOMConverter((16, 16))
+        converter.convert_dicom_folder(str(input_folder), str(output_folder))
+
+        pixels = np.tile(np.arange(8, dtype=np.uint16) * 500, (1, 8, 1))
+        write_dicom(input_folder / "a.dcm", "study", "series", 1, pixels=pixels)
+        # Make sure the mtime changes even on coarse filesystem clocks
+        stat = os.stat(input_folder / "a.dcm")
+        mtime_ns = stat.st_mtime_ns + 10**9
+        os.utime(input_folder / "a.dcm", ns=(stat.st_atime_ns, mtime_ns))
+
+        assert converter.convert_dicom_folder(
+            str(input_folder), str(output_folder)
+        ) == {"converted": 1, "skipped": 1, "failed": 0}
+
+    @pytest.mark.sanity
+    def test_cli_reports_failures(self, tmp_path, write_dicom, capsys):
+        input_folder = tmp_path / "input"
+        input_folder.mkdir()
+        write_dicom(input_folder / "a.dcm", "study", "series", 1)
+        (input_folder / "notes.txt").write_text("not an image")
+
+        with pytest.raises(SystemExit):
+            main([str(input_folder), str(tmp_path / "output"), "--size", "16"])
+
+        assert '{"converted": 1, "skipped": 0, "failed": 1}' in capsys.readouterr().out
+
+    @pytest.mark.sanity
+    def test_colour_dicom_is_read_as_luma(self, tmp_path, write_dicom):
+        pixels = np.zeros((8, 8, 3), dtype=np.uint8)
+        pixels[:, 4:] = (0, 255, 0)  # left half black, right half green
+        write_dicom(tmp_path / "rgb.dcm", "study", "series", 1, pixels=pixels)
+
+        image = DICOMConverter((8, 8)).read_dicom(str(tmp_path / "rgb.dcm"))
+
+        assert image.shape == (8, 8)
+        assert image[:, :4].max() == 0 and image[:, 4:].min() == 255
+
+    @pytest.mark.sanity
+    def test_unreadable_entries_are_counted_as_failed(self, tmp_path, write_dicom):
+        input_folder = tmp_path / "input"
+        input_folder.mkdir()
+        write_dicom(input_folder / "a.dcm", "study", "series", 1)
+        (input_folder / "b.dcm").symlink_to(tmp_path / "missing.dcm")
+
+        assert DICOMConverter((16, 16)).convert_dicom_folder(
+            str(input_folder), str(tmp_path / "output")
+        ) == {"converted": 1, "skipped": 0, "failed": 1}
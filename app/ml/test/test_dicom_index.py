@@ -0,0 +1,93 @@
+import json
+import os
+import sys
+
+# Add parent directory to Python path to allow relative imports
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+import pytest
+
+from src.dicom_index import DicomIndex, main
+
+
+class TestDicomIndex:
+    @pytest.mark.sanity
+    def test_studies_are_grouped_from_headers(self, tmp_path, write_dicom):
+        folder = tmp_path / "input"
+        folder.mkdir()
+        write_dicom(folder / "a.dcm", "study-1", "series-1", 1)
+        write_dicom(folder / "b.dcm", "study-1", "series-2", 1, modality="CT")
+        write_dicom(folder / "c.dcm", "study-2", "series-3", 1, modality="CR")
+        (folder / "notes.txt").write_text("not a DICOM file")
+        index = DicomIndex(str(tmp_path / "index.sqlite"))
+
+        assert index.update(str(folder)) == {"indexed": 4, "unchanged": 0, "removed": 0}
+
+        studies = index.studies()
+        assert [study["study_uid"] for study in studies] == ["study-1", "study-2"]
+        assert studies[0]["series"] == 1  # the CT series is not a chest X-ray
+        assert index.studies(modalities=None)[0]["series"] == 2
+        assert [row["path"] for row in index.files("study-1")] == [
+            str(folder / "a.dcm")
+        ]
+
+    @pytest.mark.sanity
+    def test_update_only_rereads_changed_files(self, tmp_path, write_dicom):
+        folder = tmp_path / "input"
+        folder.mkdir()
+        write_dicom(folder / "a.dcm", "study-1", "series-1", 1)
+        write_dicom(folder / "b.dcm", "study-2", "series-2", 1)
+        index = DicomIndex(str(tmp_path / "index.sqlite"))
+        index.update(str(folder))
+        index.mark_processed([str(folder / "a.dcm"), str(folder / "b.dcm")])
+
+        write_dicom(folder / "a.dcm", "study-1", "series-1", 2)
+        stat = os.stat(folder / "a.dcm")
+        os.utime(folder / "a.dcm", ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        os.remove(folder / "b.dcm")
+
+        assert index.update(str(folder)) == {"indexed": 1, "unchanged": 0, "removed": 1}
+        assert index.studies(processed=True) == []
+        assert [study["study_uid"] for study in index.studies(processed=False)] == [
+            "study-1"
+        ]
+
+    @pytest.mark.sanity
+    def test_processed_files_outside_scans_are_indexed(self, tmp_path, write_dicom):
+        write_dicom(tmp_path / "a.dcm", "study-1", "series-1", 1, frames=2)
+        index = DicomIndex(str(tmp_path / "index.sqlite"))
+
+        index.mark_processed([str(tmp_path / "a.dcm")])
+
+        assert index.studies() == [
+            {
+                "study_uid": "study-1",
+                "patient_id": None,
+                "series": 1,
+                "files": 1,
+                "frames": 2,
+                "processed": True,
+            }
+        ]
+        assert index.update(str(tmp_path))["indexed"] == 1  # only index.sqlite
+
+    @pytest.mark.sanity
+    def test_cli_lists_unprocessed_studies(self, tmp_path, write_dicom, capsys):
+        folder = tmp_path / "input"
+        folder.mkdir()
+        write_dicom(folder / "a.dcm", "study-1", "series-1", 1)
+        write_dicom(folder / "b.dcm", "study-2", "series-2", 1)
+        db_path = str(tmp_path / "index.sqlite")
+        index = DicomIndex(db_path)
+        index.mark_processed([str(folder / "a.dcm")])
+        index.close()
+
+        main([db_path, str(folder), "--unprocessed", "--paths"])
+
+        lines = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+        assert lines[0] == {"indexed": 1, "unchanged": 1, "removed": 0}
+        assert [(line["study_uid"], line["paths"]) for line in lines[1:]] == [
+            ("study-2", [str(folder / "b.dcm")])
+        ]
@@ -0,0 +1,62 @@
+import asyncio
+import inspect
+import sys
+import threading
+import time
+
+# Add parent directory to Python path to allow relative imports
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+import pytest
+
+from src.executors import get_executor, offload, run_in_executor, shutdown_executors
+
+
+@offload("io")
+def slow_thread_name(seconds, suffix=""):
+    """Block like a disk write and report the thread it ran on"""
+    time.sleep(seconds)
+    return threading.current_thread().name + suffix
+
+
+class TestExecutors:
+    @pytest.mark.asyncio
+    @pytest.mark.sanity
+    async def test_offloaded_function_runs_in_its_pool(self):
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        ticker = asyncio.create_task(tick())
+        name = await slow_thread_name(0.2, suffix="!")
+        ticker.cancel()
+
+        assert name.startswith("io-pool") and name.endswith("!")
+        assert ticks >= 5  # the loop kept running while the function slept
+
+    @pytest.mark.sanity
+    def test_wrapped_function_is_the_sync_function(self):
+        assert inspect.iscoroutinefunction(slow_thread_name)
+        assert not inspect.iscoroutinefunction(slow_thread_name.__wrapped__)
+        assert slow_thread_name.__name__ == "slow_thread_name"
+        assert (
+            slow_thread_name.__wrapped__(0) == threading.current_thread().name
+        )
+
+    @pytest.mark.asyncio
+    @pytest.mark.sanity
+    async def test_pools_are_recreated_after_shutdown(self):
+        pool = get_executor("image")
+        assert await run_in_executor("image", sum, [1, 2], start=3) == 6
+
+        shutdown_executors()
+        with pytest.raises(RuntimeError):
+            pool.submit(max, 1, 2)
+        assert get_executor("image") is not pool
+        assert await run_in_executor("image", max, 1, 2) == 2
@@ -0,0 +1,59 @@
+import sys
+
+# Add parent directory to Python path to allow relative imports
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+import pytest
+
+from src import fetch_cache
+from src.fetch_cache import FetchCache
+
+
+class FakeOrigin:
+    """Stand-in for ``http_client.fetch`` serving one versioned body."""
+
+    def __init__(self):
+        self.requests = []
+
+    async def __call__(self, url, headers=None):
+        self.requests.append(headers or {})
+        if (headers or {}).get("If-None-Match") == '"v1"':
+            return 304, {}, b""
+        return 200, {"ETag": '"v1"'}, b"image-bytes"
+
+
+class TestFetchCache:
+    @pytest.mark.asyncio
+    @pytest.mark.sanity
+    async def test_fresh_entry_served_without_network(self, tmp_path, monkeypatch):
+        origin = FakeOrigin()
+        monkeypatch.setattr(fetch_cache, "fetch", origin)
+        cache = FetchCache(str(tmp_path), max_bytes=1024**2, ttl=3600)
+
+        assert await cache.fetch("https://example.com/a.png") == b"image-bytes"
+        assert await cache.fetch("https://example.com/a.png") == b"image-bytes"
+        assert len(origin.requests) == 1
+
+    @pytest.mark.asyncio
+    @pytest.mark.sanity
+    async def test_stale_entry_revalidated_with_etag(self, tmp_path, monkeypatch):
+        origin = FakeOrigin()
+        monkeypatch.setattr(fetch_cache, "fetch", origin)
+        cache = FetchCache(str(tmp_path), max_bytes=1024**2, ttl=0)
+
+        await cache.fetch("https://example.com/a.png")
+        assert await cache.fetch("https://example.com/a.png") == b"image-bytes"
+        assert await cache.fetch("https://example.com/a.png") == b"image-bytes"
+        assert origin.requests[1:] == [{"If-None-Match": '"v1"'}] * 2
+
+    @pytest.mark.sanity
+    def test_entry_removed_after_index_check_is_a_miss(self, tmp_path):
+        cache = FetchCache(str(tmp_path), max_bytes=1024**2, ttl=60)
+        cache.store("http://origin/a.png", {"ETag": '"v1"'}, b"image-bytes")
+        assert cache.lookup("http://origin/a.png")[1] == b"image-bytes"
+
+        body_path, _ = cache._paths(cache._key("http://origin/a.png"))
+        Path(body_path).unlink()
+        assert cache.lookup("http://origin/a.png") is None
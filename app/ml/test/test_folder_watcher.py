@@ -0,0 +1,103 @@
+import asyncio
+import json
+import sys
+
+# Add parent directory to Python path to allow relative imports
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+import pytest
+
+from src.folder_watcher import FolderWatcher, sidecar_path
+
+
+class TestFolderWatcher:
+    @pytest.mark.sanity
+    def test_files_are_ready_once_unchanged(self, tmp_path):
+        (tmp_path / "a.png").write_bytes(b"partial")
+        (tmp_path / "notes.txt").write_text("not an input")
+        watcher = FolderWatcher(str(tmp_path), enqueue=None, settle_time=60)
+
+        assert watcher.scan() == []
+        (tmp_path / "a.png").write_bytes(b"partial, now complete")
+        watcher.settle_time = 0
+        assert watcher.scan() == [str(tmp_path / "a.png")]
+
+    @pytest.mark.asyncio
+    @pytest.mark.sanity
+    async def test_results_are_written_next_to_inputs(self, tmp_path, write_dicom):
+        (tmp_path / "a.png").write_bytes(b"image")
+        write_dicom(tmp_path / "IM0001", "study", "series", 1, frames=2)
+        (tmp_path / "README").write_text("extensionless, but not DICOM")
+        queued = []
+
+        def enqueue(data):
+            queued.append(data)
+            future = asyncio.get_running_loop().create_future()
+            future.set_result({"tb_score": 0.5})
+            return future
+
+        watcher = FolderWatcher(
+            str(tmp_path), enqueue, poll_interval=0.01, settle_time=0
+        )
+        task = asyncio.create_task(watcher.run())
+        await asyncio.sleep(0.2)
+        task.cancel()
+
+        assert len(queued) == 3  # results are up to date, nothing is redone
+        assert {"url": f"file://{tmp_path / 'IM0001'}", "frame": 1} in queued
+        with open(sidecar_path(str(tmp_path / "a.png"))) as f:
+            assert json.load(f)["tb_score"] == 0.5
+        with open(sidecar_path(str(tmp_path / "IM0001"))) as f:
+            assert [frame["frame"] for frame in json.load(f)["frames"]] == [0, 1]
+        assert not Path(sidecar_path(str(tmp_path / "README"))).exists()
+
+    @pytest.mark.asyncio
+    @pytest.mark.sanity
+    async def test_files_wait_while_admission_rejects(self, tmp_path):
+        (tmp_path / "a.png").write_bytes(b"image")
+        queued = []
+
+        def enqueue(data):
+            queued.append(data)
+            return asyncio.get_running_loop().create_future()
+
+        watcher = FolderWatcher(
+            str(tmp_path), enqueue, poll_interval=0.01, settle_time=0, admit=lambda: 5
+        )
+        task = asyncio.create_task(watcher.run())
+        await asyncio.sleep(0.1)
+        assert queued == []
+
+        watcher.admit = lambda: None
+        await asyncio.sleep(0.1)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        assert len(queued) == 1
+        assert watcher._in_flight == {}  # cancelled together with the watcher
+
+    @pytest.mark.asyncio
+    @pytest.mark.sanity
+    async def test_unreadable_files_get_an_error_result(
+        self, tmp_path, write_dicom, monkeypatch
+    ):
+        write_dicom(tmp_path / "IM0001", "study", "series", 1)
+
+        def iter_study_frames(path):
+            raise ValueError("invalid literal for int() with base 10: 'two'")
+
+        monkeypatch.setattr(
+            "src.folder_watcher.iter_study_frames", iter_study_frames
+        )
+        watcher = FolderWatcher(
+            str(tmp_path), enqueue=None, poll_interval=0.01, settle_time=0
+        )
+        task = asyncio.create_task(watcher.run())
+        await asyncio.sleep(0.2)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+        with open(sidecar_path(str(tmp_path / "IM0001"))) as f:
+            assert "invalid literal" in json.load(f)["error"]
+        assert watcher.scan() == []  # handled, not retried on every scan
@@ -0,0 +1,93 @@
+import asyncio
+import sys
+
+# Add parent directory to Python path to allow relative imports
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+import aiohttp
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from src import http_client
+from src.http_client import close_session, fetch, get_session
+
+
+@pytest.fixture
+async def image_server(monkeypatch):
+    """Local server answering /flaky/<n> with 503 for the first n requests"""
+    monkeypatch.setitem(http_client.HTTP_SETTINGS, "retries", 2)
+    monkeypatch.setitem(http_client.HTTP_SETTINGS, "retry_backoff", 0)
+    requests = []
+
+    async def flaky(request):
+        requests.append(request.transport.get_extra_info("peername"))
+        if len(requests) <= int(request.match_info["failures"]):
+            return web.Response(status=503)
+        return web.Response(body=b"image", headers={"ETag": '"v1"'})
+
+    async def missing(request):
+        requests.append(request.transport.get_extra_info("peername"))
+        return web.Response(status=404)
+
+    app = web.Application()
+    app.router.add_get("/flaky/{failures}", flaky)
+    app.router.add_get("/missing", missing)
+    server = TestServer(app)
+    await server.start_server()
+    server.requests = requests
+    yield server
+    await close_session()
+    await server.close()
+
+
+class TestFetch:
+    @pytest.mark.asyncio
+    @pytest.mark.sanity
+    async def test_retries_until_success(self, image_server):
+        status, headers, body = await fetch(str(image_server.make_url("/flaky/2")))
+
+        assert (status, body) == (200, b"image")
+        assert headers["ETag"] == '"v1"'
+        assert len(image_server.requests) == 3
+
+    @pytest.mark.asyncio
+    @pytest.mark.sanity
+    async def test_gives_up_after_last_attempt(self, image_server):
+        with pytest.raises(aiohttp.ClientResponseError) as error:
+            await fetch(str(image_server.make_url("/flaky/3")))
+
+        assert error.value.status == 503
+        assert len(image_server.requests) == 3
+
+    @pytest.mark.asyncio
+    @pytest.mark.sanity
+    async def test_client_errors_are_not_retried(self, image_server):
+        with pytest.raises(aiohttp.ClientResponseError):
+            await fetch(str(image_server.make_url("/missing")))
+
+        assert len(image_server.requests) == 1
+
+    @pytest.mark.asyncio
+    @pytest.mark.sanity
+    async def test_session_is_reused_across_calls(self, image_server):
+        session = get_session()
+        for _ in range(3):
+            await fetch(str(image_server.make_url("/flaky/0")))
+
+        assert get_session() is session
+        # Keep-alive: every request went over the same pooled connection
+        assert len(set(image_server.requests)) == 1
+
+    @pytest.mark.sanity
+    def test_each_event_loop_gets_its_own_session(self):
+        async def session_of_this_loop():
+            return get_session()
+
+        first = asyncio.run(session_of_this_loop())
+        second = asyncio.run(session_of_this_loop())
+
+        assert second is not first and not second.closed
+        asyncio.run(close_session())
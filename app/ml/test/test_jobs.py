@@ -0,0 +1,74 @@
+import asyncio
+import sys
+
+# Add parent directory to Python path to allow relative imports
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+import pytest
+
+from src.jobs import JobStore
+
+
+class TestJobStore:
+    @pytest.mark.asyncio
+    @pytest.mark.sanity
+    async def test_job_completes_with_result(self):
+        store = JobStore(max_jobs=10, result_ttl=60)
+        job = store.create()
+        future = asyncio.get_running_loop().create_future()
+        store.start(job, future)
+        assert store.get(job.job_id).status == "queued"
+
+        future.set_result({"tb_score": 0.1})
+        await asyncio.sleep(0)
+        assert store.get(job.job_id).to_dict()["result"] == {"tb_score": 0.1}
+        assert job.status == "completed"
+
+    @pytest.mark.asyncio
+    @pytest.mark.sanity
+    async def test_full_store_evicts_finished_jobs_only(self):
+        store = JobStore(max_jobs=1, result_ttl=60)
+        job = store.create()
+        future = asyncio.get_running_loop().create_future()
+        store.start(job, future)
+        assert store.create() is None
+
+        future.set_result({})
+        await asyncio.sleep(0)
+        assert store.create() is not None
+        assert store.get(job.job_id) is None
+
+    @pytest.mark.asyncio
+    @pytest.mark.sanity
+    async def test_cancel_queued_job(self):
+        store = JobStore(max_jobs=10, result_ttl=60)
+        job = store.create()
+        store.start(job, asyncio.get_running_loop().create_future())
+
+        assert store.cancel(job.job_id)
+        assert job.status == "cancelled"  # before the job task has run
+        assert not store.cancel(job.job_id)
+        await asyncio.sleep(0)
+        assert job.status == "cancelled" and job.future is None
+
+    @pytest.mark.sanity
+    def test_callback_url_must_match_allowed_hosts(self):
+        store = JobStore(
+            max_jobs=10, result_ttl=60, callback_hosts=["ris.local", "pacs:8443"]
+        )
+
+        assert store.create(callback_url="https://RIS.local/hook") is not None
+        assert store.create(callback_url="http://pacs:8443/hook") is not None
+        for url in (
+            "http://169.254.169.254/latest/meta-data",
+            "http://pacs/hook",
+            "file:///etc/passwd",
+            "http://ris.local.attacker.com/hook",
+        ):
+            with pytest.raises(ValueError):
+                store.create(callback_url=url)
+        assert len(store) == 2
+        with pytest.raises(ValueError):
+            JobStore(max_jobs=10, result_ttl=60).create(callback_url="http://ris.local")
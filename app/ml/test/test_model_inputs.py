@@ -0,0 +1,154 @@
+import io
+import sys
+
+# Add parent directory to Python path to allow relative imports
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+import cv2
+import numpy as np
+import pytest
+import torch
+from PIL import Image
+from torchvision import transforms
+
+from src import batch_inference
+from src.batch_inference import (
+    decode_image,
+    get_tb_score,
+    preprocessing,
+    rtdetr_forward,
+)
+from src.utils import HistogramEqualizationTransform
+
+LUNGS_BBOX = [96, 160, 928, 864]
+
+
+def chest_like_png(tint=(0, 0, 0)):
+    """A 1024x1024 radial gradient with noise, optionally colour tinted"""
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[:1024, :1024]
+    radius = np.hypot(y - 512, x - 512)
+    gray = np.clip(230 - radius / 3 + rng.normal(0, 8, radius.shape), 0, 255)
+    rgb = np.clip(gray[..., None] + np.array(tint), 0, 255).astype(np.uint8)
+    success, encoded = cv2.imencode(".png", cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR))
+    assert success
+    return encoded.tobytes()
+
+
+def bt601(rgb):
+    return rgb[..., 0] * 0.299 + rgb[..., 1] * 0.587 + rgb[..., 2] * 0.114
+
+
+# The RGB float32 path the grayscale uint8 images replaced
+def old_decode(image_bytes):
+    image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
+    return np.array(image, dtype=np.float32)
+
+
+def old_preprocessing(rgb):
+    return preprocessing.__wrapped__(bt601(rgb))
+
+
+def old_tb_inputs(rgb):
+    transform = transforms.Compose(
+        [
+            transforms.ToTensor(),
+            transforms.Resize((224, 224), antialias=True),
+            HistogramEqualizationTransform(),
+        ]
+    )
+    x1, y1, x2, y2 = LUNGS_BBOX
+    rgb = (rgb - rgb.min()) / (rgb.max() - rgb.min() + 1e-6)
+    crop = bt601(rgb[x1:x2, y1:y2, :])
+    return torch.stack([transform(crop)], dim=0).repeat(1, 3, 1, 1)
+
+
+class RecordingModel:
+    """Stands in for a model and keeps the inputs it was called with"""
+
+    def __init__(self, output):
+        self.output = output
+        self.inputs = []
+
+    def eval(self):
+        return self
+
+    def __call__(self, inputs, **kwargs):
+        self.inputs.append(inputs)
+        return self.output(inputs)
+
+
+@pytest.fixture
+def models(monkeypatch):
+    models = {
+        "tb_classification_model": RecordingModel(lambda x: torch.zeros(len(x), 2)),
+        "detection_model": RecordingModel(lambda x: []),
+        "ribfracture_model": RecordingModel(lambda x: []),
+    }
+    monkeypatch.setattr(
+        batch_inference.model_container, "get_model", models.__getitem__
+    )
+    return models
+
+
+def assert_close(new, old, max_levels, mean_levels):
+    """Compare tensors in [0, 1] by their largest and mean change, in 1/255 steps"""
+    assert new.shape == old.shape and new.dtype == old.dtype
+    change = (new - old).abs() * 255
+    assert change.max().item() <= max_levels + 1e-3
+    assert change.mean().item() <= mean_levels
+
+
+# Largest and mean change against the old RGB path, in 1/255 steps. Gray
+# X-rays only differ where float rounding of the BT.601 weights flips a value
+# before CLAHE; PIL rounds the luma of colour inputs to uint8.
+GRAY = {"tint": (0, 0, 0), "preprocessing": (2, 0.05), "tb": (0, 0)}
+COLOUR = {"tint": (12, -6, 20), "preprocessing": (3, 0.5), "tb": (3, 1)}
+
+
+@pytest.mark.parametrize("case", [GRAY, COLOUR], ids=["gray", "colour"])
+class TestGrayscaleModelInputs:
+    @pytest.mark.sanity
+    def test_preprocessed_tensor(self, case):
+        image_bytes = chest_like_png(case["tint"])
+        image = decode_image.__wrapped__(image_bytes)
+        assert image.shape == (1024, 1024) and image.dtype == np.uint8
+
+        tensor = preprocessing.__wrapped__(image)
+
+        assert tensor.shape == (1, 3, 1024, 1024)
+        assert tensor.dtype == torch.float32
+        assert 0.0 <= tensor.min().item() and tensor.max().item() <= 1.0
+        old = old_preprocessing(old_decode(image_bytes))
+        assert_close(tensor, old, *case["preprocessing"])
+
+    @pytest.mark.sanity
+    def test_tb_classifier_input(self, case, models):
+        image_bytes = chest_like_png(case["tint"])
+
+        get_tb_score.__wrapped__([decode_image.__wrapped__(image_bytes)], [LUNGS_BBOX])
+
+        (tensor,) = models["tb_classification_model"].inputs
+        assert tensor.shape == (1, 3, 224, 224)
+        assert 0.0 <= tensor.min().item() and tensor.max().item() <= 1.0
+        assert_close(tensor, old_tb_inputs(old_decode(image_bytes)), *case["tb"])
+
+    @pytest.mark.sanity
+    def test_detector_inputs(self, case, models):
+        image_bytes = chest_like_png(case["tint"])
+
+        rtdetr_forward.__wrapped__([decode_image.__wrapped__(image_bytes)])
+
+        old = old_decode(image_bytes)
+        for name in ("detection_model", "ribfracture_model"):
+            ((image,),) = models[name].inputs
+            assert image.shape == (1024, 1024, 3) and image.dtype == np.uint8
+            if case is GRAY:
+                # Same values as the float32 arrays the detectors used to get
+                np.testing.assert_array_equal(image, old)
+            else:
+                # Colour inputs now reach the detectors as their luma
+                luma = np.round(bt601(old))[..., None]
+                assert np.abs(image - luma).max() <= 1
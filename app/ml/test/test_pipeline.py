@@ -0,0 +1,105 @@
+import asyncio
+import sys
+
+# Add parent directory to Python path to allow relative imports
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+import pytest
+
+from src import pipeline as pipeline_module
+from src import server
+from src.batcher import MicroBatcher
+from src.pipeline import InferencePipeline
+
+
+@pytest.fixture
+def stages(monkeypatch):
+    """Replace the model stages; run_models fails batches with a "fail" input"""
+
+    async def decode_images(ctx):
+        pass
+
+    async def preprocess_images(ctx):
+        pass
+
+    async def run_models(ctx):
+        if any(data.get("fail") for data in ctx.input_data):
+            raise RuntimeError("CUDA out of memory")
+
+    async def render_results(ctx):
+        pass
+
+    async def upload_results(ctx):
+        for output in ctx.outputs:
+            output["tb_score"] = 0.5
+
+    for stage in (
+        decode_images,
+        preprocess_images,
+        run_models,
+        render_results,
+        upload_results,
+    ):
+        monkeypatch.setattr(pipeline_module, stage.__name__, stage)
+
+
+class TestInferencePipeline:
+    @pytest.mark.asyncio
+    @pytest.mark.sanity
+    async def test_failing_stage_fails_only_its_batch(self, tmp_path, stages):
+        batcher = MicroBatcher(batch_size=2, max_wait_time=0.01)
+        pipeline = InferencePipeline(batcher, converted_folder=str(tmp_path))
+        task = asyncio.create_task(pipeline.run())
+
+        failed = [batcher.enqueue({"url": "a.png", "fail": True}) for _ in range(2)]
+        results = await asyncio.wait_for(asyncio.gather(*failed), 5)
+        assert all("CUDA out of memory" in result["error"] for result in results)
+
+        passed = [batcher.enqueue({"url": "b.png"}) for _ in range(2)]
+        results = await asyncio.wait_for(asyncio.gather(*passed), 5)
+        assert [result["tb_score"] for result in results] == [0.5, 0.5]
+        assert not task.done()
+        task.cancel()
+
+    @pytest.mark.asyncio
+    @pytest.mark.sanity
+    async def test_ingest_errors_fail_the_batch(self, tmp_path, stages):
+        # The converted PNG folder cannot be created over a file
+        (tmp_path / "converted").write_text("not a folder")
+        batcher = MicroBatcher(batch_size=2, max_wait_time=0.01)
+        pipeline = InferencePipeline(
+            batcher, converted_folder=str(tmp_path / "converted")
+        )
+        task = asyncio.create_task(pipeline.run())
+
+        failed = [batcher.enqueue({"url": "a.png"}) for _ in range(2)]
+        results = await asyncio.wait_for(asyncio.gather(*failed), 5)
+        assert all(result["error"] for result in results)
+
+        pipeline.converted_folder = str(tmp_path)
+        passed = batcher.enqueue({"url": "b.png"})
+        assert (await asyncio.wait_for(passed, 5))["tb_score"] == 0.5
+        assert not task.done()
+        task.cancel()
+
+    @pytest.mark.asyncio
+    @pytest.mark.sanity
+    async def test_stopped_pipeline_is_restarted(self, monkeypatch):
+        runs = []
+
+        async def run():
+            runs.append(None)
+            if len(runs) == 1:
+                raise RuntimeError("stage loop bug")
+            await asyncio.Event().wait()
+
+        monkeypatch.setattr(server.pipeline, "run", run)
+        server.start_batch_processing()
+        await asyncio.sleep(0.05)
+
+        assert len(runs) == 2
+        for task in asyncio.all_tasks():
+            if task.get_coro().__name__ == "batch_process_images":
+                task.cancel()
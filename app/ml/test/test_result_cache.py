@@ -0,0 +1,57 @@
+import asyncio
+import sys
+
+# Add parent directory to Python path to allow relative imports
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+import numpy as np
+import pytest
+
+from src.batch_inference import BatchContext, safe_task
+from src.result_cache import ResultCache
+
+
+class TestResultCache:
+    @pytest.mark.sanity
+    def test_key_depends_on_pixels_options_and_models(self):
+        cache = ResultCache("/tmp", 0, 0, fingerprint="models-a")
+        image = np.zeros((4, 4, 3), dtype=np.float32)
+        key = cache.key(image, {"outputs": ["tb_score"]})
+
+        assert key == cache.key(image.copy(), {"outputs": ["tb_score"]})
+        assert key != cache.key(image + 1, {"outputs": ["tb_score"]})
+        assert key != cache.key(image, {"outputs": ["clahe"]})
+        other_models = ResultCache("/tmp", 0, 0, fingerprint="models-b")
+        assert key != other_models.key(image, {"outputs": ["tb_score"]})
+
+    @pytest.mark.sanity
+    def test_disk_tier_survives_restart(self, tmp_path):
+        cache = ResultCache(str(tmp_path), 1, 1024**2, fingerprint="models")
+        cache.put("a" * 64, {"image_id": "a", "tb_score": 0.5})
+
+        restarted = ResultCache(str(tmp_path), 1, 1024**2, fingerprint="models")
+        assert restarted.get("a" * 64) == {"image_id": "a", "tb_score": 0.5}
+        assert restarted.get("b" * 64) is None
+
+    @pytest.mark.sanity
+    def test_disk_tier_evicts_least_recently_used(self, tmp_path):
+        cache = ResultCache(str(tmp_path), 0, 100, fingerprint="models")
+        for key in ("a", "b", "c"):
+            cache.put(key * 64, {"image_id": key, "padding": "x" * 20})
+
+        assert cache.stats()["disk_bytes"] <= 100
+        assert cache.get("a" * 64) is None
+        assert cache.get("c" * 64)["image_id"] == "c"
+
+    @pytest.mark.sanity
+    def test_fallback_results_are_marked_degraded(self):
+        async def fail():
+            raise RuntimeError("model unavailable")
+
+        ctx = BatchContext([{"outputs": ["tb_score"]}])
+        assert asyncio.run(safe_task(fail(), [0.0], ctx)) == [0.0]
+
+        assert ctx.outputs[0]["degraded"]
+        assert "degraded" not in ctx.selected_outputs()[0]
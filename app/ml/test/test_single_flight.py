@@ -0,0 +1,65 @@
+import asyncio
+import sys
+
+# Add parent directory to Python path to allow relative imports
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+import pytest
+
+from src.batcher import MicroBatcher
+from src.single_flight import SingleFlight, request_key
+
+
+class TestSingleFlight:
+    @pytest.mark.asyncio
+    @pytest.mark.sanity
+    async def test_identical_requests_share_one_batch_slot(self):
+        batcher = MicroBatcher(batch_size=2, max_wait_time=0.05)
+        single_flight = SingleFlight()
+        data = {"url": "a.png"}
+
+        def start():
+            return batcher.enqueue(data)
+
+        first = single_flight.join(request_key(data, "high"), start)
+        second = single_flight.join(request_key(dict(data), "high"), start)
+        assert len(batcher) == 1
+
+        batch = await asyncio.wait_for(batcher.next_batch(), timeout=0.5)
+        batch[0].future.set_result({"tb_score": 0.1})
+        assert await first == await second == {"tb_score": 0.1}
+
+    @pytest.mark.asyncio
+    @pytest.mark.sanity
+    async def test_work_cancelled_only_when_all_waiters_leave(self):
+        future = asyncio.get_running_loop().create_future()
+        single_flight = SingleFlight()
+        first = single_flight.join("key", lambda: future)
+        second = single_flight.join("key", lambda: future)
+
+        first.cancel()
+        await asyncio.sleep(0)
+        assert not future.cancelled()
+
+        second.cancel()
+        await asyncio.sleep(0)
+        assert future.cancelled()
+
+    @pytest.mark.asyncio
+    @pytest.mark.sanity
+    async def test_finished_flight_is_not_joined_or_dropped_late(self):
+        loop = asyncio.get_running_loop()
+        old, new = loop.create_future(), loop.create_future()
+        single_flight = SingleFlight()
+        single_flight.join("key", lambda: old)
+
+        # Done, but its done-callback has not run yet
+        old.set_result({"tb_score": 0.1})
+        waiter = single_flight.join("key", lambda: new)
+        await asyncio.sleep(0)
+
+        assert len(single_flight) == 1
+        new.set_result({"tb_score": 0.2})
+        assert await waiter == {"tb_score": 0.2}
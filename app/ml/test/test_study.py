@@ -0,0 +1,65 @@
+import sys
+
+# Add parent directory to Python path to allow relative imports
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+import pytest
+
+from src.study import assemble_study, completed_files, iter_study_frames
+
+
+class TestStudy:
+    @pytest.mark.sanity
+    def test_folder_frames_are_listed_lazily(self, tmp_path, write_dicom):
+        write_dicom(tmp_path / "b", "study", "series-1", 2)
+        write_dicom(tmp_path / "a.dcm", "study", "series-1", 1, frames=3)
+        (tmp_path / "notes.txt").write_text("not a DICOM file")
+
+        frames = iter_study_frames(str(tmp_path))
+        first = next(frames)
+        assert first["path"].endswith("a.dcm") and first["frame"] == 0
+
+        rest = list(frames)
+        assert [frame["frame"] for frame in rest] == [1, 2, 0]
+        assert rest[-1]["path"].endswith("b")
+
+    @pytest.mark.sanity
+    def test_missing_study_raises(self, tmp_path):
+        with pytest.raises(FileNotFoundError):
+            next(iter_study_frames(str(tmp_path / "missing")))
+
+    @pytest.mark.sanity
+    def test_results_are_grouped_by_study_and_series(self):
+        def frame(path, study_uid, series_uid, instance_number):
+            return {
+                "path": path,
+                "frame": 0,
+                "study_uid": study_uid,
+                "series_uid": series_uid,
+                "instance_number": instance_number,
+            }
+
+        frames = [frame("/s/2", "A", "1", 2), frame("/s/1", "A", "1", 1)]
+        frames.append(frame("/s/3", "B", "9", 1))
+        results = [{"tb_score": 0.2}, {"tb_score": 0.1}, {"error": "failed"}]
+
+        study = assemble_study(frames, results)
+
+        assert study["frames"] == 3
+        assert [s["study_uid"] for s in study["studies"]] == ["A", "B"]
+        images = study["studies"][0]["series"][0]["images"]
+        assert [image["tb_score"] for image in images] == [0.1, 0.2]
+        assert study["studies"][1]["series"][0]["images"][0]["error"] == "failed"
+
+    @pytest.mark.sanity
+    def test_files_complete_only_when_all_frames_succeed(self):
+        frames = [
+            {"path": "a", "frame": 0},
+            {"path": "a", "frame": 1},
+            {"path": "b", "frame": 0},
+        ]
+        results = [{"tb_score": 0.1}, {"error": "Failed"}, {"tb_score": 0.2}]
+
+        assert completed_files(frames, results) == ["b"]
@@ -0,0 +1,104 @@
+import asyncio
+import sys
+import time
+
+# Add parent directory to Python path to allow relative imports
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from multiprocessing import shared_memory
+from test.worker_stages import crash_on_request, score_images, take_a_while
+
+import numpy as np
+import pytest
+
+from src import metrics
+from src.batch_inference import BatchContext
+from src.worker_pool import (
+    InferenceWorkerPool,
+    attach_shared_memory,
+    pack_arrays,
+    unpack_arrays,
+)
+
+
+def decoded_batch(*values, **data):
+    """A batch of 4x4 images filled with the given values"""
+    ctx = BatchContext([{"url": f"{value}.png", **data} for value in values])
+    ctx.original_images = [np.full((4, 4), value, dtype=np.uint8) for value in values]
+    ctx.loaded_indices = list(range(len(values)))
+    return ctx
+
+
+def is_released(name):
+    try:
+        shared_memory.SharedMemory(name=name).close()
+    except FileNotFoundError:
+        return True
+    return False
+
+
+class TestSharedMemory:
+    @pytest.mark.sanity
+    def test_arrays_round_trip(self):
+        arrays = [
+            np.arange(12, dtype=np.uint8).reshape(3, 4),
+            np.linspace(0, 1, 24, dtype=np.float32).reshape(2, 3, 4),
+            np.array([-1, 1], dtype=np.int16),
+        ]
+        shm, layout = pack_arrays(arrays)
+        try:
+            attached = attach_shared_memory(shm.name)
+            unpacked = unpack_arrays(attached, layout)
+            attached.close()
+        finally:
+            shm.close()
+            shm.unlink()
+
+        for array, copy in zip(arrays, unpacked):
+            assert copy.dtype == array.dtype
+            np.testing.assert_array_equal(copy, array)
+        assert is_released(shm.name)
+
+
+class TestInferenceWorkerPool:
+    @pytest.mark.asyncio
+    @pytest.mark.sanity
+    async def test_dead_worker_fails_its_batch_and_is_restarted(self):
+        pool = InferenceWorkerPool(
+            1, liveness_interval=0.1, stages=[crash_on_request, score_images]
+        )
+        pool.start()
+        restarts = metrics.get_counters().get("inference_worker_restarts", 0)
+        try:
+            crashing = pool.submit(decoded_batch(1, crash=True))
+            with pytest.raises(RuntimeError, match="exited with code 1"):
+                await asyncio.wait_for(crashing, 60)
+            assert (
+                metrics.get_counters()["inference_worker_restarts"] == restarts + 1
+            )
+
+            outputs = await asyncio.wait_for(pool.submit(decoded_batch(2, 3)), 60)
+            assert [output["tb_score"] for output in outputs] == [2.0, 3.0]
+            assert pool._pending == {}
+        finally:
+            pool.close()
+
+    @pytest.mark.asyncio
+    @pytest.mark.sanity
+    async def test_close_releases_batches_in_flight(self):
+        pool = InferenceWorkerPool(1, stages=[take_a_while])
+        pool.start()
+        submitted = asyncio.create_task(pool.submit(decoded_batch(1)))
+        start = time.monotonic()
+        while not pool._pending and time.monotonic() - start < 5:
+            await asyncio.sleep(0.01)
+        (_, image_shm, _) = next(iter(pool._pending.values()))
+
+        pool.close()
+
+        assert is_released(image_shm.name)
+        assert pool._pending == {}
+        with pytest.raises(asyncio.CancelledError):
+            await submitted
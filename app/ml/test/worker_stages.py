@@ -0,0 +1,20 @@
+"""Worker stages replacing the models in the worker pool tests.
+
+They live in their own module so that spawned workers can import them.
+"""
+import asyncio
+import os
+
+
+async def score_images(ctx):
+    for output, image in zip(ctx.outputs, ctx.original_images):
+        output["tb_score"] = float(image.mean())
+
+
+async def crash_on_request(ctx):
+    if any(data.get("crash") for data in ctx.input_data):
+        os._exit(1)
+
+
+async def take_a_while(ctx):
+    await asyncio.sleep(1)